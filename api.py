@@ -0,0 +1,340 @@
+# api.py
+# Async REST API for integrations (LMS, accounting, mobile), next to the Streamlit UI.
+# Uses the models from models.py on an async engine (aiosqlite / asyncpg). Every list
+# endpoint is keyset-paginated by id and accepts ?fields= to project columns; POST
+# endpoints take one object or a list and create everything in one transaction.
+#   python api.py --workers 4 --port 8000
+# Requests need the header  X-API-Key: <COLLEGE_ERP_API_KEY>
+import argparse, asyncio, contextlib, datetime
+from sqlalchemy import select, insert, event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+from models import Student, Admission, Fee, HostelAllocation, Exam, ADMISSION_COLUMNS, _sqlite_pragmas, _track_writes
+from payment_ingest import ingest_payments
+from hostel import allocate
+from id_allocator import student_ids, generic_ids
+import config
+import metrics
+
+MAX_LIMIT = 500
+STATUS_CODES = {"ok": 200, "duplicate": 200, "not_found": 404, "invalid": 400}
+
+
+def async_url(url):
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith(("postgresql:", "postgres:")):
+        return "postgresql+asyncpg:" + url.split(":", 1)[1]
+    return url
+
+
+def make_async_engine(url=None):
+    url = async_url(url or config.DB_URL)
+    if url.startswith("sqlite"):
+        eng = create_async_engine(url, connect_args={"timeout": config.SQLITE_BUSY_TIMEOUT_MS / 1000},
+                                  pool_size=config.DB_POOL_SIZE, max_overflow=config.DB_MAX_OVERFLOW)
+        event.listen(eng.sync_engine, "connect", _sqlite_pragmas)
+        return eng
+    return create_async_engine(url, pool_size=config.DB_POOL_SIZE, max_overflow=config.DB_MAX_OVERFLOW,
+                               pool_timeout=config.DB_POOL_TIMEOUT, pool_pre_ping=True)
+
+
+class _TrackedSession(Session):
+    pass
+
+
+_track_writes(_TrackedSession)  # API writes invalidate the Streamlit query cache too
+async_engine = make_async_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, sync_session_class=_TrackedSession, expire_on_commit=False)
+# SQLite has one writer; queue this worker's write transactions instead of letting them
+# wait on the busy timeout (and so the synchronous id allocator never waits on them)
+_write_lock = asyncio.Lock() if async_engine.dialect.name == "sqlite" else contextlib.nullcontext()
+
+
+async def _ids(fn, *args):
+    # id_allocator reserves on its own synchronous connection, which can wait on another
+    # process's write lock for SQLITE_BUSY_TIMEOUT_MS: keep that off the event loop and
+    # take the ids before the write transaction starts
+    return await asyncio.to_thread(fn, *args)
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        self.status = status
+        self.message = message
+
+
+def _json(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+def _columns(model, fields):
+    cols = model.__table__.columns
+    if not fields:
+        return list(cols)
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [n for n in names if n not in cols]
+    if unknown:
+        raise ApiError(400, f"unknown fields: {', '.join(unknown)}")
+    return [cols[n] for n in names]
+
+
+def _int(request, name, default):
+    try:
+        return int(request.query_params.get(name, default))
+    except ValueError:
+        raise ApiError(400, f"{name} must be an integer")
+
+
+async def _list(request, model, filters=()):
+    """{'items': [...], 'next': cursor or null}; pass ?after=<next> for the following page."""
+    cols = _columns(model, request.query_params.get("fields"))
+    limit = max(1, min(_int(request, "limit", 50), MAX_LIMIT))
+    after = _int(request, "after", 0)
+    pk = model.__table__.c.id
+    stmt = select(pk.label("_cursor"), *cols).where(pk > after, *filters).order_by(pk).limit(limit + 1)
+    async with AsyncSessionLocal() as s:
+        rows = (await s.execute(stmt)).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    items = [{c.name: _json(v) for c, v in zip(cols, r[1:])} for r in rows]
+    return JSONResponse({"items": items, "next": rows[-1][0] if more else None})
+
+
+def _params(request, *names):
+    return {n: request.query_params[n] for n in names if request.query_params.get(n)}
+
+
+async def _body_list(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise ApiError(400, "invalid json")
+    items = body if isinstance(body, list) else [body]
+    if not items or not all(isinstance(i, dict) for i in items):
+        raise ApiError(400, "expected an object or a list of objects")
+    if len(items) > config.API_MAX_BULK:
+        raise ApiError(413, f"at most {config.API_MAX_BULK} items per request")
+    return items
+
+
+async def _write(fn, attempts=5):
+    """Run fn(sync_session) in one transaction; retried when a concurrent writer wins a unique key."""
+    for attempt in range(attempts):
+        async with _write_lock:
+            async with AsyncSessionLocal() as s:
+                try:
+                    result = await s.run_sync(fn)
+                    await s.commit()
+                    return result
+                except IntegrityError:
+                    await s.rollback()
+                    if attempt == attempts - 1:
+                        raise
+
+
+def _text_ids(items, key="student_id"):
+    """Each item's `key` as text (JSON numbers included) or None; 400 if any is a list, object or boolean."""
+    bad = [i for i, it in enumerate(items)
+           if it.get(key) is not None and (not isinstance(it[key], (str, int)) or isinstance(it[key], bool))]
+    if bad:
+        raise ApiError(400, f"{key} must be a string or a number (items {bad[:10]})")
+    return [None if it.get(key) is None else str(it[key]) for it in items]
+
+
+async def _resolve_students(s, ids):
+    ids = {i for i in ids if i}
+    if not ids:
+        return {}
+    return dict((await s.execute(select(Student.student_id, Student.id).where(Student.student_id.in_(ids)))).all())
+
+
+# ----- students -----
+async def list_students(request):
+    p = _params(request, "program", "department", "year")
+    return await _list(request, Student, [getattr(Student, k) == v for k, v in p.items()])
+
+
+async def get_student(request):
+    cols = _columns(Student, request.query_params.get("fields"))
+    async with AsyncSessionLocal() as s:
+        row = (await s.execute(select(*cols).where(Student.student_id == request.path_params["student_id"]))).first()
+    if row is None:
+        raise ApiError(404, "student not found")
+    return JSONResponse({c.name: _json(v) for c, v in zip(cols, row)})
+
+
+async def create_students(request):
+    """Same fields as a bulk admission import; each student also gets an approved admission."""
+    items = await _body_list(request)
+    bad = [i for i, it in enumerate(items) if not it.get("name") or not it.get("email")]
+    if bad:
+        raise ApiError(400, f"name and email are required (items {bad[:10]})")
+    records = [{c: str(it.get(c, "") or "") for c in ADMISSION_COLUMNS} for it in items]
+    ids = await _ids(student_ids, len(records))
+    adm_ids = await _ids(generic_ids, "ADM", len(records))
+
+    def run(s):
+        for r, sid in zip(records, ids):
+            r["student_id"] = sid
+        s.execute(insert(Student), records)
+        pks = dict(s.execute(select(Student.student_id, Student.id).where(Student.student_id.in_(ids))).all())
+        s.execute(insert(Admission), [{"admission_id": aid, "student_id_fk": pks[sid], "source": "API", "status": "Approved"}
+                                      for sid, aid in zip(ids, adm_ids)])
+        return ids
+
+    ids = await _write(run)
+    return JSONResponse({"created": ids}, status_code=201)
+
+
+# ----- fees -----
+async def list_fees(request):
+    filters = []
+    if request.query_params.get("student_id"):
+        filters.append(Fee.student_id_fk == select(Student.id).where(
+            Student.student_id == request.query_params["student_id"]).scalar_subquery())
+    if request.query_params.get("mode"):
+        filters.append(Fee.payment_mode == request.query_params["mode"])
+    return await _list(request, Fee, filters)
+
+
+async def create_fees(request):
+    """Payments as the webhook receives them ({'student_id','amount','transaction_id','purpose'})."""
+    items = await _body_list(request)
+    ids = {"REC": await _ids(generic_ids, "REC", len(items)),
+           "TXN": await _ids(generic_ids, "TXN", sum(1 for it in items if not it.get("transaction_id")))}
+    results = await _write(lambda s: ingest_payments(s, items, ids))
+    return JSONResponse({"results": results}, status_code=200 if len(items) > 1 else STATUS_CODES[results[0]["status"]])
+
+
+# ----- hostel -----
+async def list_hostel(request):
+    p = _params(request, "block", "status")
+    return await _list(request, HostelAllocation, [getattr(HostelAllocation, k) == v for k, v in p.items()])
+
+
+def _preferences_ok(prefs):
+    if prefs is None:
+        return True
+    return isinstance(prefs, list) and all(
+        isinstance(p, list) and len(p) == 2 and all(isinstance(v, str) for v in p) for p in prefs)
+
+
+async def create_allocations(request):
+    """[{'student_id', 'preferences': [[block, room_type], ...], 'notes'}] -> hostel.allocate results."""
+    items = await _body_list(request)
+    bad = [i for i, it in enumerate(items) if not _preferences_ok(it.get("preferences"))]
+    if bad:
+        raise ApiError(400, f"preferences must be a list of [block, room_type] string pairs (items {bad[:10]})")
+    sids = _text_ids(items)
+    reqs = [{"student_id": sid, "notes": it.get("notes"),
+             "preferences": [tuple(p) for p in it.get("preferences") or []]} for it, sid in zip(items, sids)]
+    alloc_ids = await _ids(generic_ids, "HST", len(reqs))
+    results = await _write(lambda s: allocate(s, reqs, allocated_by=request.headers.get("x-api-client", "api"),
+                                              alloc_ids=alloc_ids))
+    return JSONResponse({"results": results})
+
+
+# ----- exams -----
+async def list_exams(request):
+    filters = []
+    if request.query_params.get("student_id"):
+        filters.append(Exam.student_id_fk == select(Student.id).where(
+            Student.student_id == request.query_params["student_id"]).scalar_subquery())
+    if request.query_params.get("subject_code"):
+        filters.append(Exam.subject_code == request.query_params["subject_code"])
+    return await _list(request, Exam, filters)
+
+
+async def create_exams(request):
+    """[{'student_id','subject_code','subject_name','marks','graded_by'}]; all rows or none."""
+    items = await _body_list(request)
+    sids, codes = _text_ids(items), _text_ids(items, "subject_code")
+    errors = []
+    for i, it in enumerate(items):
+        try:
+            m = float(it.get("marks"))
+        except (TypeError, ValueError):
+            errors.append({"item": i, "error": "marks must be a number"})
+            continue
+        if not 0 <= m <= 100:
+            errors.append({"item": i, "error": "marks must be between 0 and 100"})
+        elif not sids[i] or not codes[i]:
+            errors.append({"item": i, "error": "student_id and subject_code are required"})
+    async with AsyncSessionLocal() as s:
+        pks = await _resolve_students(s, sids)
+    errors += [{"item": i, "error": "unknown student_id"} for i, sid in enumerate(sids) if sid and sid not in pks]
+    if errors:
+        return JSONResponse({"errors": sorted(errors, key=lambda e: e["item"])}, status_code=400)
+
+    ids = await _ids(generic_ids, "EXM", len(items))
+
+    def run(s):
+        s.execute(insert(Exam), [{"exam_id": eid, "student_id_fk": pks[sid], "subject_code": code,
+                                  "subject_name": it.get("subject_name"), "marks": float(it["marks"]),
+                                  "status": "Pass" if float(it["marks"]) >= config.PASS_MARK else "Fail",
+                                  "graded_by": it.get("graded_by")} for eid, it, sid, code in zip(ids, items, sids, codes)])
+        return ids
+
+    ids = await _write(run)
+    return JSONResponse({"created": ids}, status_code=201)
+
+
+async def health(request):
+    return JSONResponse({"status": "ok"})
+
+
+async def prometheus(request):
+    # per worker process: each uvicorn worker reports its own requests
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+def _guard(handler, path):
+    async def wrapped(request):
+        if request.headers.get("x-api-key") != config.API_KEY:
+            return JSONResponse({"error": "unauthorized"}, status_code=401)
+        with metrics.span(f"api:{request.method} {path}", root=True):
+            try:
+                return await handler(request)
+            except ApiError as e:
+                return JSONResponse({"error": e.message}, status_code=e.status)
+    return wrapped
+
+
+def _route(path, get=None, post=None):
+    async def dispatch(request):
+        return await (get if request.method == "GET" else post)(request)
+    return Route(path, _guard(dispatch, path), methods=[m for m, h in (("GET", get), ("POST", post)) if h])
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    yield
+    await async_engine.dispose()
+
+
+app = Starlette(routes=[
+    Route("/health", health),
+    Route("/metrics", prometheus),
+    _route("/students", list_students, create_students),
+    _route("/students/{student_id}", get_student),
+    _route("/fees", list_fees, create_fees),
+    _route("/hostel", list_hostel, create_allocations),
+    _route("/exams", list_exams, create_exams),
+], lifespan=lifespan)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser(description="ERP REST API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers, log_level="warning")
@@ -1,40 +1,92 @@
 # app.py
+# Heavy modules (pandas, numpy via results/bulk_import, plotly, fpdf) are imported on the
+# pages that use them, so the login screen and light pages start without them.
 import streamlit as st
-from models import SessionLocal, Student, Admission, Fee, HostelAllocation, Exam, User
-from utils import gen_student_id, gen_generic_id, hash_password, verify_password, export_csv_all
-from receipts import build_and_save_receipt
-from config import RECEIPTS_FOLDER
+from models import SessionLocal, engine, Student, Admission, Exam, User
+from utils import gen_student_id, gen_generic_id
+import auth
+from receipt_worker import enqueue_receipt
+from dashboard import dashboard_metrics
+from ledger import record_payment
+from search import search_students, find_student, COLUMNS as SEARCH_COLUMNS
+from listing import recent_payments, hostel_occupancy, recent_grades, PAYMENT_COLUMNS, HOSTEL_COLUMNS, GRADE_COLUMNS
+from querycache import cached, cache as query_cache
+import metrics
+from dues import defaulters, dues_summary, write_defaulters_csv, refresh as refresh_dues, fee_structure, set_fee, remove_fee, DEFAULTER_COLUMNS
+from hostel import allocate, vacate, add_rooms, occupancy, parse_preferences, room_numbers, ANY
+from backup import export_backup, sqlite_snapshot
+from config import BACKUP_FOLDER, PASS_MARK, SESSION_TOKEN_IN_URL
 from sqlalchemy.exc import IntegrityError
-import pandas as pd
+import io
 import os
 import datetime
-import pathlib
 
 st.set_page_config(page_title="College ERP", layout="wide")
 
-# simple session-state auth
+@st.cache_resource
+def session_factory():
+    # one engine and connection pool per process, shared by every rerun and browser session
+    return SessionLocal
+
+Session = session_factory()
+
+# read queries are reused across reruns until a commit writes one of the listed tables
+search_students = cached("students")(search_students)
+recent_payments = cached("fees", "students")(recent_payments)
+hostel_occupancy = cached("hostel", "students")(hostel_occupancy)
+occupancy = cached("hostel", "hostel_rooms")(occupancy)
+recent_grades = cached("exams", "students")(recent_grades)
+dashboard_metrics = cached("students", "fees", "hostel", "hostel_rooms")(dashboard_metrics)
+defaulters = cached("student_dues", "students")(defaulters)
+dues_summary = cached("student_dues", "students")(dues_summary)
+fee_structure = cached("fee_structures")(fee_structure)
+
+# session-state auth: a signed token from auth.login is checked on every rerun instead of
+# reading the users table; it also lets a page reload keep the session when SESSION_TOKEN_IN_URL is on
 if "logged_in" not in st.session_state:
     st.session_state.logged_in = False
     st.session_state.user = None
+    st.session_state.token = None
+    if SESSION_TOKEN_IN_URL and st.query_params.get("session"):
+        st.session_state.token = st.query_params["session"]
+
+if st.session_state.token:
+    _user = auth.read_token(st.session_state.token)
+    st.session_state.logged_in = _user is not None
+    st.session_state.user = _user
+    if _user is None:
+        st.session_state.token = None  # expired or signed with another SECRET_KEY
+        st.query_params.pop("session", None)
 
 def login_ui():
     st.sidebar.title("Login")
     username = st.sidebar.text_input("Username")
     password = st.sidebar.text_input("Password", type="password")
     if st.sidebar.button("Login"):
-        s = SessionLocal()
-        user = s.query(User).filter_by(username=username).first()
-        if user and verify_password(user.hashed_password, password):
+        try:
+            with st.spinner("Checking password..."):
+                res = auth.login(username, password)
+        except auth.AuthBusy:
+            st.sidebar.warning("Too many people are logging in right now; try again in a moment")
+            return
+        except auth.InsecureSecret as e:
+            st.sidebar.error(f"Login is disabled: {e}")
+            return
+        if res:
             st.session_state.logged_in = True
-            st.session_state.user = {"username": user.username, "role": user.role, "display_name": user.display_name}
-            st.sidebar.success(f"Welcome {user.display_name} ({user.role})")
+            st.session_state.user = res["user"]
+            st.session_state.token = res["token"]
+            if SESSION_TOKEN_IN_URL:
+                st.query_params["session"] = res["token"]
+            st.sidebar.success(f"Welcome {res['user']['display_name']} ({res['user']['role']})")
         else:
             st.sidebar.error("Invalid creds")
-        s.close()
 
 def logout():
     st.session_state.logged_in = False
     st.session_state.user = None
+    st.session_state.token = None
+    st.query_params.pop("session", None)
 
 def require_login():
     if not st.session_state.logged_in:
@@ -48,7 +100,21 @@ def header():
         st.sidebar.write(f"Logged in as: **{st.session_state.user['display_name']}** ({st.session_state.user['username']})")
         if st.sidebar.button("Logout"):
             logout()
-            st.experimental_rerun()
+            st.rerun()
+
+def _set_cursor(key, value):
+    st.session_state[key] = value
+
+def pager(key, next_cursor):
+    # keyset paging: the cursor for the next page is kept in session state
+    c1, c2 = st.columns(2)
+    c1.button("First page", key=f"{key}_first", on_click=_set_cursor, args=(key, None),
+              disabled=not st.session_state.get(key))
+    c2.button("Next page", key=f"{key}_next", on_click=_set_cursor, args=(key, next_cursor),
+              disabled=next_cursor is None)
+
+def reset_cursor(key):
+    return {"on_change": _set_cursor, "args": (key, None)}
 
 # start
 header()
@@ -60,7 +126,9 @@ if not st.session_state.logged_in:
 menu = ["Admissions", "Fees", "Hostel", "Exams", "Dashboard", "Admin"]
 choice = st.sidebar.selectbox("Go to", menu)
 
-s = SessionLocal()
+# one span per script run; a run cut short by st.stop() is dropped by the next root span
+page_span = metrics.begin(f"page:{choice}", root=True)
+s = Session()
 
 # ----- Admissions -----
 if choice == "Admissions":
@@ -99,21 +167,17 @@ if choice == "Admissions":
     with col2:
         st.subheader("Search Students")
         q = st.text_input("Search by name, student id or email")
+        page = st.number_input("Page", min_value=1, value=1, step=1) - 1
         if st.button("Search"):
-            qry = s.query(Student)
-            rows = []
-            if q:
-                rows = qry.filter((Student.name.ilike(f"%{q}%")) | (Student.student_id.ilike(f"%{q}%")) | (Student.email.ilike(f"%{q}%"))).all()
-            else:
-                rows = qry.limit(50).all()
-            df = pd.DataFrame([{
-                "student_id": r.student_id, "name": r.name, "email": r.email, "mobile": r.mobile,
-                "program": r.program, "year": r.year
-            } for r in rows])
-            st.dataframe(df)
+            import pandas as pd
+            rows, has_more = search_students(s, q, page=page)
+            st.dataframe(pd.DataFrame(rows, columns=SEARCH_COLUMNS))
+            if has_more:
+                st.caption("More matches on the next page — refine the search to narrow them down.")
 
 # ----- Fees -----
 elif choice == "Fees":
+    import pandas as pd
     st.header("Fees & Receipts")
     col1, col2 = st.columns([2,1])
     with col1:
@@ -128,65 +192,164 @@ elif choice == "Fees":
             # locate student
             student = None
             if student_query:
-                student = s.query(Student).filter((Student.student_id==student_query)|(Student.email==student_query)).first()
+                student = find_student(s, student_query)
             if not student:
                 st.error("Student not found — please use Student ID or registered email.")
             else:
                 receipt_id = gen_generic_id("REC")
-                # compute balance: latest fee balance, naive
-                last_fee = s.query(Fee).filter_by(student_id_fk=student.id).order_by(Fee.timestamp.desc()).first()
-                last_balance = last_fee.balance_after if last_fee else 0.0
-                balance_after = last_balance - amount
-                fee = Fee(receipt_id=receipt_id, student_id_fk=student.id, name=student.name,
-                          amount=amount, payment_mode=mode, transaction_id=txn or receipt_id,
-                          balance_after=balance_after, purpose=purpose, recorded_by=recorded_by)
-                s.add(fee)
-                s.commit()
-                # generate PDF receipt
+                # balance comes from the student's ledger account, updated in this transaction
+                fee = record_payment(s, student, amount, receipt_id=receipt_id, payment_mode=mode,
+                                     transaction_id=txn or receipt_id, purpose=purpose, recorded_by=recorded_by)
+                # PDF receipt is rendered by receipt_worker.py from this queued job
+                enqueue_receipt(s, fee)
                 try:
-                    build_and_save_receipt(s, fee)
-                except Exception as e:
-                    st.warning("Receipt generation failed: " + str(e))
-                st.success(f"Payment recorded. Receipt ID: {receipt_id}")
+                    s.commit()
+                except IntegrityError:
+                    s.rollback()
+                    st.error(f"Transaction ID {txn} is already recorded.")
+                    st.stop()
+                st.success(f"Payment recorded. Receipt ID: {receipt_id} (PDF queued)")
     with col2:
         st.subheader("Recent Payments")
-        rows = s.query(Fee).order_by(Fee.timestamp.desc()).limit(20).all()
-        df = pd.DataFrame([{"receipt_id":r.receipt_id, "student": r.name, "student_id": getattr(r.student,'student_id',''),
-                            "amount": r.amount, "mode": r.payment_mode, "ts": r.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-                            "invoice": r.invoice_path} for r in rows])
+        f_student = st.text_input("Filter: student ID", key="pay_f_student", **reset_cursor("pay_cursor"))
+        f_mode = st.selectbox("Filter: mode", ["", "Cash","UPI","Card","Netbanking","Gateway"], key="pay_f_mode", **reset_cursor("pay_cursor"))
+        f_dates = st.date_input("Filter: dates", value=(), key="pay_f_dates", **reset_cursor("pay_cursor"))
+        rows, nxt = recent_payments(s, cursor=st.session_state.get("pay_cursor"), student_id=f_student or None,
+                                    mode=f_mode or None, date_from=f_dates[0] if f_dates else None,
+                                    date_to=f_dates[-1] if f_dates else None)
+        df = pd.DataFrame(rows, columns=PAYMENT_COLUMNS)
+        df["ts"] = df["ts"].map(lambda v: v.strftime("%Y-%m-%d %H:%M:%S") if v else "")
         st.dataframe(df)
+        pager("pay_cursor", nxt)
+    st.subheader("Outstanding dues")
+    dcol1, dcol2, dcol3 = st.columns(3)
+    d_program = dcol1.text_input("Program", key="dues_f_program", **reset_cursor("dues_cursor")) or None
+    d_year = dcol2.text_input("Year", key="dues_f_year", **reset_cursor("dues_cursor")) or None
+    d_min = dcol3.number_input("Owing at least (₹)", min_value=0.01, value=1.0, key="dues_f_min", **reset_cursor("dues_cursor"))
+    summary = dues_summary(s, d_program, d_year, d_min)
+    if summary["as_of"] is None:
+        st.info("Dues have not been computed yet — use Recompute dues below.")
+    else:
+        st.caption(f"{summary['defaulters']} students owe ₹{summary['outstanding']:.2f} "
+                   f"(fee structure assessed as of {summary['as_of']}, payments applied as they arrive)")
+    rows, nxt = defaulters(s, cursor=st.session_state.get("dues_cursor"), program=d_program, year=d_year, min_outstanding=d_min)
+    st.dataframe(pd.DataFrame(rows, columns=DEFAULTER_COLUMNS))
+    pager("dues_cursor", nxt)
+    if st.button("Prepare defaulters CSV"):
+        buf = io.StringIO()
+        n = write_defaulters_csv(s, buf, d_program, d_year, d_min)
+        st.download_button(f"Download defaulters.csv ({n} rows)", data=buf.getvalue(), file_name="defaulters.csv", mime="text/csv")
+    if st.session_state.user['role'] in ("admin", "accounts"):
+        if st.button("Recompute dues"):
+            r = refresh_dues()
+            st.success(f"Dues recomputed for {r['students']} students in {r['seconds']:.1f}s")
+        with st.expander("Fee structure"):
+            st.dataframe(pd.DataFrame(fee_structure(s)))
+            fcol1, fcol2, fcol3 = st.columns(3)
+            fs_program = fcol1.text_input("Program", key="fs_program")
+            fs_year = fcol2.number_input("Year of study", min_value=1, max_value=10, value=1, key="fs_year")
+            fs_term = fcol3.text_input("Term", key="fs_term")
+            fs_head = fcol1.text_input("Head", "Tuition", key="fs_head")
+            fs_amount = fcol2.number_input("Amount (₹)", min_value=0.0, value=0.0, key="fs_amount")
+            fs_due = fcol3.date_input("Due date", value=None, key="fs_due")
+            if st.button("Save fee"):
+                if not fs_program or not fs_term:
+                    st.error("Program and term required")
+                else:
+                    set_fee(s, fs_program, fs_year, fs_term, fs_amount, head=fs_head or "Tuition", due_date=fs_due)
+                    s.commit()
+                    r = refresh_dues(fs_program)
+                    st.success(f"Saved; dues recomputed for {r['students']} {fs_program} students")
+            fs_remove = st.number_input("Remove fee structure row id", min_value=0, value=0, step=1, key="fs_remove")
+            if st.button("Remove fee") and fs_remove:
+                row = remove_fee(s, int(fs_remove))
+                if row is None:
+                    st.error("No such row")
+                else:
+                    program = row.program
+                    s.commit()
+                    refresh_dues(program)
+                    st.success(f"Removed; dues recomputed for {program}")
 
 # ----- Hostel -----
 elif choice == "Hostel":
+    import pandas as pd
     st.header("Hostel Management")
     col1, col2 = st.columns(2)
     with col1:
-        st.subheader("Request / Allocate")
+        st.subheader("Allocate a bed")
+        rooms = occupancy(s)
+        blocks = [ANY] + sorted({r["block"] for r in rooms})
+        types = [ANY] + sorted({r["room_type"] for r in rooms})
         student_q = st.text_input("Student ID or Email for hostel")
-        block = st.text_input("Block (A/B/C)")
-        room = st.text_input("Room No")
-        bed = st.text_input("Bed No")
+        block = st.selectbox("Block", blocks)
+        room_type = st.selectbox("Room type", types)
         move_in = st.date_input("Move-in date", value=datetime.date.today())
         notes = st.text_area("Notes")
-        if st.button("Create/Allocate"):
-            student = s.query(Student).filter((Student.student_id==student_q)|(Student.email==student_q)).first()
+        if st.button("Allocate"):
+            student = find_student(s, student_q)
             if not student:
                 st.error("Student not found")
             else:
-                alloc_id = gen_generic_id("HST")
-                h = HostelAllocation(allocation_id=alloc_id, student_id_fk=student.id, block=block, room_no=room, bed_no=bed,
-                                    move_in=move_in.isoformat(), status="Allocated", allocated_by=st.session_state.user['username'], notes=notes)
-                s.add(h)
+                res = allocate(s, [{"student_id": student.student_id, "preferences": [(block, room_type)], "notes": notes}],
+                               allocated_by=st.session_state.user['username'], move_in=move_in)[0]
                 s.commit()
-                st.success(f"Hostel allocated: {block}-{room}-{bed} to {student.name}")
+                if res["status"] == "ok":
+                    st.success(f"Hostel allocated: {res['block']}-{res['room_no']}-{res['bed_no']} to {student.name}")
+                elif res["status"] == "already_allocated":
+                    st.warning(f"{student.name} already has a bed")
+                else:
+                    st.error("No free bed matches that block / room type")
+        st.subheader("Auto-allocate a batch")
+        st.caption("CSV columns: student_id, preferences — e.g. 'A/double; B/*'. Preferences are tried in order; empty means any bed.")
+        batch = st.file_uploader("Batch file", type=["csv"])
+        if batch is not None and st.button("Run auto-allocation"):
+            reqs = [{"student_id": str(r["student_id"]).strip(), "preferences": parse_preferences(r.get("preferences", ""))}
+                    for r in pd.read_csv(batch, dtype=str, keep_default_na=False).to_dict("records")]
+            res = allocate(s, reqs, allocated_by=st.session_state.user['username'])
+            s.commit()
+            st.success(f"Allocated {sum(r['status'] == 'ok' for r in res)} of {len(res)} students")
+            st.dataframe(pd.DataFrame(res))
+        st.subheader("Vacate")
+        vacate_id = st.text_input("Allocation ID")
+        if st.button("Vacate bed"):
+            if vacate(s, vacate_id.strip()):
+                s.commit()
+                st.success(f"{vacate_id} vacated")
+            else:
+                st.error("No active allocation with that ID")
+        if st.session_state.user['role'] in ("admin", "warden"):
+            with st.expander("Room inventory"):
+                inv_block = st.text_input("Block name")
+                inv_rooms = st.text_input("Room numbers (e.g. 101-120,201)")
+                inv_type = st.text_input("Room type", value="double")
+                inv_cap = st.number_input("Beds per room", min_value=1, value=2, step=1)
+                if st.button("Add rooms"):
+                    try:
+                        n = add_rooms(s, inv_block.strip(), room_numbers(inv_rooms), inv_type.strip(), int(inv_cap))
+                        s.commit()
+                        st.success(f"Added {n} beds to block {inv_block}")
+                    except IntegrityError:
+                        s.rollback()
+                        st.error("Some of those rooms already exist in that block")
     with col2:
         st.subheader("Hostel Occupancy")
-        rows = s.query(HostelAllocation).all()
-        df = pd.DataFrame([{"alloc_id":r.allocation_id, "student": getattr(r.student,'name',''), "block": r.block, "room": r.room_no, "bed": r.bed_no, "status": r.status} for r in rows])
-        st.dataframe(df)
+        st.dataframe(pd.DataFrame(occupancy(s), columns=["block", "room_type", "rooms", "beds", "occupied", "free"]))
+        st.subheader("Allocations")
+        f_block = st.text_input("Filter: block", key="hst_f_block", **reset_cursor("hst_cursor"))
+        f_status = st.selectbox("Filter: status", ["", "Requested", "Allocated", "Vacated"], key="hst_f_status", **reset_cursor("hst_cursor"))
+        rows, nxt = hostel_occupancy(s, cursor=st.session_state.get("hst_cursor"), block=f_block or None, status=f_status or None)
+        st.dataframe(pd.DataFrame(rows, columns=HOSTEL_COLUMNS))
+        pager("hst_cursor", nxt)
 
 # ----- Exams -----
 elif choice == "Exams":
+    import pandas as pd
+    from results import compute_results, cohorts, cohort_semesters, cohort_results, cohort_subject_stats
+    cohorts = cached("students")(cohorts)
+    cohort_semesters = cached("student_results", "students")(cohort_semesters)
+    cohort_results = cached("student_results", "students")(cohort_results)
+    cohort_subject_stats = cached("subject_stats")(cohort_subject_stats)
     st.header("Exams & Marks")
     col1, col2 = st.columns(2)
     with col1:
@@ -197,47 +360,68 @@ elif choice == "Exams":
         marks = st.number_input("Marks", min_value=0.0, max_value=100.0, value=0.0)
         graded_by = st.text_input("Graded by", st.session_state.user['username'])
         if st.button("Save Marks"):
-            student = s.query(Student).filter((Student.student_id==student_q)|(Student.email==student_q)).first()
+            student = find_student(s, student_q)
             if not student:
                 st.error("Student not found")
             else:
                 exid = gen_generic_id("EXM")
-                status = "Pass" if marks >= 40 else "Fail"
+                status = "Pass" if marks >= PASS_MARK else "Fail"
                 ex = Exam(exam_id=exid, student_id_fk=student.id, subject_code=subj_code, subject_name=subj_name, marks=marks, status=status, graded_by=graded_by)
                 s.add(ex)
                 s.commit()
                 st.success(f"Saved marks for {student.name}: {marks} ({status})")
     with col2:
         st.subheader("Recent Grades")
-        rows = s.query(Exam).order_by(Exam.graded_at.desc()).limit(30).all()
-        df = pd.DataFrame([{"exam_id":r.exam_id,"student": getattr(r.student,'name',''), "subject": r.subject_name, "marks": r.marks, "status": r.status} for r in rows])
-        st.dataframe(df)
+        f_subject = st.text_input("Filter: subject code or name", key="exm_f_subject", **reset_cursor("exm_cursor"))
+        f_result = st.selectbox("Filter: result", ["", "Pass", "Fail"], key="exm_f_status", **reset_cursor("exm_cursor"))
+        f_dates = st.date_input("Filter: dates", value=(), key="exm_f_dates", **reset_cursor("exm_cursor"))
+        rows, nxt = recent_grades(s, cursor=st.session_state.get("exm_cursor"), subject=f_subject or None,
+                                  status=f_result or None, date_from=f_dates[0] if f_dates else None,
+                                  date_to=f_dates[-1] if f_dates else None)
+        st.dataframe(pd.DataFrame(rows, columns=GRADE_COLUMNS))
+        pager("exm_cursor", nxt)
+    st.subheader("Semester results")
+    rcol1, rcol2, rcol3 = st.columns([2, 1, 1])
+    groups = cohorts(s)
+    cohort = rcol1.selectbox("Program / year", groups, format_func=lambda c: f"{c[0] or '(none)'} — year {c[1] or '?'}") if groups else None
+    if rcol3.button("Compute results"):
+        rep = compute_results()
+        st.success(f"{rep['mode'].capitalize()} run: {rep['students']} students from {rep['exam_rows']} exam rows in {rep['seconds']:.1f}s")
+        if rep["unknown_subjects"]:
+            st.warning(f"Not in the subject catalogue (counted as 1 credit, semester 1): {', '.join(rep['unknown_subjects'][:20])}. "
+                       "Add them under Admin → Subjects.")
+    if cohort:
+        semesters = cohort_semesters(s, *cohort)
+        if semesters:
+            sem_no = rcol2.selectbox("Semester", semesters)
+            st.dataframe(pd.DataFrame(cohort_results(s, *cohort, sem_no),
+                                      columns=["rank", "student_id", "name", "sgpa", "cgpa", "credits", "failed"]))
+            st.caption("Subject statistics")
+            st.dataframe(pd.DataFrame(cohort_subject_stats(s, *cohort),
+                                      columns=["subject_code", "students", "mean", "median", "std", "pass_pct"]))
+        else:
+            st.info("No results computed for this cohort yet.")
 
 # ----- Dashboard -----
 elif choice == "Dashboard":
+    import pandas as pd
+    import plotly.express as px
     st.header("Dashboard")
-    total_students = s.query(Student).count()
-    total_fees = s.query(Fee).with_entities(func_sum:=Fee.amount).all()
-    # compute total fees sum safely
-    total_fees_val = 0.0
-    for row in s.query(Fee).all():
-        total_fees_val += (row.amount or 0.0)
-    st.metric("Total Students", total_students)
-    st.metric("Total Fees Collected (₹)", f"{total_fees_val:.2f}")
+    dash = dashboard_metrics(s)
+    st.metric("Total Students", dash["total_students"])
+    st.metric("Total Fees Collected (₹)", f"{dash['total_fees']:.2f}")
     # simple charts - fees by month
-    fees = pd.DataFrame([{"amount":f.amount, "ts": f.timestamp} for f in s.query(Fee).all()])
-    if not fees.empty:
-        fees['month'] = pd.to_datetime(fees['ts']).dt.to_period('M').astype(str)
-        fees_by_month = fees.groupby('month')['amount'].sum().reset_index()
-        st.plotly_chart(__import__("plotly.express").express.bar(fees_by_month, x='month', y='amount', title="Fees by month"))
+    if dash["fees_by_month"]:
+        fees_by_month = pd.DataFrame(dash["fees_by_month"])
+        st.plotly_chart(px.bar(fees_by_month, x='month', y='amount', title="Fees by month"))
     # hostel occupancy
-    hostel_rows = pd.DataFrame([{"block":h.block, "status": h.status} for h in s.query(HostelAllocation).all()])
-    if not hostel_rows.empty:
-        occ = hostel_rows.groupby('block').size().reset_index(name='count')
-        st.plotly_chart(__import__("plotly.express").express.pie(occ, names='block', values='count', title="Hostel occupancy by block"))
+    if dash["hostel_by_block"]:
+        occ = pd.DataFrame(dash["hostel_by_block"])
+        st.plotly_chart(px.pie(occ, names='block', values='count', title="Hostel occupancy by block"))
 
 # ----- Admin -----
 elif choice == "Admin":
+    import pandas as pd
     st.header("Admin Tools")
     if st.session_state.user['role'] != "admin":
         st.warning("Admin tools available only to admin users.")
@@ -257,15 +441,85 @@ elif choice == "Admin":
             except IntegrityError:
                 s.rollback()
                 st.error("Username exists")
+        st.subheader("Subjects")
+        from results import subject_catalogue, missing_subjects, save_subject
+        missing_note, catalogue_table = st.empty(), st.empty()  # filled in after a save below
+        scol1, scol2, scol3, scol4 = st.columns(4)
+        subj_code = scol1.text_input("Code", key="subj_code")
+        subj_name = scol2.text_input("Name", key="subj_name")
+        subj_credits = scol3.number_input("Credits", min_value=0.5, max_value=40.0, value=4.0, step=0.5, key="subj_credits")
+        subj_sem = scol4.number_input("Semester", min_value=1, max_value=16, value=1, key="subj_sem")
+        if st.button("Save subject"):
+            try:
+                save_subject(s, subj_code, subj_name, subj_credits, subj_sem)
+                st.success(f"Saved {subj_code.strip()}; the next results run recomputes everyone")
+            except ValueError as e:
+                st.error(str(e))
+        missing = missing_subjects(s)
+        if missing:
+            missing_note.warning(f"Exams use subject codes missing from the catalogue (counted as 1 credit, semester 1): {', '.join(missing[:20])}")
+        catalogue_table.dataframe(pd.DataFrame(subject_catalogue(s), columns=["code", "name", "credits", "semester"]))
+        st.subheader("Bulk import (CSV / Excel)")
+        import_kind = st.selectbox("Import", ["Admissions", "Marks"])
+        st.caption("Admissions columns: name, email, dob, gender, mobile, program, year, department, address, guardian_name, guardian_contact. "
+                   "Marks columns: student_id, subject_code, subject_name, marks, graded_by.")
+        upload = st.file_uploader("File", type=["csv", "xlsx"])
+        if upload is not None and st.button("Run import"):
+            from bulk_import import import_admissions, import_marks
+            try:
+                if import_kind == "Admissions":
+                    rep = import_admissions(upload)
+                else:
+                    rep = import_marks(upload, graded_by=st.session_state.user['username'])
+            except (ValueError, RuntimeError) as e:
+                st.error(str(e))
+            else:
+                st.success(f"Imported {rep['inserted']} of {rep['rows']} rows in {rep['seconds']:.1f}s ({rep['rows_per_sec']:.0f} rows/sec)")
+                if rep["errors"]:
+                    st.dataframe(pd.DataFrame(rep["errors"]))
         st.subheader("Backup DB / Export CSVs")
-        if st.button("Export CSV Backups"):
-            paths = export_csv_all()
-            st.success("Backups created")
-            for k,v in paths.items():
-                st.write(f"{k}: {v}")
+        bcol1, bcol2, bcol3 = st.columns(3)
+        backup_fmt = bcol1.selectbox("Format", ["csv", "parquet"])
+        backup_comp = bcol2.selectbox("Compression", ["gzip", "zstd", "none"], disabled=backup_fmt == "parquet")
+        backup_incr = bcol3.checkbox("Only rows since last backup")
+        if st.button("Export Backups"):
+            try:
+                entry = export_backup(backup_fmt, backup_comp, incremental=backup_incr, parallel=True)
+            except RuntimeError as e:
+                st.error(str(e))
+            else:
+                st.success(f"{entry['mode'].capitalize()} backup created")
+                for k,v in entry["tables"].items():
+                    st.write(f"{k}: {os.path.join(BACKUP_FOLDER, v['path'])} ({v['rows']} rows)")
+        st.subheader("Query cache")
+        st.caption(f"{len(query_cache)} cached results (max {query_cache.max_entries}, TTL {query_cache.ttl:.0f}s, "
+                   f"{query_cache.evictions} evicted)")
+        st.dataframe(pd.DataFrame(query_cache.stats()))
+        if st.button("Clear query cache"):
+            query_cache.clear()
+            st.success("Query cache cleared")
+        st.subheader("Performance")
+        perf = metrics.summary()
+        st.caption("Latency of page runs, requests and renders in this process (webhook and API "
+                   "processes serve their own numbers at /metrics).")
+        st.dataframe(pd.DataFrame(perf["spans"]).round(2))
+        st.caption("Slowest statements by total time")
+        st.dataframe(pd.DataFrame(perf["statements"]).round(2))
+        if perf["n_plus_one"]:
+            st.warning("Statements repeated within one page run or request (possible N+1)")
+            st.dataframe(pd.DataFrame(perf["n_plus_one"]))
+        if st.button("Reset metrics"):
+            metrics.reset()
+            st.success("Metrics reset")
         st.subheader("Manual DB download")
-        db_path = os.path.join(os.path.dirname(__file__), "college_erp.db")
-        if os.path.exists(db_path):
-            st.download_button("Download DB file", data=open(db_path,"rb"), file_name="college_erp.db")
+        if engine.dialect.name != "sqlite":
+            st.info("The database is not SQLite; use the server's own dump tools.")
+        elif st.button("Prepare DB snapshot"):
+            # copied with the SQLite backup API so pages still in the WAL are included
+            snap = os.path.join(BACKUP_FOLDER, "college_erp_snapshot.db")
+            sqlite_snapshot(snap)
+            with open(snap, "rb") as f:
+                st.download_button("Download DB file", data=f.read(), file_name="college_erp.db")
 
 s.close()
+metrics.end(page_span)
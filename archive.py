@@ -0,0 +1,396 @@
+# archive.py
+# Archival of closed academic years. close_year() moves a year's fees and exams rows out of
+# the hot tables into a SQLite file of their own (ARCHIVE_FOLDER/erp-2023-24-<stamp>.db)
+# with the same columns and indexes. The copy is compared with the hot rows column by
+# column under the write lock before they are deleted, in the same transaction that
+# records the year in archived_years. Archive files are attached read-only to the
+# connections that read history. history() appends every archived year to the hot
+# table for the code that needs all of it: ledger rebuild and opening balances, fee
+# rollup rebuild, dues, results and student statements. Pages, the API and CSV backups
+# keep reading the hot tables only, which is what gets smaller.
+# A year starts on the 1st of ACADEMIC_YEAR_START_MONTH; fees are placed by timestamp and
+# exams by graded_at. Archived rows are read-only: a re-evaluation is a new exam row, as
+# before. The transaction ids of archived fees stay in archived_transactions, so a gateway
+# retry of one is still a duplicate (see payment_ingest.py). SQLite only (on PostgreSQL, partition fees and exams by range instead),
+# and SQLite attaches at most 10 files per connection unless built with a higher limit.
+#   python archive.py list
+#   python archive.py close 2023-24 [2024-25 ...] | --all-closed  [--vacuum]
+#   python archive.py verify
+#   python archive.py restore 2023-24
+#   python archive.py reindex     rebuild archived_transactions from the archive files
+import argparse, datetime, os, re, time
+from urllib.parse import quote
+from sqlalchemy import (MetaData, Table, Column, Index, create_engine, select, delete, insert, union_all, func, text,
+                        literal)
+from sqlalchemy.orm import Session
+from models import (SessionLocal, engine, Base, Fee, Exam, ReceiptJob, ArchivedYear, ArchivedTransaction,
+                    RollupWatermark, now)
+import config
+
+# archived table -> column that places a row in an academic year
+YEAR_COLUMN = {"fees": "timestamp", "exams": "graded_at"}
+MODELS = {"fees": Fee, "exams": Exam}
+# archived_years column -> (table, aggregate) recorded at archive time and checked by verify()
+TOTALS = {"fees": ("fees", "count(*)"), "fees_amount": ("fees", "total(amount)"),
+          "exams": ("exams", "count(*)"), "exams_marks": ("exams", "total(marks)")}
+
+
+# ----- academic years -----
+def year_label(first):
+    return f"{first}-{(first + 1) % 100:02d}"
+
+
+def year_bounds(label):
+    """(start, end) of academic year `label` such as "2023-24"; end is exclusive."""
+    first = int(label.split("-")[0]) if re.fullmatch(r"\d{4}-\d{2}", label) else None
+    if first is None or label != year_label(first):
+        raise ValueError(f"academic years look like 2023-24, not {label!r}")
+    m = config.ACADEMIC_YEAR_START_MONTH
+    return datetime.datetime(first, m, 1), datetime.datetime(first + 1, m, 1)
+
+
+def current_year(today=None):
+    today = today or datetime.date.today()
+    return year_label(today.year if today.month >= config.ACADEMIC_YEAR_START_MONTH else today.year - 1)
+
+
+def hot_years(session):
+    """{label: {'fees': n, 'exams': n}} of rows still in the hot tables."""
+    out = {}
+    for name, col in YEAR_COLUMN.items():
+        rows = session.execute(text(
+            f"SELECT CAST(strftime('%Y', {col}) AS INTEGER) - (CAST(strftime('%m', {col}) AS INTEGER) < :m) AS y, "
+            f"count(*) FROM {name} WHERE {col} IS NOT NULL GROUP BY y"), {"m": config.ACADEMIC_YEAR_START_MONTH})
+        for first, n in rows:
+            out.setdefault(year_label(first), {"fees": 0, "exams": 0})[name] = n
+    return dict(sorted(out.items()))
+
+
+# ----- reading archives -----
+def _alias(file):
+    # the file name carries its creation time, so a year archived again never reuses an alias
+    return "arc_" + re.sub(r"\W", "_", os.path.splitext(file)[0])
+
+
+def _attach(dbapi_conn, file):
+    path = os.path.abspath(os.path.join(config.ARCHIVE_FOLDER, file))
+    if not os.path.exists(path):
+        raise RuntimeError(f"archive file {path} is missing")
+    dbapi_conn.execute(f"ATTACH DATABASE ? AS {_alias(file)}", (f"file:{quote(path)}?mode=ro",))
+
+
+def _detach(conn, alias):
+    """Detach `alias` if attached; a connection it cannot be detached from is discarded, not pooled."""
+    try:
+        if alias in {row[1] for row in conn.exec_driver_sql("PRAGMA database_list")}:
+            conn.exec_driver_sql(f"DETACH DATABASE {alias}")
+        conn.commit()
+    except Exception:
+        try:
+            conn.rollback()
+        finally:
+            conn.invalidate()  # closes the DBAPI connection instead of returning it to the pool
+
+
+def attach(bind):
+    """Attach every archived year read-only to a Session's or Connection's connection; returns their schema names."""
+    conn = bind.connection() if isinstance(bind, Session) else bind
+    if conn.dialect.name != "sqlite":
+        return []
+    files = conn.execute(select(ArchivedYear.file).order_by(ArchivedYear.label)).scalars().all()
+    if not files:
+        return []
+    raw = conn.connection.dbapi_connection
+    have = {row[1] for row in raw.execute("PRAGMA database_list")}
+    for file in files:
+        if _alias(file) not in have:
+            _attach(raw, file)
+    return [_alias(f) for f in files]
+
+
+def _table(name, schema=None, metadata=None):
+    """Table `name` with the hot table's columns and indexes but no foreign keys, in `schema`."""
+    hot = Base.metadata.tables[name]
+    t = Table(name, metadata if metadata is not None else MetaData(),
+              *[Column(c.name, c.type, primary_key=c.primary_key) for c in hot.columns], schema=schema)
+    for idx in hot.indexes:
+        Index(idx.name, *[t.c[c.name] for c in idx.columns], unique=idx.unique)
+    return t
+
+
+# statement objects are reusable, and building a UNION's column proxies costs more than running it
+_tables = {}
+_unions = {}
+
+
+def _archived(name, schema):
+    if (name, schema) not in _tables:
+        _tables[name, schema] = _table(name, schema)
+    return _tables[name, schema]
+
+
+def history(session, model, hot=True):
+    """
+    Rows of `model` (Fee or Exam) in the hot table and every archived year, as a selectable
+    with the same columns (.c). hot=False gives the archived rows only, or None if nothing
+    is archived. With nothing archived it is the table itself, so queries plan as before.
+    """
+    name = model.__tablename__
+    schemas = tuple(attach(session))
+    key = (name, schemas, hot)
+    if key not in _unions:
+        parts = [_archived(name, schema) for schema in schemas]
+        if hot:
+            parts.insert(0, model.__table__)
+        if len(parts) <= 1:
+            return parts[0] if parts else None
+        _unions[key] = union_all(*[select(*t.c) for t in parts]).subquery(f"{name}_all")
+    return _unions[key]
+
+
+def archived_years(session):
+    return session.execute(select(ArchivedYear).order_by(ArchivedYear.label)).scalars().all()
+
+
+# ----- closing a year -----
+def _index_transactions(s, label, alias):
+    fees = _archived("fees", alias)
+    s.execute(delete(ArchivedTransaction).where(ArchivedTransaction.label == label))
+    s.execute(insert(ArchivedTransaction).from_select(
+        ["transaction_id", "receipt_id", "label"],
+        select(fees.c.transaction_id, fees.c.receipt_id, literal(label)).where(fees.c.transaction_id.isnot(None))))
+
+
+def _selection(name):
+    col = YEAR_COLUMN[name]
+    # the newest row of each table stays, so SQLite never hands an archived id out again
+    where = f"{col} >= :start AND {col} < :end AND id < (SELECT max(id) FROM main.{name})"
+    if name == "fees":
+        where += " AND id NOT IN (SELECT fee_id_fk FROM main.receipt_jobs WHERE status != 'done' AND fee_id_fk IS NOT NULL)"
+    return where
+
+
+def _columns(name):
+    return ", ".join(c.name for c in Base.metadata.tables[name].columns)
+
+
+def close_year(label, log=print):
+    """
+    Move the fees and exams rows of closed academic year `label` into a new archive file.
+    Rows whose receipt is still being rendered, and the newest row of each table, stay hot.
+    Returns {'label', 'file', 'fees', 'exams', 'seconds'}.
+    """
+    import dashboard
+    t0 = time.perf_counter()
+    start, end = year_bounds(label)
+    if engine.dialect.name != "sqlite":
+        raise RuntimeError("archive.py archives SQLite databases; partition the tables on PostgreSQL instead")
+    if end > datetime.datetime.utcnow():
+        raise ValueError(f"{label} has not ended yet")
+    s = SessionLocal()
+    try:
+        if s.get(ArchivedYear, label):
+            raise ValueError(f"{label} is already archived")
+    finally:
+        s.close()
+    # fees leave the table the rollup folds from, so everything up to them must be folded first
+    dashboard.refresh_fee_rollup()
+    os.makedirs(config.ARCHIVE_FOLDER, exist_ok=True)
+    file = f"erp-{label}-{datetime.datetime.utcnow():%Y%m%dT%H%M%S}.db"
+    path = os.path.join(config.ARCHIVE_FOLDER, file)
+    part = path + ".part"
+    params = {"start": start.isoformat(" "), "end": end.isoformat(" ")}
+
+    # 1. copy the year into a new file; readers do not see it until archived_years lists it
+    md = MetaData()
+    for name in YEAR_COLUMN:
+        _table(name, metadata=md)
+    arc = create_engine(f"sqlite:///{part}")
+    md.create_all(arc)
+    arc.dispose()
+    try:
+        with engine.connect() as conn:
+            try:
+                # statements on the engine's connection, so the INSERTs queue on the writer lock
+                with conn.begin():
+                    conn.exec_driver_sql("ATTACH DATABASE ? AS arc_new", (part,))
+                    for name in YEAR_COLUMN:
+                        cols = _columns(name)
+                        conn.execute(text(f"INSERT INTO arc_new.{name} ({cols}) SELECT {cols} FROM main.{name} "
+                                          f"WHERE {_selection(name)}"), params)
+            finally:
+                _detach(conn, "arc_new")  # SQLite refuses while the transaction that used it is open
+    except BaseException:
+        os.remove(part)
+        raise
+    plain = create_engine(f"sqlite:///{part}")
+    with plain.connect() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    plain.dispose()
+    os.replace(part, path)
+    log(f"{label}: copied to {file} in {time.perf_counter() - t0:.1f}s")
+
+    # 2. check and delete the hot rows in one transaction
+    s = SessionLocal()
+    try:
+        raw = s.connection().connection.dbapi_connection
+        _attach(raw, file)
+        alias = _alias(file)
+        totals = {k: s.execute(text(f"SELECT {agg} FROM {alias}.{t}")).scalar() for k, (t, agg) in TOTALS.items()}
+        # the first write takes the database write lock: from here on the hot rows cannot change
+        s.add(ArchivedYear(label=label, file=file, starts=start, ends=end, archived_at=now(), **totals))
+        s.flush()
+        for name, model in MODELS.items():
+            cols = _columns(name)
+            ids = f"SELECT id FROM {alias}.{name}"
+            hot = s.execute(text(f"SELECT count(*) FROM main.{name} WHERE id IN ({ids})")).scalar()
+            differ = s.execute(text(f"SELECT count(*) FROM (SELECT {cols} FROM {alias}.{name} EXCEPT "
+                                    f"SELECT {cols} FROM main.{name} WHERE id IN ({ids}))")).scalar()
+            if hot != totals[name] or differ:
+                raise RuntimeError(f"{label}: {name} changed while it was being archived "
+                                   f"({differ} rows differ, {hot} of {totals[name]} still present); run it again")
+        folded = s.execute(select(RollupWatermark.last_id).where(RollupWatermark.name == "fees")).scalar() or 0
+        if (s.execute(text(f"SELECT max(id) FROM {alias}.fees")).scalar() or 0) > folded:
+            raise RuntimeError(f"{label}: some of its fees are not in the fee rollup yet; run it again in a minute")
+        pending = s.execute(select(func.count(ReceiptJob.id)).where(
+            ReceiptJob.status != "done", ReceiptJob.fee_id_fk.in_(select(_archived("fees", alias).c.id)))).scalar()
+        if pending:
+            raise RuntimeError(f"{label}: {pending} receipts were queued while archiving; run it again")
+        s.execute(delete(ReceiptJob).where(ReceiptJob.fee_id_fk.in_(select(_archived("fees", alias).c.id))))
+        _index_transactions(s, label, alias)
+        for name, model in MODELS.items():
+            s.execute(delete(model).where(model.id.in_(select(_archived(name, alias).c.id))))
+        s.commit()
+    except BaseException:
+        s.rollback()
+        s.close()
+        os.remove(path)
+        raise
+    s.close()
+    log(f"{label}: archived {totals['fees']} fees and {totals['exams']} exams in {time.perf_counter() - t0:.1f}s")
+    return {"label": label, "file": file, "fees": totals["fees"], "exams": totals["exams"],
+            "seconds": time.perf_counter() - t0}
+
+
+def restore(label):
+    """Move an archived year's rows back into the hot tables and forget its file. Returns rows moved."""
+    s = SessionLocal()
+    try:
+        year = s.get(ArchivedYear, label)
+        if year is None:
+            raise ValueError(f"{label} is not archived")
+        file = year.file
+        attach(s)
+        moved = 0
+        for name, model in MODELS.items():
+            cols = [c.name for c in model.__table__.columns]
+            moved += s.execute(insert(model).from_select(cols, select(*_archived(name, _alias(file)).c))).rowcount
+        s.execute(delete(ArchivedTransaction).where(ArchivedTransaction.label == label))
+        s.delete(year)
+        s.commit()
+        # connections that attached it keep their handle, but history() no longer reads it
+        path = os.path.join(config.ARCHIVE_FOLDER, file)
+        os.replace(path, path + ".restored")
+        return moved
+    finally:
+        s.close()
+
+
+def reindex():
+    """Rebuild archived_transactions from every archive file; returns the ids recorded."""
+    s = SessionLocal()
+    try:
+        attach(s)
+        for year in archived_years(s):
+            _index_transactions(s, year.label, _alias(year.file))
+        s.commit()
+        return s.execute(select(func.count()).select_from(ArchivedTransaction)).scalar()
+    finally:
+        s.close()
+
+
+def verify(session=None):
+    """
+    Problems with the archives, [] if none: missing or corrupt files, row counts or totals
+    that differ from archived_years, rows outside their year, or ids also in the hot table.
+    """
+    s = session or SessionLocal()
+    problems = []
+    try:
+        for year in archived_years(s):
+            try:
+                attach(s)
+            except RuntimeError as e:
+                problems.append(f"{year.label}: {e}")
+                continue
+            alias = _alias(year.file)
+            check = s.execute(text(f"PRAGMA {alias}.quick_check")).scalar()
+            if check != "ok":
+                problems.append(f"{year.label}: {year.file} failed quick_check: {check}")
+            for key, (t, agg) in TOTALS.items():
+                got, want = s.execute(text(f"SELECT {agg} FROM {alias}.{t}")).scalar(), getattr(year, key)
+                if abs((got or 0) - (want or 0)) > 0.005:
+                    problems.append(f"{year.label}: {key} is {got}, archived_years says {want}")
+            for name, col in YEAR_COLUMN.items():
+                outside = s.execute(text(f"SELECT count(*) FROM {alias}.{name} WHERE {col} < :start OR {col} >= :end"),
+                                    {"start": year.starts.isoformat(" "), "end": year.ends.isoformat(" ")}).scalar()
+                both = s.execute(text(f"SELECT count(*) FROM main.{name} WHERE id IN (SELECT id FROM {alias}.{name})")).scalar()
+                if outside:
+                    problems.append(f"{year.label}: {outside} {name} rows fall outside the year")
+                if both:
+                    problems.append(f"{year.label}: {both} {name} rows are both archived and in the hot table")
+            txns = s.execute(text(f"SELECT count(transaction_id) FROM {alias}.fees")).scalar()
+            known = s.execute(select(func.count()).where(ArchivedTransaction.label == year.label)).scalar()
+            if txns != known:
+                problems.append(f"{year.label}: archived_transactions has {known} of its {txns} transaction ids; "
+                                "run archive.py reindex")
+        return problems
+    finally:
+        if session is None:
+            s.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive closed academic years of fees and exams")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="archived years and the years still in the hot tables")
+    p = sub.add_parser("close", help="archive academic years")
+    p.add_argument("years", nargs="*", metavar="YEAR", help="e.g. 2023-24")
+    p.add_argument("--all-closed", action="store_true", help="every ended year that still has rows")
+    p.add_argument("--vacuum", action="store_true", help="give the freed pages back to the file system afterwards")
+    sub.add_parser("verify", help="check every archive file")
+    p = sub.add_parser("restore", help="move an archived year back into the hot tables")
+    p.add_argument("year")
+    sub.add_parser("reindex", help="rebuild archived_transactions from the archive files")
+    args = parser.parse_args()
+    if args.command == "list":
+        s = SessionLocal()
+        for y in archived_years(s):
+            print(f"{y.label}  archived  {y.fees:>9} fees {y.exams:>9} exams  {y.file}")
+        for label, n in hot_years(s).items():
+            print(f"{label}  hot       {n['fees']:>9} fees {n['exams']:>9} exams")
+        s.close()
+    elif args.command == "close":
+        years = list(args.years)
+        if args.all_closed:
+            s = SessionLocal()
+            done = {y.label for y in archived_years(s)}
+            years += [l for l in hot_years(s) if l < current_year() and l not in done and l not in years]
+            s.close()
+        for label in years:
+            close_year(label)
+        if args.vacuum and years:
+            t0 = time.perf_counter()
+            with engine.connect() as conn:
+                conn.exec_driver_sql("VACUUM")
+            print(f"vacuumed in {time.perf_counter() - t0:.1f}s")
+    elif args.command == "verify":
+        problems = verify()
+        for p in problems:
+            print(p)
+        print(f"{len(problems)} problems.")
+        raise SystemExit(1 if problems else 0)
+    elif args.command == "reindex":
+        print(f"{reindex()} archived transaction ids")
+    else:
+        print(f"restored {restore(args.year)} rows of {args.year}")
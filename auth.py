@@ -0,0 +1,195 @@
+# auth.py
+# Password hashing, login and signed session tokens.
+# New hashes use PASSWORD_SCHEME: bcrypt ("$2b$10$...") or scrypt ("$scrypt$ln=15,r=8,p=1$salt$hash").
+# Hashes in werkzeug's format ("scrypt:32768:8:1$...", "pbkdf2:sha256:...") and hashes
+# weaker than the configured cost still verify, and are rewritten at the next successful
+# login. Verification runs on a bounded thread pool (bcrypt and hashlib.scrypt release the
+# GIL), so a burst of logins uses AUTH_WORKERS cores and scrypt memory at most and a
+# login beyond AUTH_MAX_PENDING is told to retry instead of queueing without limit.
+# A login returns a token signed with SECRET_KEY that carries the user's name and role;
+# reruns check its signature and expiry instead of reading the users table. Changing a
+# user's role or password takes effect at their next login (or after SESSION_TTL_S).
+# While SECRET_KEY is the placeholder from config.py, logins fail and no token is accepted.
+import base64, functools, hashlib, hmac, json, os, threading, time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from sqlalchemy import select, update
+from models import SessionLocal, User
+from metrics import timed
+import config
+
+
+class AuthBusy(Exception):
+    """More than AUTH_MAX_PENDING logins are waiting for verification."""
+
+
+class InsecureSecret(Exception):
+    """COLLEGE_ERP_SECRET is not set, so tokens would be signed with the published placeholder."""
+
+
+def _b64(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _unb64(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+# ----- hashes -----
+def _bcrypt_secret(password):
+    # bcrypt reads at most 72 bytes (and bcrypt>=5 rejects longer input), so longer passwords are pre-hashed
+    raw = password.encode()
+    return base64.b64encode(hashlib.sha256(raw).digest()) if len(raw) > 72 else raw
+
+
+def _scrypt(password, salt, ln, r, p):
+    return hashlib.scrypt(password.encode(), salt=salt, n=2 ** ln, r=r, p=p, maxmem=129 * r * 2 ** ln + 2 ** 20,
+                          dklen=32)
+
+
+def hash_password(password, scheme=None):
+    scheme = scheme or config.PASSWORD_SCHEME
+    if scheme == "bcrypt":
+        import bcrypt
+        return bcrypt.hashpw(_bcrypt_secret(password), bcrypt.gensalt(config.BCRYPT_ROUNDS)).decode()
+    if scheme == "scrypt":
+        ln, r, p, salt = config.SCRYPT_LOG_N, 8, 1, os.urandom(16)
+        return f"$scrypt$ln={ln},r={r},p={p}${_b64(salt)}${_b64(_scrypt(password, salt, ln, r, p))}"
+    raise ValueError(f"unknown PASSWORD_SCHEME {scheme!r}")
+
+
+def verify_password(hashed, password):
+    """True if `password` matches `hashed` in any supported format."""
+    if not hashed:
+        return False
+    if hashed.startswith("$2"):
+        import bcrypt
+        return bcrypt.checkpw(_bcrypt_secret(password), hashed.encode())
+    if hashed.startswith("$scrypt$"):
+        _, _, params, salt, digest = hashed.split("$")
+        p = dict(kv.split("=") for kv in params.split(","))
+        return hmac.compare_digest(_scrypt(password, _unb64(salt), int(p["ln"]), int(p["r"]), int(p["p"])),
+                                   _unb64(digest))
+    from werkzeug.security import check_password_hash  # hashes made before auth.py
+    return check_password_hash(hashed, password)
+
+
+def needs_rehash(hashed):
+    """True if `hashed` is not in the configured scheme or is cheaper than the configured cost."""
+    if config.PASSWORD_SCHEME == "bcrypt":
+        return not hashed.startswith("$2") or int(hashed.split("$")[2]) < config.BCRYPT_ROUNDS
+    if config.PASSWORD_SCHEME == "scrypt":
+        return not hashed.startswith("$scrypt$") or int(hashed.split("$")[2].split(",")[0][3:]) < config.SCRYPT_LOG_N
+    return False
+
+
+# ----- verification pool -----
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(config.AUTH_MAX_PENDING)
+_dummy_hash = None
+
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(config.AUTH_WORKERS, thread_name_prefix="auth")
+        return _pool
+
+
+def _check(hashed, password):
+    """Runs on the pool: (matched, new hash or None)."""
+    global _dummy_hash
+    if hashed is None:
+        # unknown user: spend the same time as a real check so names cannot be probed by timing
+        if _dummy_hash is None:
+            _dummy_hash = hash_password("not a password")
+        verify_password(_dummy_hash, password)
+        return False, None
+    if not verify_password(hashed, password):
+        return False, None
+    return True, hash_password(password) if needs_rehash(hashed) else None
+
+
+def _submit(fn, *args):
+    if not _slots.acquire(blocking=False):
+        raise AuthBusy()
+    try:
+        fut = _executor().submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    fut.add_done_callback(lambda _: _slots.release())
+    try:
+        return fut.result(timeout=config.AUTH_TIMEOUT_S)
+    except FutureTimeout:
+        fut.cancel()  # still queued: drop it; already running: it finishes and is discarded
+        raise AuthBusy()
+
+
+@timed("auth:login")
+def login(username, password):
+    """
+    Check a username and password. Returns {'user': {'id','username','role','display_name'},
+    'token'} or None. Raises AuthBusy when too many logins are waiting and InsecureSecret
+    when SECRET_KEY is the placeholder.
+    """
+    _key()
+    s = SessionLocal()
+    try:
+        row = s.execute(select(User.id, User.username, User.hashed_password, User.role, User.display_name)
+                        .where(User.username == username)).first()
+    finally:
+        s.close()  # no connection is held while the hash is checked
+    ok, new_hash = _submit(_check, row.hashed_password if row else None, password or "")
+    if not ok:
+        return None
+    if new_hash:
+        s = SessionLocal()
+        try:
+            # only if nobody changed the password meanwhile
+            s.execute(update(User).where(User.id == row.id, User.hashed_password == row.hashed_password)
+                      .values(hashed_password=new_hash))
+            s.commit()
+        finally:
+            s.close()
+    user = {"id": row.id, "username": row.username, "role": row.role, "display_name": row.display_name}
+    return {"user": user, "token": issue_token(user)}
+
+
+# ----- session tokens -----
+def _key():
+    if config.SECRET_KEY == config.PLACEHOLDER_SECRET_KEY:
+        raise InsecureSecret("COLLEGE_ERP_SECRET is not set; set it to a strong random string")
+    return config.SECRET_KEY.encode()
+
+
+def _sign(payload):
+    return _b64(hmac.new(_key(), payload.encode(), hashlib.sha256).digest())
+
+
+def issue_token(user, ttl=None):
+    body = dict(user, exp=int(time.time()) + (config.SESSION_TTL_S if ttl is None else ttl))
+    payload = _b64(json.dumps(body, separators=(",", ":"), sort_keys=True).encode())
+    return f"{payload}.{_sign(payload)}"
+
+
+@functools.lru_cache(maxsize=4096)
+def _decode(token):
+    payload, _, sig = token.partition(".")
+    if not sig or not hmac.compare_digest(sig, _sign(payload)):
+        return None
+    try:
+        return json.loads(_unb64(payload))
+    except ValueError:
+        return None
+
+
+def read_token(token):
+    """The user dict a valid, unexpired token was issued for, else None. No database access."""
+    if config.SECRET_KEY == config.PLACEHOLDER_SECRET_KEY:
+        return None
+    body = _decode(token) if token else None
+    if body is None or body["exp"] <= time.time():
+        return None
+    return {k: v for k, v in body.items() if k != "exp"}
@@ -0,0 +1,229 @@
+# backup.py
+# Streaming backup of the five ERP tables. All tables are read from one read
+# transaction (a consistent snapshot) in fixed-size chunks, so memory stays bounded by
+# chunk_rows regardless of table size. Tables can be written in parallel threads; they
+# share the snapshot connection for fetching and compress/write outside its lock.
+# Archived years (archive.py) never change, so each archive file is copied once into
+# <out>/archive instead of being exported again.
+#   python backup.py [--format csv|parquet] [--compression gzip|zstd|none] [--incremental] [--parallel]
+import argparse, csv, datetime, gzip, io, json, os, shutil, threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import select
+from models import engine, Student, Admission, Fee, HostelAllocation, Exam, ArchivedYear
+from config import BACKUP_FOLDER, ARCHIVE_FOLDER
+from metrics import timed
+
+# table name -> (model, watermark column used for incremental exports)
+TABLES = {
+    "students": (Student, Student.created_at),
+    "admissions": (Admission, Admission.submitted_at),
+    "fees": (Fee, Fee.timestamp),
+    "hostel": (HostelAllocation, HostelAllocation.requested_at),
+    "exams": (Exam, Exam.graded_at),
+}
+MANIFEST = "manifest.json"
+# rows newer than this may belong to transactions that commit after the snapshot, so the
+# next incremental export starts this far back (a few rows may appear in two backups)
+WATERMARK_LAG = datetime.timedelta(seconds=60)
+TS_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+
+@contextmanager
+def snapshot_connection():
+    """A connection holding one read transaction for the duration of the block."""
+    conn = engine.connect()
+    try:
+        if engine.dialect.name == "postgresql":
+            conn = conn.execution_options(isolation_level="REPEATABLE READ", stream_results=True)
+            conn.begin()
+        else:
+            conn.begin()
+            # pysqlite only opens a transaction before writes; take the read snapshot explicitly
+            conn.exec_driver_sql("BEGIN")
+        yield conn
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def sqlite_snapshot(path):
+    """Copy the whole SQLite database (including WAL contents) to `path` with the backup API."""
+    import sqlite3
+    if engine.dialect.name != "sqlite":
+        raise RuntimeError("sqlite_snapshot only works for SQLite databases")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    raw = engine.raw_connection()
+    dst = sqlite3.connect(path)
+    try:
+        raw.driver_connection.backup(dst)
+    finally:
+        dst.close()
+        raw.close()
+    return path
+
+
+def _open(path, compression):
+    if compression == "gzip":
+        return gzip.open(path, "wt", newline="", encoding="utf-8", compresslevel=6)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd compression needs the 'zstandard' package")
+        raw = open(path, "wb")
+        return io.TextIOWrapper(zstandard.ZstdCompressor(level=3).stream_writer(raw), newline="", encoding="utf-8")
+    return open(path, "w", newline="", encoding="utf-8")
+
+
+def _csv_writer(path, columns, compression):
+    f = _open(path, compression)
+    w = csv.writer(f)
+    w.writerow(columns)
+    return w.writerows, f.close
+
+
+def _parquet_writer(path, model):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("parquet output needs the 'pyarrow' package")
+    from sqlalchemy import Integer, Float, Boolean
+    types = []
+    for c in model.__table__.columns:
+        t = pa.int64() if isinstance(c.type, Integer) else pa.float64() if isinstance(c.type, Float) \
+            else pa.bool_() if isinstance(c.type, Boolean) else pa.string()
+        types.append((c.name, t))
+    schema = pa.schema(types)
+    out = pq.ParquetWriter(path, schema, compression="zstd")
+    strings = [i for i, (_, t) in enumerate(types) if t == pa.string()]
+
+    def write(rows):
+        cols = list(zip(*rows))
+        for i in strings:
+            cols[i] = [None if v is None else str(v) for v in cols[i]]
+        out.write_table(pa.Table.from_arrays([pa.array(c, type=t) for c, (_, t) in zip(cols, types)], schema=schema))
+    return write, out.close
+
+
+def _export_table(name, result, fetch_lock, path, fmt, compression, chunk_rows):
+    model = TABLES[name][0]
+    if fmt == "parquet":
+        write, close = _parquet_writer(path, model)
+    else:
+        write, close = _csv_writer(path, [c.name for c in model.__table__.columns], compression)
+    rows = 0
+    try:
+        while True:
+            with fetch_lock:
+                chunk = result.fetchmany(chunk_rows)
+            if not chunk:
+                break
+            write(chunk)
+            rows += len(chunk)
+    finally:
+        close()
+        result.close()
+    return rows
+
+
+def copy_archives(out_folder=BACKUP_FOLDER):
+    """Copy archive files not yet in <out_folder>/archive; returns the names copied."""
+    with engine.connect() as conn:
+        files = conn.execute(select(ArchivedYear.file)).scalars().all()
+    dest = os.path.join(out_folder, "archive")
+    copied = []
+    for file in files:
+        target = os.path.join(dest, file)
+        if not os.path.exists(target):
+            os.makedirs(dest, exist_ok=True)
+            shutil.copy2(os.path.join(ARCHIVE_FOLDER, file), target + ".tmp")
+            os.replace(target + ".tmp", target)
+            copied.append(file)
+    return copied
+
+
+def read_manifest(out_folder=BACKUP_FOLDER):
+    path = os.path.join(out_folder, MANIFEST)
+    if not os.path.exists(path):
+        return {"backups": []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _last_watermarks(manifest):
+    marks = {}
+    for b in manifest["backups"]:
+        for name, t in b["tables"].items():
+            if t.get("watermark_to"):
+                marks[name] = t["watermark_to"]
+    return marks
+
+
+@timed("export:backup")
+def export_backup(fmt="csv", compression="gzip", incremental=False, parallel=False,
+                  chunk_rows=10000, tables=None, out_folder=BACKUP_FOLDER):
+    """
+    Export tables from one snapshot. With incremental=True only rows whose watermark column
+    is newer than the previous backup's watermark are written. Every run is appended to
+    <out_folder>/manifest.json. Returns the manifest entry:
+      {'id', 'created_at', 'mode', 'format', 'tables': {name: {'path','rows','watermark_from','watermark_to'}},
+       'archives': [archive files copied by this run]}
+    """
+    if fmt not in ("csv", "parquet"):
+        raise ValueError("fmt must be 'csv' or 'parquet'")
+    compression = None if compression in (None, "none") else compression
+    os.makedirs(out_folder, exist_ok=True)
+    names = tables or list(TABLES)
+    manifest = read_manifest(out_folder)
+    since = _last_watermarks(manifest) if incremental else {}
+    started = datetime.datetime.utcnow()
+    stamp = started.strftime("%Y%m%d_%H%M%S")
+    ext = ".parquet" if fmt == "parquet" else ".csv" + {"gzip": ".gz", "zstd": ".zst", None: ""}[compression]
+    entry = {"id": stamp, "created_at": started.strftime(TS_FORMAT), "mode": "incremental" if incremental else "full",
+             "format": fmt, "compression": compression if fmt == "csv" else "zstd", "tables": {}}
+    watermark_to = (started - WATERMARK_LAG).strftime(TS_FORMAT)
+    fetch_lock = threading.Lock()
+    with snapshot_connection() as conn:
+        jobs = []
+        for name in names:
+            model, col = TABLES[name]
+            stmt = select(*model.__table__.columns).order_by(model.__table__.c.id)
+            frm = since.get(name)
+            if frm:
+                stmt = stmt.where(col > datetime.datetime.strptime(frm, TS_FORMAT))
+            suffix = "_incr" if incremental else ""
+            path = os.path.join(out_folder, f"{name}_{stamp}{suffix}{ext}")
+            # every cursor is opened inside the same transaction before any thread starts
+            jobs.append((name, conn.execute(stmt), path, frm))
+        run = lambda j: _export_table(j[0], j[1], fetch_lock, j[2], fmt, compression, chunk_rows)
+        if parallel:
+            with ThreadPoolExecutor(min(len(jobs), os.cpu_count() or 1) or 1) as pool:
+                counts = list(pool.map(run, jobs))
+        else:
+            counts = [run(j) for j in jobs]
+    for (name, _, path, frm), n in zip(jobs, counts):
+        entry["tables"][name] = {"path": os.path.basename(path), "rows": n,
+                                 "watermark_from": frm, "watermark_to": watermark_to}
+    entry["archives"] = copy_archives(out_folder)
+    manifest["backups"].append(entry)
+    tmp = os.path.join(out_folder, MANIFEST + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(out_folder, MANIFEST))
+    return entry
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming ERP backup")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--compression", choices=["gzip", "zstd", "none"], default="gzip")
+    parser.add_argument("--incremental", action="store_true")
+    parser.add_argument("--parallel", action="store_true")
+    parser.add_argument("--chunk-rows", type=int, default=10000)
+    parser.add_argument("--out", default=BACKUP_FOLDER)
+    args = parser.parse_args()
+    e = export_backup(args.format, args.compression, args.incremental, args.parallel, args.chunk_rows, out_folder=args.out)
+    for name, t in e["tables"].items():
+        print(f"{name}: {t['rows']} rows -> {os.path.join(args.out, t['path'])}")
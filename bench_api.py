@@ -0,0 +1,104 @@
+# bench_api.py
+# Starts api.py under uvicorn with several workers on a throwaway database and measures
+# requests/sec and latency percentiles for read and write endpoints.
+#   python bench_api.py --workers 4 --concurrency 32 --requests 3000
+import argparse, os, random, subprocess, sys, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--workers", type=int, default=4)
+parser.add_argument("--concurrency", type=int, default=32)
+parser.add_argument("--requests", type=int, default=3000, help="per scenario")
+parser.add_argument("--students", type=int, default=5000)
+parser.add_argument("--port", type=int, default=8765)
+parser.add_argument("--scenarios", nargs="+",
+                    default=["list_students", "get_student", "list_fees", "create_fee", "create_exams"])
+args = parser.parse_args()
+
+tmpdir = tempfile.mkdtemp(prefix="erp_bench_api_")
+os.environ["COLLEGE_ERP_DB_PATH"] = os.path.join(tmpdir, "api.db")
+
+import requests
+from sqlalchemy import insert
+from models import init_db, SessionLocal, Student
+import config
+
+BASE = f"http://127.0.0.1:{args.port}"
+HEADERS = {"X-API-Key": config.API_KEY}
+
+
+def start_server():
+    here = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.Popen([sys.executable, os.path.join(here, "api.py"), "--port", str(args.port),
+                             "--workers", str(args.workers)], cwd=here, env=os.environ.copy())
+    for _ in range(100):
+        try:
+            requests.get(BASE + "/health", timeout=1)
+            return proc
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("api server did not start")
+
+
+def scenario_requests(name, n):
+    rng = random.Random(name)
+    sid = lambda: f"BENCH{rng.randint(1, args.students):06d}"
+    for i in range(n):
+        if name == "list_students":
+            yield "GET", "/students", {"params": {"after": rng.randint(0, args.students), "limit": 50,
+                                                  "fields": "student_id,name,program"}}
+        elif name == "get_student":
+            yield "GET", f"/students/{sid()}", {}
+        elif name == "list_fees":
+            yield "GET", "/fees", {"params": {"student_id": sid(), "fields": "receipt_id,amount,timestamp"}}
+        elif name == "create_fee":
+            yield "POST", "/fees", {"json": {"student_id": sid(), "amount": 100.0, "transaction_id": f"bench-{i}"}}
+        elif name == "create_exams":
+            yield "POST", "/exams", {"json": [{"student_id": sid(), "subject_code": f"S{k}", "marks": rng.randint(0, 100)}
+                                              for k in range(10)]}
+
+
+def run(name):
+    http = threading.local()
+
+    def call(req):
+        method, path, kw = req
+        if not hasattr(http, "s"):
+            http.s = requests.Session()
+        t0 = time.perf_counter()
+        r = http.s.request(method, BASE + path, headers=HEADERS, timeout=60, **kw)
+        return time.perf_counter() - t0, r.status_code
+
+    reqs = list(scenario_requests(name, args.requests))
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        out = list(pool.map(call, reqs))
+    wall = time.perf_counter() - t0
+    lat = sorted(dt for dt, _ in out)
+    errors = sum(1 for _, code in out if code >= 400)
+    pct = lambda p: lat[min(len(lat) - 1, int(len(lat) * p))] * 1000
+    return len(out) / wall, pct(0.50), pct(0.99), errors
+
+
+def main():
+    init_db()
+    s = SessionLocal()
+    s.execute(insert(Student), [{"student_id": f"BENCH{i:06d}", "name": f"Student {i}", "program": "BSc"}
+                                for i in range(1, args.students + 1)])
+    s.commit()
+    s.close()
+    proc = start_server()
+    try:
+        print(f"{args.workers} workers, {args.concurrency} concurrent clients, {args.requests} requests per scenario")
+        print(f"{'scenario':>14} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for name in args.scenarios:
+            rps, p50, p99, errors = run(name)
+            print(f"{name:>14} {rps:>8.0f} {p50:>8.1f} {p99:>8.1f} {errors:>7}")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# bench_archive.py
+# Seeds a throwaway database with seed_data.py (or uses --db), times the hot paths, archives
+# every closed academic year with archive.py, verifies the archives and times the same
+# calls again. "history" rows read the archived years too (statements, dues refresh, ledger
+# verify) and show what the UNION over attached files costs. The ledger, dues snapshot,
+# fee rollup and results must come out the same after archiving; the run fails if not.
+#   python bench_archive.py --students 20000 [--seconds 2]
+import argparse, datetime, os, random, shutil, statistics, tempfile, time
+
+parser = argparse.ArgumentParser(description="Hot-path latency before and after archiving closed years")
+parser.add_argument("--students", type=int, default=20000)
+parser.add_argument("--seed", type=int, default=1)
+parser.add_argument("--db", help="copy this database instead of seeding one (it is not modified)")
+parser.add_argument("--seconds", type=float, default=2.0, help="time per call")
+parser.add_argument("--no-vacuum", action="store_true", help="leave the freed pages in the database file")
+args = parser.parse_args()
+
+tmpdir = tempfile.mkdtemp(prefix="erp_bench_archive_")
+os.environ["COLLEGE_ERP_DB_PATH"] = os.path.join(tmpdir, "archive.db")
+os.environ["ARCHIVE_FOLDER"] = os.path.join(tmpdir, "archive")
+os.environ["BACKUP_FOLDER"] = os.path.join(tmpdir, "backups")
+if args.db:
+    shutil.copy(args.db, os.environ["COLLEGE_ERP_DB_PATH"])
+
+from sqlalchemy import select, func, text
+from models import init_db, SessionLocal, engine, Student, Fee, Exam, StudentDue
+from listing import recent_payments, recent_grades
+from dashboard import dashboard_metrics, rebuild_fee_rollup
+from backup import export_backup
+import archive, dues, ledger, results, seed_data
+
+
+def sample_students(s, rng, n=200):
+    top = s.execute(select(func.max(Student.id))).scalar()
+    return [rng.randint(1, top) for _ in range(n)]
+
+
+def statement(s, sid):
+    fees, exams = archive.history(s, Fee), archive.history(s, Exam)
+    s.execute(select(fees).where(fees.c.student_id_fk == sid).order_by(fees.c.timestamp)).all()
+    s.execute(select(exams).where(exams.c.student_id_fk == sid).order_by(exams.c.graded_at)).all()
+
+
+def calls(s, rng, students):
+    month_ago = datetime.date.today() - datetime.timedelta(days=30)
+    out_dir = os.path.join(tmpdir, "csv")
+    return {
+        "payments: first page": ("hot", lambda: recent_payments(s)),
+        "payments: mode=Cheque": ("hot", lambda: recent_payments(s, mode="Cheque")),
+        "payments: last 30 days": ("hot", lambda: recent_payments(s, date_from=month_ago)),
+        "grades: status=Fail": ("hot", lambda: recent_grades(s, status="Fail")),
+        "fees this month (sum)": ("hot", lambda: s.execute(select(func.sum(Fee.amount)).where(
+            Fee.timestamp >= datetime.datetime.combine(month_ago, datetime.time.min))).scalar()),
+        "dashboard": ("hot", lambda: dashboard_metrics(s, refresh=False)),
+        "csv backup fees+exams": ("hot", lambda: export_backup(compression="none", tables=["fees", "exams"],
+                                                              out_folder=out_dir)),
+        "statement (all years)": ("history", lambda: statement(s, rng.choice(students))),
+        "dues refresh": ("history", lambda: dues.refresh()),
+        "ledger verify": ("history", lambda: ledger.verify(s)),
+    }
+
+
+def measure(s, rng, students):
+    out = {}
+    for name, (kind, fn) in calls(s, rng, students).items():
+        fn()  # warm-up
+        times = []
+        t_start = time.perf_counter()
+        while len(times) < 3 or time.perf_counter() - t_start < args.seconds:
+            t0 = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t0)
+        s.rollback()
+        out[name] = (kind, statistics.median(times) * 1000)
+    return out
+
+
+def fingerprint(s):
+    """Derived numbers that archiving must not change."""
+    return {"total_fees": round(dashboard_metrics(s, refresh=False)["total_fees"], 2),
+            "ledger_mismatches": len(ledger.verify(s)),
+            "outstanding": round(s.execute(select(func.sum(StudentDue.outstanding))).scalar() or 0.0, 2),
+            "cgpa_sum": round(s.execute(text("SELECT total(cgpa) FROM student_results")).scalar(), 2)}
+
+
+def sizes(s):
+    rows = {m.__tablename__: s.execute(select(func.count()).select_from(m)).scalar() for m in (Fee, Exam)}
+    return rows, os.path.getsize(os.environ["COLLEGE_ERP_DB_PATH"]) / 2 ** 20
+
+
+def main():
+    init_db()
+    s = SessionLocal()
+    if not s.execute(select(Student.id).limit(1)).first():
+        print(f"seeding {args.students} students")
+        seed_data.generate(args.students, args.seed, log=lambda *_: None)
+    rng = random.Random(args.seed)
+    students = sample_students(s, rng)
+    rows, mb = sizes(s)
+    print(f"before: {rows['fees']} fees, {rows['exams']} exams in the hot tables, {mb:.1f} MB")
+    before, fp_before = measure(s, rng, students), fingerprint(s)
+    s.close()
+
+    t0 = time.perf_counter()
+    s = SessionLocal()
+    years = [l for l in archive.hot_years(s) if l < archive.current_year()]
+    s.close()
+    for label in years:
+        archive.close_year(label, log=lambda *_: None)
+    if not args.no_vacuum:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
+    print(f"archived {', '.join(years)} in {time.perf_counter() - t0:.1f}s")
+    t0 = time.perf_counter()
+    problems = archive.verify()
+    print(f"verified in {time.perf_counter() - t0:.2f}s: {len(problems)} problems")
+    for p in problems:
+        print(f"  {p}")
+
+    s = SessionLocal()
+    rows, mb = sizes(s)
+    archived_mb = sum(os.path.getsize(os.path.join(os.environ["ARCHIVE_FOLDER"], y.file)) for y in archive.archived_years(s)) / 2 ** 20
+    print(f"after: {rows['fees']} fees, {rows['exams']} exams in the hot tables, {mb:.1f} MB (+{archived_mb:.1f} MB archived)")
+    # rebuilt from the archives, the derived tables must match what was there before
+    ledger.rebuild()
+    rebuild_fee_rollup()
+    results.compute_results(full=True)
+    after, fp_after = measure(s, rng, students), fingerprint(s)
+    s.close()
+
+    print(f"\n{'call':<26} {'reads':<8} {'before ms':>10} {'after ms':>10} {'change':>8}")
+    for name, (kind, ms) in before.items():
+        new = after[name][1]
+        print(f"{name:<26} {kind:<8} {ms:>10.2f} {new:>10.2f} {(new - ms) / ms:>+8.0%}")
+    print(f"\nderived data before: {fp_before}\n             after:  {fp_after}")
+    if problems or fp_before != fp_after:
+        raise SystemExit("archiving changed the data")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# bench_dashboard.py
+# Seeds a throwaway database with Fee rows and times the Dashboard page data:
+# the old load-everything path vs. dashboard.dashboard_metrics.
+#   python bench_dashboard.py --sizes 10000 100000 300000
+import argparse, os, random, tempfile, time, datetime
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 300000])
+parser.add_argument("--students", type=int, default=5000)
+parser.add_argument("--repeat", type=int, default=3)
+parser.add_argument("--skip-legacy-above", type=int, default=300000)
+args = parser.parse_args()
+
+tmpdir = tempfile.mkdtemp(prefix="erp_bench_")
+os.environ["COLLEGE_ERP_DB_PATH"] = os.path.join(tmpdir, "bench.db")
+
+import pandas as pd
+from sqlalchemy import insert
+from models import init_db, SessionLocal, Student, Fee, HostelAllocation
+from hostel import add_rooms, allocate, ANY
+from dashboard import dashboard_metrics, refresh_fee_rollup
+
+
+def legacy_metrics(s):
+    total_students = s.query(Student).count()
+    total_fees_val = 0.0
+    for row in s.query(Fee).all():
+        total_fees_val += (row.amount or 0.0)
+    fees = pd.DataFrame([{"amount": f.amount, "ts": f.timestamp} for f in s.query(Fee).all()])
+    fees['month'] = pd.to_datetime(fees['ts']).dt.to_period('M').astype(str)
+    fees.groupby('month')['amount'].sum().reset_index()
+    hostel_rows = pd.DataFrame([{"block": h.block, "status": h.status} for h in s.query(HostelAllocation).all()])
+    hostel_rows.groupby('block').size().reset_index(name='count')
+    return total_students, total_fees_val
+
+
+def seed_fees(s, start, count, n_students, rng):
+    base = datetime.datetime(2020, 1, 1)
+    rows = []
+    for i in range(start, start + count):
+        rows.append({"receipt_id": f"REC-B{i}", "student_id_fk": rng.randint(1, n_students),
+                     "name": "Bench", "amount": float(rng.randint(500, 50000)), "payment_mode": "UPI",
+                     "transaction_id": f"TXN-B{i}", "balance_after": 0.0, "purpose": "Tuition",
+                     "timestamp": base + datetime.timedelta(minutes=rng.randint(0, 60 * 24 * 365 * 5))})
+        if len(rows) == 20000:
+            s.execute(insert(Fee), rows)
+            rows = []
+    if rows:
+        s.execute(insert(Fee), rows)
+    s.commit()
+
+
+def best_of(fn, s):
+    best = None
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        fn(s)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def main():
+    rng = random.Random(42)
+    init_db()
+    s = SessionLocal()
+    s.execute(insert(Student), [{"student_id": f"BENCH{i:06d}", "name": f"Student {i}"}
+                                for i in range(1, args.students + 1)])
+    rooms_per_block = args.students // 12 + 1
+    for block in "ABC":
+        add_rooms(s, block, [str(n) for n in range(1, rooms_per_block + 1)], "double", 2)
+    s.commit()
+    allocate(s, [{"student_id": f"BENCH{i:06d}", "preferences": [(rng.choice("ABC"), ANY)]}
+                 for i in range(1, args.students // 2)])
+    s.commit()
+    seeded = 0
+    print(f"{'fee rows':>10} {'fold (ms)':>10} {'metrics (ms)':>14} {'legacy (ms)':>12}")
+    for size in sorted(args.sizes):
+        seed_fees(s, seeded, size - seeded, args.students, rng)
+        seeded = size
+        t0 = time.perf_counter()
+        refresh_fee_rollup()
+        fold_t = time.perf_counter() - t0
+        new_t = best_of(dashboard_metrics, s)
+        legacy = "-"
+        if size <= args.skip_legacy_above:
+            legacy = f"{best_of(legacy_metrics, s) * 1000:.1f}"
+        s.expunge_all()
+        print(f"{size:>10} {fold_t * 1000:>10.1f} {new_t * 1000:>14.1f} {legacy:>12}")
+    s.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# bench_documents.py
+# Seeds a throwaway database with seed_data.py (or copies --db, reading its archive folder), then:
+#   - loads one part's data with documents.load (one query per table) and the way a
+#     per-student loop would, through the Student.fees/exams/hostels relationships;
+#   - renders every student's fee statement and mark sheet with documents.py for each
+#     --processes value, reporting documents/sec and the parent's peak RSS;
+#   - deletes the last two ZIPs and resumes the run, which must render only those two.
+#   python bench_documents.py --students 20000 [--processes 1 4 8]
+import argparse, os, resource, shutil, tempfile, time, zipfile
+
+parser = argparse.ArgumentParser(description="Fee statement and mark sheet generation benchmark")
+parser.add_argument("--students", type=int, default=20000)
+parser.add_argument("--seed", type=int, default=1)
+parser.add_argument("--db", help="copy this database instead of seeding one (it is not modified)")
+parser.add_argument("--processes", type=int, nargs="+", default=[os.cpu_count() or 1])
+parser.add_argument("--part-size", type=int, default=1000)
+args = parser.parse_args()
+
+tmpdir = tempfile.mkdtemp(prefix="erp_bench_documents_")
+os.environ["COLLEGE_ERP_DB_PATH"] = os.path.join(tmpdir, "documents.db")
+os.environ["DOCUMENTS_FOLDER"] = os.path.join(tmpdir, "documents")
+if args.db:
+    shutil.copy(args.db, os.environ["COLLEGE_ERP_DB_PATH"])
+    # archived years are only read, so the copy uses the original's archive files
+    os.environ.setdefault("ARCHIVE_FOLDER", os.path.join(os.path.dirname(os.path.abspath(args.db)), "archive"))
+else:
+    os.environ["ARCHIVE_FOLDER"] = os.path.join(tmpdir, "archive")
+
+from sqlalchemy import select
+from models import init_db, SessionLocal, Student
+import documents, dues, results, seed_data
+
+
+def per_student(s, pks):
+    # what a loop over students costs: three lazy loads per student, hot tables only
+    for student in s.execute(select(Student).where(Student.id.in_(pks))).scalars():
+        list(student.fees), list(student.exams), list(student.hostels)
+
+
+def loading():
+    s = SessionLocal()
+    pks = documents.select_students(s)[:args.part_size]
+    documents.load(s, pks[:10])  # imports results.py
+    s.rollback()
+    t0 = time.perf_counter()
+    documents.load(s, pks)
+    batched = time.perf_counter() - t0
+    s.rollback()
+    t0 = time.perf_counter()
+    per_student(s, pks)
+    looped = time.perf_counter() - t0
+    s.close()
+    print(f"loading {len(pks)} students: documents.load {batched * 1000:.0f} ms, "
+          f"per-student relationships {looped * 1000:.0f} ms")
+
+
+def zip_mb(folder):
+    return sum(os.path.getsize(os.path.join(folder, f)) for f in os.listdir(folder) if f.endswith(".zip")) / 2 ** 20
+
+
+def main():
+    init_db()
+    s = SessionLocal()
+    if not s.execute(select(Student.id).limit(1)).first():
+        print(f"seeding {args.students} students")
+        seed_data.generate(args.students, args.seed, log=lambda *_: None)
+        dues.refresh()
+        results.compute_results(full=True)
+    s.close()
+    loading()
+
+    print(f"\n{'processes':>9} {'documents':>10} {'seconds':>8} {'docs/s':>8} {'ZIP MB':>8} {'peak RSS MB':>12}")
+    folder = None
+    for n in args.processes:
+        folder = documents.plan(os.path.join(tmpdir, f"run-{n}"), part_size=args.part_size)
+        stats = documents.run(folder, n, log=lambda *_: None)
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"{n:>9} {stats['documents']:>10} {stats['seconds']:>8.1f} "
+              f"{stats['documents'] / stats['seconds']:>8.0f} {zip_mb(folder):>8.1f} {rss:>12.0f}")
+        if stats["failed"]:
+            raise SystemExit(f"{stats['failed']} documents failed")
+
+    parts = sorted(f for f in os.listdir(folder) if f.endswith(".zip"))
+    for f in parts[-2:]:
+        os.remove(os.path.join(folder, f))
+    stats = documents.run(folder, args.processes[-1], log=lambda *_: None)
+    print(f"\nresume: rendered {stats['parts']} parts, skipped {stats['skipped']}")
+    for f in parts:
+        with zipfile.ZipFile(os.path.join(folder, f)) as zf:
+            if zf.testzip() is not None:
+                raise SystemExit(f"{f} is damaged")
+    if stats["parts"] != min(2, len(parts)):
+        raise SystemExit("resume rendered the wrong parts")
+
+
+if __name__ == "__main__":
+    main()
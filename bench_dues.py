@@ -0,0 +1,77 @@
+# bench_dues.py
+# Seeds a throwaway database with students, a fee structure and payments, then times a
+# full dues refresh, payments applied through the ledger, defaulters pages and the CSV
+# export. It also checks the incrementally kept snapshot against a fresh recompute.
+#   python bench_dues.py --students 100000 --payments 300000
+import argparse, datetime, io, os, random, tempfile, time
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--students", type=int, default=100000)
+parser.add_argument("--payments", type=int, default=300000)
+parser.add_argument("--live", type=int, default=2000, help="payments ingested after the refresh")
+args = parser.parse_args()
+
+tmpdir = tempfile.mkdtemp(prefix="erp_bench_dues_")
+os.environ["COLLEGE_ERP_DB_PATH"] = os.path.join(tmpdir, "dues.db")
+
+from sqlalchemy import insert, select
+from models import init_db, SessionLocal, Student, Fee, FeeStructure, StudentDue, now
+from payment_ingest import ingest_and_commit
+from dues import refresh, defaulters, dues_summary, write_defaulters_csv
+
+PROGRAMS = ["BSc", "BCom", "BA", "BTech"]
+
+
+def seed(s, rng):
+    s.execute(insert(FeeStructure), [{"program": p, "year": y, "term": f"T{t}", "head": "Tuition",
+                                      "amount": 25000.0 + 5000 * y, "due_date": datetime.date(2020, 1, 1)}
+                                     for p in PROGRAMS for y in range(1, 5) for t in (1, 2)])
+    s.execute(insert(Student), [{"student_id": f"D{i:07d}", "name": f"Student {i}", "program": rng.choice(PROGRAMS),
+                                 "year": str(rng.randint(1, 4))} for i in range(1, args.students + 1)])
+    ts = now() - datetime.timedelta(days=30)
+    for start in range(0, args.payments, 50000):
+        s.execute(insert(Fee), [{"receipt_id": f"R{i}", "transaction_id": f"T{i}", "timestamp": ts,
+                                 "student_id_fk": rng.randint(1, args.students), "amount": float(rng.choice([5000, 10000, 30000])),
+                                 "payment_mode": "Cash"} for i in range(start, min(start + 50000, args.payments))])
+    s.commit()
+
+
+def timed(label, fn):
+    t0 = time.perf_counter()
+    out = fn()
+    print(f"{label:>34} {time.perf_counter() - t0:>8.3f}s")
+    return out
+
+
+def main():
+    rng = random.Random(5)
+    init_db()
+    s = SessionLocal()
+    timed(f"seed {args.students} students", lambda: seed(s, rng))
+    timed("full refresh (one INSERT ... SELECT)", refresh)
+    live = [{"student_id": f"D{rng.randint(1, args.students):07d}", "amount": 1000.0, "transaction_id": f"live-{i}"}
+            for i in range(args.live)]
+    t = timed(f"{args.live} payments via ledger", lambda: [ingest_and_commit(live[i:i + 50]) for i in range(0, len(live), 50)])
+    s.expire_all()
+    timed("summary", lambda: dues_summary(s))
+    rows, cursor = timed("defaulters first page", lambda: defaulters(s))
+
+    def pages():
+        c = cursor
+        for _ in range(20):
+            _, c = defaulters(s, cursor=c)
+    timed("defaulters 20 more pages", pages)
+    n = timed("CSV export", lambda: write_defaulters_csv(s, io.StringIO()))
+    print(f"{n} defaulters, {dues_summary(s)['outstanding']:.0f} outstanding")
+    kept = dict(s.execute(select(StudentDue.student_id_fk, StudentDue.outstanding)).all())
+    s.close()
+    refresh()
+    s = SessionLocal()
+    fresh = dict(s.execute(select(StudentDue.student_id_fk, StudentDue.outstanding)).all())
+    drift = sum(1 for k, v in fresh.items() if abs(kept.get(k, 0.0) - v) > 0.005)
+    print(f"snapshot vs recompute: {drift} students differ")
+    s.close()
+
+
+if __name__ == "__main__":
+    main()
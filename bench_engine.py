@@ -0,0 +1,106 @@
+# bench_engine.py
+# Mixed read/write load against two throwaway SQLite databases: the old bare engine
+# (rollback journal, synchronous=FULL, default pool) and the tuned make_engine profile
+# (WAL, synchronous=NORMAL, busy_timeout, cache/mmap, shared pool).
+#   python bench_engine.py --readers 8 --writers 4 --seconds 10
+import argparse, os, random, tempfile, threading, time, uuid
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--readers", type=int, default=8)
+parser.add_argument("--writers", type=int, default=4)
+parser.add_argument("--seconds", type=float, default=10)
+parser.add_argument("--students", type=int, default=2000)
+args = parser.parse_args()
+
+tmpdir = tempfile.mkdtemp(prefix="erp_bench_engine_")
+os.environ["COLLEGE_ERP_DB_PATH"] = os.path.join(tmpdir, "unused.db")
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from models import Base, make_engine, Student, Fee
+from ledger import record_payment, get_balance
+
+
+def setup(tuned):
+    url = f"sqlite:///{os.path.join(tmpdir, 'tuned.db' if tuned else 'legacy.db')}"
+    eng = make_engine(url, tuned=tuned)
+    Base.metadata.create_all(eng)
+    Session = sessionmaker(bind=eng, autoflush=False)
+    s = Session()
+    s.execute(insert(Student), [{"student_id": f"E{i:06d}", "name": f"Student {i}"} for i in range(1, args.students + 1)])
+    s.commit()
+    s.close()
+    return eng, Session
+
+
+def run(Session):
+    stop = time.monotonic() + args.seconds
+    stats = {"reads": [], "writes": [], "errors": 0}
+    lock = threading.Lock()
+
+    def reader():
+        rng = random.Random()
+        lat = []
+        while time.monotonic() < stop:
+            t0 = time.perf_counter()
+            s = Session()
+            try:
+                s.query(Fee.receipt_id, Fee.amount).order_by(Fee.timestamp.desc()).limit(20).all()
+                get_balance(s, rng.randint(1, args.students))
+                lat.append(time.perf_counter() - t0)
+            except OperationalError:
+                with lock:
+                    stats["errors"] += 1
+            finally:
+                s.close()
+        with lock:
+            stats["reads"].extend(lat)
+
+    def writer():
+        rng = random.Random()
+        lat = []
+        while time.monotonic() < stop:
+            t0 = time.perf_counter()
+            s = Session()
+            try:
+                student = s.get(Student, rng.randint(1, args.students))
+                rid = f"B-{uuid.uuid4().hex}"
+                record_payment(s, student, 100.0, receipt_id=rid, transaction_id=rid, payment_mode="UPI")
+                s.commit()
+                lat.append(time.perf_counter() - t0)
+            except OperationalError:
+                s.rollback()
+                with lock:
+                    stats["errors"] += 1
+            finally:
+                s.close()
+        with lock:
+            stats["writes"].extend(lat)
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)] + \
+              [threading.Thread(target=writer) for _ in range(args.writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return stats
+
+
+def p95(xs):
+    return sorted(xs)[int(len(xs) * 0.95)] * 1000 if xs else float("nan")
+
+
+def main():
+    print(f"{'profile':>8} {'reads/s':>8} {'writes/s':>9} {'read p95 ms':>12} {'write p95 ms':>13} {'locked errors':>14}")
+    for tuned in (False, True):
+        eng, Session = setup(tuned)
+        st = run(Session)
+        name = "tuned" if tuned else "legacy"
+        print(f"{name:>8} {len(st['reads']) / args.seconds:>8.0f} {len(st['writes']) / args.seconds:>9.0f} "
+              f"{p95(st['reads']):>12.1f} {p95(st['writes']):>13.1f} {st['errors']:>14}")
+        eng.dispose()
+
+
+if __name__ == "__main__":
+    main()
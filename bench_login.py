@@ -0,0 +1,150 @@
+# bench_login.py
+# Cost of logging in. --schemes times one verification for each password hash format
+# (werkzeug's default, pbkdf2, bcrypt and scrypt at a few costs) so PASSWORD_SCHEME,
+# BCRYPT_ROUNDS and SCRYPT_LOG_N can be picked for this machine. The full run also puts
+# --concurrency threads of logins against a throwaway database, first the way app.py used
+# to (users row + werkzeug check on the caller's thread) and then through auth.login, and
+# compares checking a session token with reading the user from the users table.
+#   python bench_login.py --schemes
+#   python bench_login.py --users 50 --concurrency 16 --logins 200
+import argparse, os, statistics, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+parser = argparse.ArgumentParser(description="Password hashing and login benchmark")
+parser.add_argument("--schemes", action="store_true", help="only print the per-scheme verification cost")
+parser.add_argument("--samples", type=int, default=5, help="verifications timed per scheme")
+parser.add_argument("--users", type=int, default=50)
+parser.add_argument("--concurrency", type=int, default=16, help="threads logging in at once")
+parser.add_argument("--logins", type=int, default=200, help="per scenario")
+parser.add_argument("--max-pending", type=int, help="AUTH_MAX_PENDING for the auth.login run")
+args = parser.parse_args()
+
+tmpdir = tempfile.mkdtemp(prefix="erp_bench_login_")
+os.environ["COLLEGE_ERP_DB_PATH"] = os.path.join(tmpdir, "login.db")
+os.environ.setdefault("COLLEGE_ERP_SECRET", os.urandom(16).hex())
+if args.max_pending:
+    os.environ["AUTH_MAX_PENDING"] = str(args.max_pending)
+
+import bcrypt
+from sqlalchemy import insert, select
+from werkzeug.security import generate_password_hash, check_password_hash
+from models import init_db, SessionLocal, User
+import auth, config
+
+PASSWORD = "correct horse battery staple"
+
+
+def _bcrypt(rounds):
+    return lambda pw: bcrypt.hashpw(pw.encode(), bcrypt.gensalt(rounds)).decode()
+
+
+def _scrypt(ln):
+    def make(pw):
+        salt = os.urandom(16)
+        return f"$scrypt$ln={ln},r=8,p=1${auth._b64(salt)}${auth._b64(auth._scrypt(pw, salt, ln, 8, 1))}"
+    return make
+
+
+# label -> (make a hash, memory per verification)
+SCHEMES = {
+    "werkzeug default (scrypt N=2^15)": (generate_password_hash, "32 MB"),
+    "werkzeug pbkdf2:sha256 (600k)": (lambda pw: generate_password_hash(pw, "pbkdf2:sha256:600000"), "-"),
+    "bcrypt rounds=10": (_bcrypt(10), "4 KB"),
+    "bcrypt rounds=11": (_bcrypt(11), "4 KB"),
+    "bcrypt rounds=12": (_bcrypt(12), "4 KB"),
+    "scrypt ln=14": (_scrypt(14), "16 MB"),
+    "scrypt ln=15": (_scrypt(15), "32 MB"),
+}
+
+
+def scheme_costs():
+    print(f"{'scheme':<34} {'verify ms':>10} {'memory':>8}")
+    for label, (make, memory) in SCHEMES.items():
+        hashed = make(PASSWORD)
+        auth.verify_password(hashed, PASSWORD)
+        times = []
+        for _ in range(args.samples):
+            t0 = time.perf_counter()
+            assert auth.verify_password(hashed, PASSWORD)
+            times.append(time.perf_counter() - t0)
+        print(f"{label:<34} {statistics.median(times) * 1000:>10.1f} {memory:>8}")
+    print(f"\nconfigured: PASSWORD_SCHEME={config.PASSWORD_SCHEME} BCRYPT_ROUNDS={config.BCRYPT_ROUNDS} "
+          f"SCRYPT_LOG_N={config.SCRYPT_LOG_N} AUTH_WORKERS={config.AUTH_WORKERS} ({os.cpu_count()} CPUs)")
+
+
+def setup_users():
+    init_db()
+    s = SessionLocal()
+    legacy = generate_password_hash(PASSWORD)  # what every user has before auth.py
+    s.execute(insert(User), [{"username": f"user{i}", "hashed_password": legacy, "role": "viewer",
+                              "display_name": f"User {i}"} for i in range(args.users)])
+    s.commit()
+    s.close()
+
+
+def old_login(username, password):
+    # app.py's login before auth.py: ORM query and werkzeug check on the caller's thread
+    s = SessionLocal()
+    try:
+        user = s.query(User).filter_by(username=username).first()
+        return bool(user and check_password_hash(user.hashed_password, password))
+    finally:
+        s.close()
+
+
+def hammer(name, login):
+    latencies, busy, failed = [], [0], [0]
+    lock = threading.Lock()
+
+    def one(i):
+        t0 = time.perf_counter()
+        try:
+            ok = login(f"user{i % args.users}", PASSWORD)
+        except auth.AuthBusy:
+            with lock:
+                busy[0] += 1
+            return
+        with lock:
+            latencies.append(time.perf_counter() - t0)
+            failed[0] += not ok
+
+    t_start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        list(pool.map(one, range(args.logins)))
+    elapsed = time.perf_counter() - t_start
+    lat = sorted(latencies) or [0.0]
+    print(f"{name:<28} {len(latencies) / elapsed:>9.1f} {lat[len(lat) // 2] * 1000:>9.0f} "
+          f"{lat[min(len(lat) - 1, int(0.95 * len(lat)))] * 1000:>9.0f} {busy[0]:>6} {failed[0]:>6}")
+
+
+def token_vs_lookup(n=5000):
+    res = auth.login("user0", PASSWORD)
+    token = res["token"]
+    t0 = time.perf_counter()
+    for _ in range(n):
+        assert auth.read_token(token)
+    per_token = (time.perf_counter() - t0) / n
+    t0 = time.perf_counter()
+    for _ in range(n // 10):
+        s = SessionLocal()
+        s.execute(select(User.id, User.username, User.role, User.display_name).where(User.username == "user0")).one()
+        s.close()
+    per_lookup = (time.perf_counter() - t0) / (n // 10)
+    print(f"\nsession check per rerun: token {per_token * 1e6:.1f} us, users-table lookup {per_lookup * 1e6:.1f} us")
+
+
+def main():
+    scheme_costs()
+    if args.schemes:
+        return
+    setup_users()
+    print(f"\n{args.logins} logins, {args.concurrency} threads, {args.users} users each")
+    print(f"{'scenario':<28} {'logins/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'busy':>6} {'failed':>6}")
+    hammer("inline werkzeug", old_login)
+    hammer("auth.login (first, rehash)", auth.login)  # each user's werkzeug hash is rewritten once
+    hammer("auth.login", auth.login)
+    token_vs_lookup()
+
+
+if __name__ == "__main__":
+    main()
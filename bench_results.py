@@ -0,0 +1,67 @@
+# bench_results.py
+# Seeds a throwaway database with exam marks and times results.compute_results: a full
+# run, an incremental run after re-grading a slice of students, and a run with no changes.
+#   python bench_results.py --students 50000 --subjects 20
+import argparse, datetime, os, random, tempfile, time
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--students", type=int, default=50000)
+parser.add_argument("--subjects", type=int, default=20, help="per student; exam rows = students * subjects")
+parser.add_argument("--changed", type=float, default=0.01, help="fraction of students re-graded")
+args = parser.parse_args()
+
+tmpdir = tempfile.mkdtemp(prefix="erp_bench_results_")
+os.environ["COLLEGE_ERP_DB_PATH"] = os.path.join(tmpdir, "results.db")
+
+from sqlalchemy import insert, update
+from models import init_db, SessionLocal, Student, Exam, Subject, now
+from results import compute_results
+
+PROGRAMS = ["BSc", "BCom", "BA", "BTech"]
+
+
+def seed(s, rng):
+    s.execute(insert(Subject), [{"code": f"SUB{k:02d}", "name": f"Subject {k}", "credits": rng.choice([2, 3, 4]),
+                                 "semester": k * 4 // args.subjects + 1} for k in range(args.subjects)])
+    s.execute(insert(Student), [{"student_id": f"R{i:07d}", "name": f"Student {i}", "program": rng.choice(PROGRAMS),
+                                 "year": str(rng.randint(1, 4))} for i in range(1, args.students + 1)])
+    ts = now() - datetime.timedelta(hours=2)  # older than results.WATERMARK_LAG
+    batch = []
+    for sid in range(1, args.students + 1):
+        for k in range(args.subjects):
+            m = min(100.0, max(0.0, rng.gauss(62, 15)))
+            batch.append({"exam_id": f"E{sid}-{k}", "student_id_fk": sid, "subject_code": f"SUB{k:02d}", "marks": round(m),
+                          "status": "Pass" if m >= 40 else "Fail", "graded_at": ts, "updated_at": ts})
+        if len(batch) >= 50000:
+            s.execute(insert(Exam), batch)
+            batch = []
+    if batch:
+        s.execute(insert(Exam), batch)
+    s.commit()
+
+
+def report(label, r):
+    print(f"{label:>12} {r['exam_rows']:>10} {r['students']:>9} {r['ranks_changed']:>13} {r['seconds']:>8.2f}")
+
+
+def main():
+    rng = random.Random(3)
+    init_db()
+    s = SessionLocal()
+    t0 = time.perf_counter()
+    seed(s, rng)
+    print(f"seeded {args.students * args.subjects} exam rows in {time.perf_counter() - t0:.1f}s")
+    print(f"{'run':>12} {'exam rows':>10} {'students':>9} {'ranks written':>13} {'seconds':>8}")
+    report("full", compute_results(full=True))
+    changed = rng.sample(range(1, args.students + 1), int(args.students * args.changed))
+    for i in range(0, len(changed), 500):
+        s.execute(update(Exam).where(Exam.student_id_fk.in_(changed[i:i + 500]), Exam.subject_code == "SUB00")
+                  .values(marks=rng.randint(0, 100)))
+    s.commit()
+    report("incremental", compute_results())
+    report("no changes", compute_results())
+    s.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# bench_search.py
+# Builds a throwaway database of synthetic students and compares the old Admissions
+# search (unbounded ILIKE on name/student_id/email) with search.search_students (FTS5).
+#   python bench_search.py --students 500000
+import argparse, os, random, tempfile, time
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--students", type=int, default=500000)
+parser.add_argument("--repeat", type=int, default=5)
+args = parser.parse_args()
+
+tmpdir = tempfile.mkdtemp(prefix="erp_bench_search_")
+os.environ["COLLEGE_ERP_DB_PATH"] = os.path.join(tmpdir, "bench.db")
+
+from sqlalchemy import insert
+from models import init_db, SessionLocal, Student
+from search import search_students
+
+FIRST = ["Aarav", "Vivaan", "Aditya", "Diya", "Ananya", "Ishaan", "Kavya", "Rohan", "Saanvi", "Arjun",
+         "Meera", "Karthik", "Priya", "Rahul", "Sneha", "Vikram", "Lakshmi", "Naveen", "Pooja", "Siddharth"]
+LAST = ["Sharma", "Iyer", "Reddy", "Nair", "Patel", "Gupta", "Menon", "Rao", "Kumar", "Singh",
+        "Pillai", "Das", "Joshi", "Mehta", "Bose", "Chatterjee", "Verma", "Krishnan", "Shetty", "Naidu"]
+QUERIES = ["kavya", "nav", "priya nair", "COLG24S10", "gupta@", "zzz-no-match"]
+
+
+def legacy_search(s, q):
+    return s.query(Student).filter((Student.name.ilike(f"%{q}%")) | (Student.student_id.ilike(f"%{q}%")) | (Student.email.ilike(f"%{q}%"))).all()
+
+
+def seed(n):
+    rng = random.Random(1)
+    s = SessionLocal()
+    rows = []
+    for i in range(n):
+        first, last = rng.choice(FIRST), rng.choice(LAST)
+        rows.append({"student_id": f"COLG{20 + i % 6}S{i:06d}", "name": f"{first} {last}",
+                     "email": f"{first.lower()}.{last.lower()}{i}@college.edu", "program": "BTech", "year": "1"})
+        if len(rows) == 50000:
+            s.execute(insert(Student), rows)
+            rows = []
+    if rows:
+        s.execute(insert(Student), rows)
+    s.commit()
+    s.close()
+
+
+def timed(fn):
+    best = None
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best, out
+
+
+def main():
+    t0 = time.perf_counter()
+    init_db()
+    seed(args.students)
+    print(f"seeded {args.students} students with FTS triggers in {time.perf_counter() - t0:.1f}s")
+    s = SessionLocal()
+    print(f"{'query':>14} {'ilike ms':>9} {'ilike rows':>11} {'fts ms':>8} {'fts rows':>9}")
+    for q in QUERIES:
+        lt, lrows = timed(lambda: legacy_search(s, q))
+        s.expunge_all()
+        ft, (frows, _) = timed(lambda: search_students(s, q))
+        print(f"{q:>14} {lt * 1000:>9.1f} {len(lrows):>11} {ft * 1000:>8.2f} {len(frows):>9}")
+    s.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+# bench_suite.py
+# End-to-end benchmark of the code paths users hit, on a database filled by seed_data.py:
+# the Admissions search, Fees recent payments and balance lookup, the Dashboard,
+# export_csv_all, create_receipt_pdf and POST /webhook through Flask's test client.
+# Each scenario runs for --seconds (at least --min-ops times) and records ops/s and
+# latency percentiles in a JSON file. --compare prints the change against an earlier file
+# and exits 1 if any scenario's p95 got worse by more than --threshold.
+#   python bench_suite.py --students 10000 --out bench-10k.json
+#   python bench_suite.py --db /data/bench-1m.db --compare bench-old.json
+# Without --db a throwaway database is seeded; with --db it is seeded only if empty.
+# Scenarios call the functions directly, so app.py's query cache is not in the numbers.
+import argparse, datetime, json, os, platform, random, subprocess, sys, tempfile, time
+
+SCENARIOS = ["admissions_search", "fees_recent_payments", "balance_lookup", "dashboard", "export_csv_all",
+             "receipt_pdf", "webhook"]
+
+parser = argparse.ArgumentParser(description="End-to-end benchmark suite")
+parser.add_argument("--students", type=int, default=10000, help="scale of a freshly seeded database")
+parser.add_argument("--seed", type=int, default=1)
+parser.add_argument("--db", help="database file to use (seeded if it has no students)")
+parser.add_argument("--seconds", type=float, default=5.0, help="time per scenario")
+parser.add_argument("--min-ops", type=int, default=3, help="runs per scenario even if --seconds is over")
+parser.add_argument("--only", nargs="+", choices=SCENARIOS, metavar="SCENARIO")
+parser.add_argument("--out", default="bench-results.json")
+parser.add_argument("--compare", help="earlier JSON output to compare against")
+parser.add_argument("--threshold", type=float, default=0.2, help="p95 regression that fails --compare (0.2 = 20%%)")
+args = parser.parse_args()
+
+tmpdir = tempfile.mkdtemp(prefix="erp_bench_suite_")
+os.environ["COLLEGE_ERP_DB_PATH"] = os.path.abspath(args.db) if args.db else os.path.join(tmpdir, "bench.db")
+os.environ["BACKUP_FOLDER"] = os.path.join(tmpdir, "backups")
+os.environ["RECEIPTS_FOLDER"] = os.path.join(tmpdir, "receipts")
+os.environ.setdefault("WEBHOOK_SECRET", "bench_secret")
+
+import sqlalchemy
+from sqlalchemy import select, func
+from models import init_db, SessionLocal, engine, Student, Fee, Exam, HostelAllocation
+from search import search_students
+from listing import recent_payments
+from ledger import get_balance
+from dashboard import dashboard_metrics
+from utils import export_csv_all, create_receipt_pdf
+import seed_data
+import webhook_forwarder
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def run(name, op, unit=None):
+    """Call op(i) until --seconds is used up (at least --min-ops times); op returns `unit`s handled or None."""
+    op(-1)  # warm-up: imports, prepared statements, page cache
+    latencies, items = [], 0
+    t_start = time.perf_counter()
+    i = 0
+    while i < args.min_ops or time.perf_counter() - t_start < args.seconds:
+        t0 = time.perf_counter()
+        n = op(i)
+        latencies.append(time.perf_counter() - t0)
+        items += n or 0
+        i += 1
+    elapsed = time.perf_counter() - t_start
+    lat = sorted(latencies)
+    ms = lambda v: round(v * 1000, 3)
+    out = {"ops": len(lat), "seconds": round(elapsed, 3), "ops_per_s": round(len(lat) / elapsed, 2),
+           "mean_ms": ms(sum(lat) / len(lat)), "p50_ms": ms(percentile(lat, 0.5)), "p95_ms": ms(percentile(lat, 0.95)),
+           "p99_ms": ms(percentile(lat, 0.99)), "max_ms": ms(lat[-1])}
+    if unit:
+        out[f"{unit}_per_s"] = round(items / elapsed, 1)
+    print(f"{name:<22} {out['ops']:>7} {out['ops_per_s']:>9.1f} {out['p50_ms']:>9.2f} {out['p95_ms']:>9.2f} "
+          f"{out['max_ms']:>9.2f}")
+    return out
+
+
+def scenarios(s, rng):
+    n_students = s.execute(select(func.max(Student.id))).scalar()
+    names = [n for (n,) in s.execute(select(Student.name).where(Student.id.in_(
+        [rng.randint(1, n_students) for _ in range(50)])))]
+    queries = [n.split()[0].lower() for n in names] + [n.lower() for n in names[:10]] + ["nair", "COLG2", "zzz-none"]
+    student_ids = [sid for (sid,) in s.execute(select(Student.student_id).where(Student.id.in_(
+        [rng.randint(1, n_students) for _ in range(200)])))]
+    cursor = [None]
+    client = webhook_forwarder.app.test_client()
+    receipt_dir = os.path.join(tmpdir, "receipts")
+
+    def admissions_search(i):
+        s.expunge_all()
+        rows, _ = search_students(s, rng.choice(queries), page=rng.choice([0, 0, 0, 1]))
+        return len(rows)
+
+    def fees_recent_payments(i):
+        # first page, then "Next page" up to 10 times, as the Fees page pages through
+        rows, nxt = recent_payments(s, cursor=cursor[0])
+        cursor[0] = nxt if nxt and i % 10 != 9 else None
+        return len(rows)
+
+    def balance_lookup(i):
+        get_balance(s, rng.randint(1, n_students))
+
+    def dashboard(i):
+        dashboard_metrics(s)
+
+    def csv_export(i):
+        paths = export_csv_all().values()
+        size = sum(os.path.getsize(p) for p in paths)
+        for p in paths:
+            os.remove(p)  # a 1M-student export is gigabytes; keep one run's worth on disk
+        return size
+
+    def receipt_pdf(i):
+        create_receipt_pdf({"receipt_id": f"BENCH-{i + 1}", "date": datetime.date.today().isoformat(),
+                            "student_name": "Bench Student", "student_id": rng.choice(student_ids), "amount": 12500.0,
+                            "purpose": "Tuition", "payment_mode": "UPI", "transaction_id": f"BENCH-TXN-{i}",
+                            "notes": "benchmark"}, out_folder=receipt_dir)
+
+    def webhook(i):
+        r = client.post("/webhook", json={"secret": webhook_forwarder.SHARED_SECRET, "student_id": rng.choice(student_ids),
+                                          "amount": 1500.0, "transaction_id": f"BENCH-{os.getpid()}-{time.time_ns()}",
+                                          "purpose": "Tuition"})
+        if r.status_code != 200:
+            raise RuntimeError(f"/webhook answered {r.status_code}: {r.get_data(as_text=True)}")
+
+    # name -> (op, unit its return value counts)
+    return {"admissions_search": (admissions_search, "rows"), "fees_recent_payments": (fees_recent_payments, "rows"),
+            "balance_lookup": (balance_lookup, None), "dashboard": (dashboard, None),
+            "export_csv_all": (csv_export, "bytes"), "receipt_pdf": (receipt_pdf, None), "webhook": (webhook, None)}
+
+
+def environment(s, seed_seconds):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    counts = {m.__tablename__: s.execute(select(func.count()).select_from(m)).scalar()
+              for m in (Student, Fee, Exam, HostelAllocation)}
+    return {"created_at": datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"), "commit": commit,
+            "python": platform.python_version(), "platform": platform.platform(), "sqlalchemy": sqlalchemy.__version__,
+            "database": engine.dialect.name, "rows": counts, "seed_seconds": seed_seconds,
+            "settings": {"seconds": args.seconds, "min_ops": args.min_ops, "seed": args.seed}}
+
+
+def compare(old, new):
+    """Print old vs new per scenario; returns the scenarios whose p95 regressed past --threshold."""
+    print(f"\n{'vs ' + (old.get('environment', {}).get('commit') or args.compare):<22} {'ops/s':>17} {'p95 ms':>19}")
+    regressed = []
+    for name, cur in new["scenarios"].items():
+        prev = old.get("scenarios", {}).get(name)
+        if not prev:
+            print(f"{name:<22} (new)")
+            continue
+        change = (cur["p95_ms"] - prev["p95_ms"]) / prev["p95_ms"] if prev["p95_ms"] else 0.0
+        flag = "  REGRESSED" if change > args.threshold else ""
+        if flag:
+            regressed.append(name)
+        print(f"{name:<22} {prev['ops_per_s']:>8.1f} {cur['ops_per_s']:>8.1f} {prev['p95_ms']:>9.2f} {cur['p95_ms']:>9.2f}"
+              f" {change:+7.0%}{flag}")
+    return regressed
+
+
+def main():
+    init_db()
+    s = SessionLocal()
+    seed_seconds = None
+    if not s.execute(select(Student.id).limit(1)).first():
+        print(f"seeding {args.students} students into {os.environ['COLLEGE_ERP_DB_PATH']}")
+        t0 = time.perf_counter()
+        seed_data.generate(args.students, args.seed)
+        seed_seconds = round(time.perf_counter() - t0, 1)
+    ops = scenarios(s, random.Random(args.seed))
+    print(f"\n{'scenario':<22} {'ops':>7} {'ops/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    result = {"environment": environment(s, seed_seconds), "scenarios": {}}
+    for name in args.only or SCENARIOS:
+        result["scenarios"][name] = run(name, *ops[name])
+    s.close()
+    with open(args.out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nwritten to {args.out}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = compare(json.load(f), result)
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
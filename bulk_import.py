@@ -0,0 +1,175 @@
+# bulk_import.py
+# Bulk import of admissions and exam marks from CSV/XLSX. Files are streamed in chunks,
+# validated with vectorized pandas checks and inserted with executemany, one
+# transaction per chunk.
+#   python bulk_import.py admissions students.csv
+#   python bulk_import.py marks marks.xlsx --graded-by faculty1
+import argparse, time
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert
+from models import SessionLocal, Student, Admission, Exam, ADMISSION_COLUMNS
+from id_allocator import student_ids, generic_ids
+from config import PASS_MARK
+
+ADMISSION_REQUIRED = ["name", "email"]
+MARKS_COLUMNS = ["student_id", "subject_code", "subject_name", "marks", "graded_by"]
+MARKS_REQUIRED = ["student_id", "subject_code", "marks"]
+EMAIL_RE = r"^[^@\s]+@[^@\s]+\.[^@\s]+$"
+
+
+def read_chunks(source, chunk_rows=1000):
+    """Yield DataFrames of at most chunk_rows string cells from a CSV or XLSX path/upload."""
+    name = getattr(source, "name", source)
+    if str(name).lower().endswith((".xlsx", ".xlsm")):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise RuntimeError("Excel import needs the 'openpyxl' package")
+        ws = load_workbook(source, read_only=True, data_only=True).active
+        rows = ws.iter_rows(values_only=True)
+        header = [str(h or "").strip() for h in next(rows, [])]
+        buf = []
+        for r in rows:
+            buf.append(["" if v is None else str(v) for v in r])
+            if len(buf) == chunk_rows:
+                yield pd.DataFrame(buf, columns=header)
+                buf = []
+        if buf:
+            yield pd.DataFrame(buf, columns=header)
+    else:
+        yield from pd.read_csv(source, dtype=str, keep_default_na=False, chunksize=chunk_rows)
+
+
+def _normalize(df, columns, required):
+    df = df.rename(columns=lambda c: str(c).strip().lower().replace(" ", "_"))
+    missing = [c for c in required if c not in df.columns]
+    if missing:
+        raise ValueError(f"missing required columns: {', '.join(missing)}")
+    for c in columns:
+        df[c] = df[c].astype(str).str.strip() if c in df.columns else ""
+    return df[columns]
+
+
+def _errors(df, checks, first_line):
+    """checks: list of (bad_mask, message). Returns (valid_mask, [{'line','error'}])."""
+    bad = pd.Series(False, index=df.index)
+    errors = []
+    for mask, msg in checks:
+        mask = mask & ~bad  # report the first problem per row
+        for pos in np.flatnonzero(mask.to_numpy()):
+            errors.append({"line": first_line + int(pos), "error": msg})
+        bad |= mask
+    return ~bad, errors
+
+
+def import_admissions(source, chunk_rows=1000, source_label="Bulk", status="Approved"):
+    """Returns {'rows','inserted','errors': [{'line','error'}],'seconds','rows_per_sec'}."""
+    report = {"rows": 0, "inserted": 0, "errors": []}
+    t0 = time.perf_counter()
+    line = 2  # first data line after the header
+    seen_emails = set()
+    s = SessionLocal()
+    try:
+        for raw in read_chunks(source, chunk_rows):
+            df = _normalize(raw, ADMISSION_COLUMNS, ADMISSION_REQUIRED)
+            dob = pd.to_datetime(df["dob"], errors="coerce")
+            email = df["email"].str.lower()
+            ok, errs = _errors(df, [
+                (df["name"] == "", "name is required"),
+                (df["email"] == "", "email is required"),
+                (~df["email"].str.match(EMAIL_RE), "invalid email"),
+                (email.duplicated() | email.isin(seen_emails), "duplicate email in file"),
+                ((df["dob"] != "") & dob.isna(), "invalid dob"),
+            ], line)
+            report["errors"].extend(errs)
+            report["rows"] += len(df)
+            line += len(df)
+            seen_emails.update(email)
+            good = df[ok].copy()
+            if good.empty:
+                continue
+            good["dob"] = dob[ok].dt.strftime("%Y-%m-%d").fillna("")
+            records = good.to_dict("records")
+            ids = student_ids(len(records))
+            adm_ids = generic_ids("ADM", len(records))
+            for r, sid in zip(records, ids):
+                r["student_id"] = sid
+            s.execute(insert(Student), records)
+            pks = dict(s.query(Student.student_id, Student.id).filter(Student.student_id.in_(ids)))
+            s.execute(insert(Admission), [{"admission_id": aid, "student_id_fk": pks[sid],
+                                           "source": source_label, "status": status} for sid, aid in zip(ids, adm_ids)])
+            s.commit()
+            report["inserted"] += len(records)
+    finally:
+        s.close()
+    return _finish(report, t0)
+
+
+def import_marks(source, chunk_rows=1000, graded_by=None):
+    """Rows reference students by student_id. Returns the same report as import_admissions."""
+    report = {"rows": 0, "inserted": 0, "errors": []}
+    t0 = time.perf_counter()
+    line = 2
+    s = SessionLocal()
+    try:
+        for raw in read_chunks(source, chunk_rows):
+            df = _normalize(raw, MARKS_COLUMNS, MARKS_REQUIRED)
+            marks = pd.to_numeric(df["marks"], errors="coerce")
+            wanted = df["student_id"][df["student_id"] != ""].unique().tolist()
+            pks = dict(s.query(Student.student_id, Student.id).filter(Student.student_id.in_(wanted))) if wanted else {}
+            fk = df["student_id"].map(pks)
+            ok, errs = _errors(df, [
+                (df["student_id"] == "", "student_id is required"),
+                (df["subject_code"] == "", "subject_code is required"),
+                (marks.isna(), "marks must be a number"),
+                ((marks < 0) | (marks > 100), "marks must be between 0 and 100"),
+                (fk.isna(), "unknown student_id"),
+            ], line)
+            report["errors"].extend(errs)
+            report["rows"] += len(df)
+            line += len(df)
+            if not ok.any():
+                continue
+            m = marks[ok].to_numpy(dtype=float)
+            by = df["graded_by"][ok].to_numpy(dtype=object)
+            by[by == ""] = graded_by
+            good = pd.DataFrame({
+                "exam_id": generic_ids("EXM", int(ok.sum())),
+                "student_id_fk": fk[ok].astype(int).to_numpy(),
+                "subject_code": df["subject_code"][ok].to_numpy(),
+                "subject_name": df["subject_name"][ok].to_numpy(),
+                "marks": m,
+                "status": np.where(m >= PASS_MARK, "Pass", "Fail"),
+                "graded_by": by,
+            })
+            s.execute(insert(Exam), good.to_dict("records"))
+            s.commit()
+            report["inserted"] += len(good)
+    finally:
+        s.close()
+    return _finish(report, t0)
+
+
+def _finish(report, t0):
+    report["errors"].sort(key=lambda e: e["line"])
+    report["seconds"] = time.perf_counter() - t0
+    report["rows_per_sec"] = report["rows"] / report["seconds"] if report["seconds"] else 0.0
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import admissions or marks from CSV/XLSX")
+    parser.add_argument("kind", choices=["admissions", "marks"])
+    parser.add_argument("path")
+    parser.add_argument("--chunk-rows", type=int, default=1000)
+    parser.add_argument("--graded-by", default=None)
+    args = parser.parse_args()
+    if args.kind == "admissions":
+        rep = import_admissions(args.path, args.chunk_rows)
+    else:
+        rep = import_marks(args.path, args.chunk_rows, graded_by=args.graded_by)
+    for e in rep["errors"]:
+        print(f"line {e['line']}: {e['error']}")
+    print(f"{rep['inserted']}/{rep['rows']} rows imported in {rep['seconds']:.2f}s "
+          f"({rep['rows_per_sec']:.0f} rows/sec, {len(rep['errors'])} errors)")
@@ -0,0 +1,132 @@
+# dashboard.py
+import datetime
+from sqlalchemy import func, select, insert
+from sqlalchemy.exc import IntegrityError
+from models import SessionLocal, Student, Fee, HostelRoom, HostelAllocation, FeeMonthTotal, RollupWatermark
+from hostel import ACTIVE
+from archive import history
+
+# fee rows younger than this stay "live" (aggregated on every call) so an
+# uncommitted transaction holding a lower id is never skipped by the watermark
+FOLD_LAG = datetime.timedelta(seconds=60)
+
+
+def _month_bucket(session, column):
+    # group key "YYYY-MM" computed by the database instead of pandas
+    if session.bind.dialect.name == "postgresql":
+        return func.to_char(column, "YYYY-MM")
+    return func.strftime("%Y-%m", column)
+
+
+def _fees_after(session, last_id, upto_id=None):
+    month = _month_bucket(session, Fee.timestamp).label("month")
+    q = (session.query(month, func.coalesce(func.sum(Fee.amount), 0.0), func.count(Fee.id))
+         .filter(Fee.id > last_id, Fee.timestamp.isnot(None)))
+    if upto_id is not None:
+        q = q.filter(Fee.id <= upto_id)
+    return q.group_by(month).all()
+
+
+def _watermark(session):
+    return session.query(RollupWatermark.last_id).filter(RollupWatermark.name == "fees").scalar() or 0
+
+
+def refresh_fee_rollup():
+    """Fold fees older than FOLD_LAG into fee_month_totals; returns rows folded."""
+    s = SessionLocal()
+    try:
+        last_id = _watermark(s)
+        cutoff = datetime.datetime.utcnow() - FOLD_LAG
+        upto = (s.query(func.max(Fee.id)).filter(Fee.id > last_id, Fee.timestamp < cutoff).scalar())
+        if not upto:
+            return 0
+        # every row below the cutoff id is folded, including stragglers with newer timestamps
+        rows = _fees_after(s, last_id, upto)
+        moved = (s.query(RollupWatermark).filter(RollupWatermark.name == "fees", RollupWatermark.last_id == last_id)
+                 .update({"last_id": upto, "updated_at": datetime.datetime.utcnow()}, synchronize_session=False))
+        if not moved:
+            if last_id:
+                # another process folded the same range first
+                s.rollback()
+                return 0
+            s.add(RollupWatermark(name="fees", last_id=upto))
+        for month, amount, count in rows:
+            tot = s.get(FeeMonthTotal, month)
+            if tot is None:
+                s.add(FeeMonthTotal(month=month, amount=float(amount), payments=count))
+            else:
+                tot.amount = (tot.amount or 0.0) + float(amount)
+                tot.payments = (tot.payments or 0) + count
+        s.commit()
+        return sum(r[2] for r in rows)
+    except IntegrityError:
+        s.rollback()
+        return 0
+    finally:
+        s.close()
+
+
+def rebuild_fee_rollup():
+    """Recompute fee_month_totals from scratch (after deleting or editing fee rows)."""
+    s = SessionLocal()
+    try:
+        archived = history(s, Fee, hot=False)
+        s.query(FeeMonthTotal).delete(synchronize_session=False)
+        s.query(RollupWatermark).filter(RollupWatermark.name == "fees").delete(synchronize_session=False)
+        if archived is not None:
+            # archived years are no longer in fees, so their months are summed from the archives
+            month = _month_bucket(s, archived.c.timestamp).label("month")
+            s.execute(insert(FeeMonthTotal).from_select(
+                ["month", "amount", "payments"],
+                select(month, func.coalesce(func.sum(archived.c.amount), 0.0), func.count(archived.c.id))
+                .where(archived.c.timestamp.isnot(None)).group_by(month)))
+        s.commit()
+    finally:
+        s.close()
+    return refresh_fee_rollup()
+
+
+def total_students(session):
+    return session.query(func.count(Student.id)).scalar() or 0
+
+
+def fees_by_month(session):
+    totals = {m: float(a or 0.0) for m, a in session.query(FeeMonthTotal.month, FeeMonthTotal.amount)}
+    for month, amount, _ in _fees_after(session, _watermark(session)):
+        totals[month] = totals.get(month, 0.0) + float(amount)
+    return [{"month": m, "amount": totals[m]} for m in sorted(totals)]
+
+
+def total_fees(session):
+    return sum(r["amount"] for r in fees_by_month(session))
+
+
+def hostel_by_block(session):
+    # occupied beds from the per-room counters kept by hostel.py
+    rows = (session.query(HostelRoom.block, func.sum(HostelRoom.occupied))
+            .group_by(HostelRoom.block).order_by(HostelRoom.block).all())
+    out = [{"block": b, "count": int(c)} for b, c in rows if c]
+    # allocations made before the room inventory hold no bed and are in no room's counter
+    unassigned = session.execute(select(func.count()).select_from(HostelAllocation)
+                                 .where(HostelAllocation.status == ACTIVE, HostelAllocation.bed_id_fk.is_(None))).scalar()
+    if unassigned:
+        out.append({"block": "unassigned", "count": unassigned})
+    return out
+
+
+def dashboard_metrics(session, refresh=True):
+    """
+    Everything the Dashboard page renders, computed with GROUP BY queries.
+    Fee totals come from the monthly rollup plus the not-yet-folded tail, so the
+    cost depends on the number of new payments rather than the whole history.
+    returns {'total_students', 'total_fees', 'fees_by_month': [...], 'hostel_by_block': [...]}
+    """
+    if refresh:
+        refresh_fee_rollup()
+    months = fees_by_month(session)
+    return {
+        "total_students": total_students(session),
+        "total_fees": sum(r["amount"] for r in months),
+        "fees_by_month": months,
+        "hostel_by_block": hostel_by_block(session),
+    }
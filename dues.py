@@ -0,0 +1,215 @@
+# dues.py
+# What each student owes. A fee structure row (program, year of study, term, head, amount)
+# is charged to every student of the program in that year of study or later once its
+# due date has passed. student_dues is a snapshot of assessed, paid and outstanding per
+# student. refresh() rebuilds it (or one program) with a single INSERT ... SELECT that
+# joins the assessed and paid aggregates. ledger.apply_payment moves each payment into
+# it in the payment's own transaction, so the defaulters report never scans fees.
+#   python dues.py refresh [--program BSc] [--as-of 2025-09-01]
+#   python dues.py defaulters [--program BSc --year 2] [--min 1] [--csv defaulters.csv]
+import argparse, csv, datetime, sys, time
+from sqlalchemy import select, delete, update, insert, func, cast, and_, or_, literal, text, bindparam, Integer, Date
+from models import SessionLocal, Student, Fee, FeeStructure, StudentDue, RollupWatermark, now
+from metrics import timed
+from archive import history
+
+DEFAULTER_COLUMNS = ["student_id", "name", "program", "year", "mobile", "assessed", "paid", "outstanding",
+                     "last_payment_at"]
+_dues = StudentDue.__table__
+# one prepared Core statement: the ORM form costs more to build than the UPDATE takes to run
+_BUMP = (update(_dues).where(_dues.c.student_id_fk == bindparam("b_student"))
+         .values(paid=_dues.c.paid + bindparam("b_amount"), outstanding=_dues.c.outstanding - bindparam("b_amount"),
+                 payments=_dues.c.payments + bindparam("b_count"), last_payment_at=bindparam("b_now"),
+                 updated_at=bindparam("b_now")))
+_SNAPSHOT_COLUMNS = ["student_id_fk", "assessed", "paid", "outstanding", "payments", "last_payment_at", "as_of",
+                     "updated_at"]
+
+
+def _year_number(session, col):
+    # Student.year is free text ("2", "2nd"); compare its leading number with FeeStructure.year
+    if session.get_bind().dialect.name == "postgresql":
+        return cast(func.nullif(func.substring(col, r"^\d+"), ""), Integer)
+    return cast(col, Integer)  # SQLite keeps the leading digits, 0 if there are none
+
+
+def dues_select(session, as_of, students=None):
+    """SELECT of student_dues rows: fee structure due by `as_of` minus every fee paid. `students` limits it to a SELECT of ids."""
+    assessed = (select(Student.id.label("sid"), func.sum(FeeStructure.amount).label("amount"))
+                .join(FeeStructure, and_(FeeStructure.program == Student.program,
+                                         FeeStructure.year <= _year_number(session, Student.year),
+                                         or_(FeeStructure.due_date.is_(None), FeeStructure.due_date <= as_of)))
+                .group_by(Student.id))
+    fees = history(session, Fee)  # archived years were paid too
+    paid = (select(fees.c.student_id_fk.label("sid"), func.sum(fees.c.amount).label("amount"),
+                   func.count(fees.c.id).label("n"), func.max(fees.c.timestamp).label("last"))
+            .group_by(fees.c.student_id_fk))
+    where = []
+    if students is not None:
+        assessed = assessed.where(Student.id.in_(students))
+        paid = paid.where(fees.c.student_id_fk.in_(students))
+        where.append(Student.id.in_(students))
+    a, p = assessed.subquery(), paid.subquery()
+    owed, got = func.coalesce(a.c.amount, 0.0), func.coalesce(p.c.amount, 0.0)
+    return (select(Student.id, owed, got, owed - got, func.coalesce(p.c.n, 0), p.c.last, literal(as_of, Date), func.now())
+            .outerjoin(a, a.c.sid == Student.id).outerjoin(p, p.c.sid == Student.id).where(*where))
+
+
+def snapshot_as_of(session):
+    """Date of the last full refresh, or None if the snapshot was never built."""
+    ts = session.execute(select(RollupWatermark.updated_at).where(RollupWatermark.name == "dues")).scalar()
+    return ts.date() if ts else None
+
+
+@timed("dues_refresh")
+def refresh(program=None, as_of=None):
+    """Rebuild the snapshot, or only the rows of `program`'s students. Returns {'students','seconds','as_of'}."""
+    t0 = time.perf_counter()
+    as_of = as_of or datetime.date.today()
+    s = SessionLocal()
+    try:
+        if s.get_bind().dialect.name == "postgresql":
+            # payments wait for the new rows instead of updating rows this refresh replaces
+            s.execute(text("LOCK TABLE student_dues IN SHARE ROW EXCLUSIVE MODE"))
+        scope = select(Student.id).where(Student.program == program) if program is not None else None
+        q = delete(StudentDue)
+        if scope is not None:
+            q = q.where(StudentDue.student_id_fk.in_(scope))
+        s.execute(q)
+        n = s.execute(insert(StudentDue).from_select(_SNAPSHOT_COLUMNS, dues_select(s, as_of, scope))).rowcount
+        if program is None:
+            mark = datetime.datetime.combine(as_of, datetime.time.min)
+            if s.execute(select(RollupWatermark.name).where(RollupWatermark.name == "dues")).first():
+                s.query(RollupWatermark).filter(RollupWatermark.name == "dues").update({"updated_at": mark})
+            else:
+                s.add(RollupWatermark(name="dues", last_id=0, updated_at=mark))
+        s.commit()
+        return {"students": n, "seconds": time.perf_counter() - t0, "as_of": as_of}
+    finally:
+        s.close()
+
+
+def apply_payment(session, student_fk, amount, count=1):
+    """
+    Move a payment into the snapshot inside the caller's transaction. Called by
+    ledger.apply_payment before the Fee row is inserted, so a student without a row yet
+    (admitted since the last refresh) gets one computed from earlier fees first.
+    """
+    def bump():
+        return session.execute(_BUMP, {"b_student": student_fk, "b_amount": float(amount), "b_count": count,
+                                       "b_now": now()}).rowcount
+
+    if not bump():
+        as_of = snapshot_as_of(session)
+        if as_of is None:
+            return  # no snapshot yet; the first refresh() includes this payment
+        session.execute(insert(StudentDue).from_select(_SNAPSHOT_COLUMNS, dues_select(session, as_of, [student_fk])))
+        bump()
+
+
+# ----- fee structure -----
+def set_fee(session, program, year, term, amount, head="Tuition", due_date=None):
+    """Add or change one fee structure row; the caller commits and then refreshes `program`."""
+    row = session.query(FeeStructure).filter_by(program=program, year=int(year), term=term, head=head).first()
+    if row is None:
+        row = FeeStructure(program=program, year=int(year), term=term, head=head)
+        session.add(row)
+    row.amount = float(amount)
+    row.due_date = due_date
+    return row
+
+
+def remove_fee(session, fee_structure_id):
+    row = session.get(FeeStructure, fee_structure_id)
+    if row is not None:
+        session.delete(row)
+    return row
+
+
+def fee_structure(session, program=None):
+    q = select(FeeStructure.id, FeeStructure.program, FeeStructure.year, FeeStructure.term, FeeStructure.head,
+               FeeStructure.amount, FeeStructure.due_date)
+    if program:
+        q = q.where(FeeStructure.program == program)
+    rows = session.execute(q.order_by(FeeStructure.program, FeeStructure.year, FeeStructure.term, FeeStructure.head)).all()
+    return [dict(r._mapping) for r in rows]
+
+
+# ----- defaulters -----
+def _defaulters_stmt(program, year, min_outstanding):
+    stmt = (select(StudentDue.student_id_fk.label("id"), Student.student_id, Student.name, Student.program, Student.year,
+                   Student.mobile, StudentDue.assessed, StudentDue.paid, StudentDue.outstanding, StudentDue.last_payment_at)
+            .join(Student, Student.id == StudentDue.student_id_fk)
+            .where(StudentDue.outstanding >= min_outstanding)
+            .order_by(StudentDue.outstanding.desc(), StudentDue.student_id_fk.desc()))
+    if program:
+        stmt = stmt.where(Student.program == program)
+    if year:
+        stmt = stmt.where(Student.year == year)
+    return stmt
+
+
+def defaulters(session, limit=50, cursor=None, program=None, year=None, min_outstanding=0.01):
+    """Returns (rows, next_cursor); rows are dicts with DEFAULTER_COLUMNS, largest dues first."""
+    stmt = _defaulters_stmt(program, year, min_outstanding)
+    if cursor:
+        amount, sid = cursor.split("|")
+        amount, sid = float(amount), int(sid)
+        # written as a range on outstanding so the index walk starts at the cursor
+        stmt = stmt.where(StudentDue.outstanding <= amount,
+                          or_(StudentDue.outstanding < amount, StudentDue.student_id_fk < sid))
+    rows = session.execute(stmt.limit(limit + 1)).all()
+    nxt = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        nxt = f"{rows[-1].outstanding!r}|{rows[-1].id}"
+    return [{c: r._mapping[c] for c in DEFAULTER_COLUMNS} for r in rows], nxt
+
+
+def dues_summary(session, program=None, year=None, min_outstanding=0.01):
+    """{'defaulters', 'outstanding', 'as_of'} over the same filters as defaulters()."""
+    sub = _defaulters_stmt(program, year, min_outstanding).order_by(None).subquery()
+    n, total = session.execute(select(func.count(), func.coalesce(func.sum(sub.c.outstanding), 0.0))).one()
+    return {"defaulters": n, "outstanding": float(total), "as_of": snapshot_as_of(session)}
+
+
+@timed("export:defaulters")
+def write_defaulters_csv(session, out, program=None, year=None, min_outstanding=0.01):
+    """Stream every defaulter matching the filters to the text file `out`. Returns the row count."""
+    w = csv.writer(out)
+    w.writerow(DEFAULTER_COLUMNS)
+    n = 0
+    for r in session.execute(_defaulters_stmt(program, year, min_outstanding).execution_options(yield_per=5000)):
+        m = r._mapping
+        w.writerow([m[c] for c in DEFAULTER_COLUMNS])
+        n += 1
+    return n
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fee dues snapshot and defaulters report")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("refresh")
+    p.add_argument("--program")
+    p.add_argument("--as-of", type=datetime.date.fromisoformat)
+    p = sub.add_parser("defaulters")
+    p.add_argument("--program")
+    p.add_argument("--year")
+    p.add_argument("--min", type=float, default=0.01, help="smallest outstanding amount listed")
+    p.add_argument("--limit", type=int, default=50)
+    p.add_argument("--csv", help="write every defaulter to this file instead")
+    args = parser.parse_args()
+    if args.cmd == "refresh":
+        r = refresh(args.program, args.as_of)
+        print(f"{r['students']} students assessed as of {r['as_of']} in {r['seconds']:.2f}s")
+    else:
+        s = SessionLocal()
+        try:
+            if args.csv:
+                with open(args.csv, "w", newline="") as f:
+                    n = write_defaulters_csv(s, f, args.program, args.year, args.min)
+                print(f"{n} defaulters written to {args.csv}")
+            else:
+                rows, _ = defaulters(s, args.limit, None, args.program, args.year, args.min)
+                csv.writer(sys.stdout).writerows([DEFAULTER_COLUMNS] + [[r[c] for c in DEFAULTER_COLUMNS] for r in rows])
+        finally:
+            s.close()
@@ -0,0 +1,290 @@
+# hostel.py
+# Room/bed inventory and allocation engine. Free beds are kept in memory per
+# (block, room_type), so picking one is O(1). The partial unique index on active
+# allocations per bed is what prevents double booking, also across processes: a claim
+# that loses the race inserts nothing and the next free bed is tried. Rooms carry an
+# occupied counter that is updated in the allocating transaction, so occupancy reports
+# read hostel_rooms instead of scanning allocations.
+#   python hostel.py add-rooms A 101-120 --type double --capacity 2
+#   python hostel.py allocate batch.csv        (columns: student_id, preferences)
+#   python hostel.py occupancy
+#   python hostel.py rebuild
+import argparse, datetime, threading
+from collections import deque, namedtuple
+from sqlalchemy import select, update, insert, func, and_, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import SessionLocal, Student, HostelAllocation, HostelRoom, HostelBed, now
+from id_allocator import generic_ids
+
+ACTIVE = "Allocated"
+ANY = "*"
+_ACTIVE_WHERE = text("status = 'Allocated'")  # must match ux_hostel_active_bed and ux_hostel_active_student
+HOUSED = object()  # _claim/_take: the student got an active bed from another transaction
+
+Bed = namedtuple("Bed", "id room_id block room_type room_no bed_no")
+
+
+class BedIndex:
+    """Free beds per (block, room_type), filled room by room in room/bed order."""
+
+    def __init__(self):
+        self._free = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def load(self, session):
+        rows = session.execute(
+            select(HostelBed.id, HostelRoom.id, HostelRoom.block, HostelRoom.room_type, HostelRoom.room_no, HostelBed.bed_no)
+            .join(HostelRoom, HostelRoom.id == HostelBed.room_id_fk)
+            .outerjoin(HostelAllocation, and_(HostelAllocation.bed_id_fk == HostelBed.id, HostelAllocation.status == ACTIVE))
+            .where(HostelAllocation.id.is_(None))
+            .order_by(HostelRoom.block, HostelRoom.room_no, HostelBed.bed_no)).all()
+        free = {}
+        for r in rows:
+            bed = Bed(*r)
+            free.setdefault((bed.block, bed.room_type), deque()).append(bed)
+        with self._lock:
+            self._free = free
+            self.loaded = True
+
+    def pop(self, block=ANY, room_type=ANY):
+        with self._lock:
+            if block != ANY and room_type != ANY:
+                keys = [(block, room_type)]
+            else:
+                keys = [k for k in self._free if block in (ANY, k[0]) and room_type in (ANY, k[1])]
+            for k in keys:
+                q = self._free.get(k)
+                if q:
+                    return q.popleft()
+        return None
+
+    def push(self, bed):
+        with self._lock:
+            self._free.setdefault((bed.block, bed.room_type), deque()).appendleft(bed)
+
+    def free_counts(self):
+        with self._lock:
+            return {k: len(q) for k, q in self._free.items()}
+
+
+# beds popped by a transaction that is later rolled back are missing from the index until
+# the next reload, which happens whenever a request finds no free bed
+index = BedIndex()
+
+
+def parse_preferences(spec):
+    """'A/double; B/*; *' -> [('A','double'), ('B','*'), ('*','*')]; empty means anywhere."""
+    prefs = []
+    for part in (spec or "").replace(",", ";").split(";"):
+        part = part.strip()
+        if part:
+            block, _, room_type = part.partition("/")
+            prefs.append((block.strip() or ANY, room_type.strip() or ANY))
+    return prefs or [(ANY, ANY)]
+
+
+def room_numbers(spec):
+    """'101-105,110' -> ['101','102','103','104','105','110']"""
+    out = []
+    for part in str(spec).split(","):
+        part = part.strip()
+        lo, sep, hi = part.partition("-")
+        if sep and lo.isdigit() and hi.isdigit():
+            out.extend(str(n).zfill(len(lo)) for n in range(int(lo), int(hi) + 1))
+        elif part:
+            out.append(part)
+    return out
+
+
+def add_rooms(session, block, room_nos, room_type="standard", capacity=2):
+    """Create rooms with beds 1..capacity. The caller commits. Returns the number of beds added."""
+    session.execute(insert(HostelRoom), [{"block": block, "room_no": r, "room_type": room_type,
+                                          "capacity": capacity, "occupied": 0} for r in room_nos])
+    room_ids = session.execute(select(HostelRoom.id).where(HostelRoom.block == block, HostelRoom.room_no.in_(room_nos))).scalars().all()
+    session.execute(insert(HostelBed), [{"room_id_fk": rid, "bed_no": str(b)} for rid in room_ids for b in range(1, capacity + 1)])
+    index.loaded = False
+    return len(room_ids) * capacity
+
+
+def _claim(session, bed, values):
+    ins = (pg_insert if session.bind.dialect.name == "postgresql" else sqlite_insert)(HostelAllocation)
+    ins = ins.values(bed_id_fk=bed.id, block=bed.block, room_no=bed.room_no, bed_no=bed.bed_no, status=ACTIVE, **values)
+    # no conflict target: either partial unique index (bed or student) turns the insert into a no-op
+    if session.execute(ins.on_conflict_do_nothing()).rowcount == 0:
+        housed = session.execute(select(HostelAllocation.id).where(
+            HostelAllocation.student_id_fk == values["student_id_fk"], HostelAllocation.status == ACTIVE)).first()
+        return HOUSED if housed else False  # else another transaction holds this bed
+    session.execute(update(HostelRoom).where(HostelRoom.id == bed.room_id).values(occupied=HostelRoom.occupied + 1))
+    return True
+
+
+def _take(session, prefs, values, reloaded):
+    for block, room_type in prefs:
+        while True:
+            bed = index.pop(block, room_type)
+            if bed is None:
+                break
+            claimed = _claim(session, bed, values)
+            if claimed is HOUSED:
+                index.push(bed)  # not taken by this claim; if someone else holds it, the next claim skips it
+                return HOUSED
+            if claimed:
+                return bed
+    if not reloaded[0]:
+        # beds may have been freed by another process since the index was loaded
+        reloaded[0] = True
+        index.load(session)
+        return _take(session, prefs, values, reloaded)
+    return None
+
+
+def allocate(session, requests, allocated_by=None, move_in=None, alloc_ids=None):
+    """
+    requests: [{'student_id', 'preferences': [(block, room_type), ...], 'notes'}], tried in
+    order, ANY matching every block or type. Everything goes into the session's transaction;
+    the caller commits. Returns one {'student_id','status','allocation_id','block','room_no','bed_no'}
+    per request, status ok, not_found, already_allocated or no_bed. alloc_ids: one reserved
+    allocation id per request (api.py takes them off its event loop); by default reserved here.
+    """
+    wanted = {r["student_id"] for r in requests}
+    pks = dict(session.execute(select(Student.student_id, Student.id).where(Student.student_id.in_(wanted))).all()) if wanted else {}
+    housed = set(session.execute(select(HostelAllocation.student_id_fk).where(
+        HostelAllocation.student_id_fk.in_(pks.values()), HostelAllocation.status == ACTIVE)).scalars()) if pks else set()
+    # ids come from their own connection, so take them before this transaction writes
+    alloc_ids = iter(alloc_ids if alloc_ids is not None else generic_ids("HST", len(requests)))
+    if not index.loaded:
+        index.load(session)
+    move_in = (move_in or datetime.date.today()).isoformat()
+    reloaded = [False]
+    results, taken = [], []
+    try:
+        for r in requests:
+            res = {"student_id": r["student_id"], "status": "ok", "allocation_id": None,
+                   "block": None, "room_no": None, "bed_no": None}
+            results.append(res)
+            fk = pks.get(r["student_id"])
+            if fk is None:
+                res["status"] = "not_found"
+                continue
+            if fk in housed:
+                res["status"] = "already_allocated"
+                continue
+            alloc_id = next(alloc_ids)
+            bed = _take(session, r.get("preferences") or [(ANY, ANY)],
+                        {"allocation_id": alloc_id, "student_id_fk": fk, "move_in": move_in,
+                         "allocated_by": allocated_by, "notes": r.get("notes"), "requested_at": now()}, reloaded)
+            if bed is None:
+                res["status"] = "no_bed"
+                continue
+            if bed is HOUSED:
+                res["status"] = "already_allocated"
+                continue
+            taken.append(bed)
+            housed.add(fk)
+            res.update(allocation_id=alloc_id, block=bed.block, room_no=bed.room_no, bed_no=bed.bed_no)
+    except Exception:
+        for bed in taken:
+            index.push(bed)
+        raise
+    return results
+
+
+def vacate(session, allocation_id, move_out=None):
+    """End an active allocation and free its bed. The caller commits. Returns False if not active."""
+    row = session.execute(select(HostelAllocation.id, HostelAllocation.bed_id_fk).where(
+        HostelAllocation.allocation_id == allocation_id, HostelAllocation.status == ACTIVE)).first()
+    if row is None:
+        return False
+    session.execute(update(HostelAllocation).where(HostelAllocation.id == row.id, HostelAllocation.status == ACTIVE)
+                    .values(status="Vacated", move_out=(move_out or datetime.date.today()).isoformat()))
+    if row.bed_id_fk is not None:
+        bed = session.execute(
+            select(HostelBed.id, HostelRoom.id, HostelRoom.block, HostelRoom.room_type, HostelRoom.room_no, HostelBed.bed_no)
+            .join(HostelRoom, HostelRoom.id == HostelBed.room_id_fk).where(HostelBed.id == row.bed_id_fk)).first()
+        session.execute(update(HostelRoom).where(HostelRoom.id == bed[1]).values(occupied=HostelRoom.occupied - 1))
+        if index.loaded:
+            index.push(Bed(*bed))
+    return True
+
+
+def occupancy(session):
+    """Per block and room type: rooms, beds, occupied and free, from the room counters."""
+    rows = session.execute(
+        select(HostelRoom.block, HostelRoom.room_type, func.count(HostelRoom.id),
+               func.sum(HostelRoom.capacity), func.sum(HostelRoom.occupied))
+        .group_by(HostelRoom.block, HostelRoom.room_type).order_by(HostelRoom.block, HostelRoom.room_type)).all()
+    return [{"block": b, "room_type": t, "rooms": n, "beds": int(cap or 0), "occupied": int(occ or 0),
+             "free": int(cap or 0) - int(occ or 0)} for b, t, n, cap, occ in rows]
+
+
+def rebuild():
+    """
+    Link legacy free-text allocations to inventory beds where block/room/bed match and the
+    bed is free, then recompute every room's occupied counter. Returns {'linked','unmatched'}.
+    """
+    s = SessionLocal()
+    try:
+        beds = {(b, r, n): i for i, b, r, n in s.execute(
+            select(HostelBed.id, HostelRoom.block, HostelRoom.room_no, HostelBed.bed_no)
+            .join(HostelRoom, HostelRoom.id == HostelBed.room_id_fk))}
+        used = set(s.execute(select(HostelAllocation.bed_id_fk).where(
+            HostelAllocation.status == ACTIVE, HostelAllocation.bed_id_fk.isnot(None))).scalars())
+        legacy = s.execute(select(HostelAllocation.id, HostelAllocation.block, HostelAllocation.room_no, HostelAllocation.bed_no)
+                           .where(HostelAllocation.status == ACTIVE, HostelAllocation.bed_id_fk.is_(None))).all()
+        links = []
+        for aid, b, r, n in legacy:
+            bed = beds.get(((b or "").strip(), (r or "").strip(), (n or "").strip()))
+            if bed is not None and bed not in used:
+                used.add(bed)
+                links.append({"id": aid, "bed_id_fk": bed})
+        if links:
+            s.bulk_update_mappings(HostelAllocation, links)
+        active = (select(func.count(HostelAllocation.id)).join(HostelBed, HostelBed.id == HostelAllocation.bed_id_fk)
+                  .where(HostelBed.room_id_fk == HostelRoom.id, HostelAllocation.status == ACTIVE).scalar_subquery())
+        s.execute(update(HostelRoom).values(occupied=active))
+        s.commit()
+        index.load(s)
+        return {"linked": len(links), "unmatched": len(legacy) - len(links)}
+    finally:
+        s.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hostel inventory and allocation")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("add-rooms")
+    p.add_argument("block")
+    p.add_argument("rooms", help="e.g. 101-120,201")
+    p.add_argument("--type", default="standard")
+    p.add_argument("--capacity", type=int, default=2)
+    p = sub.add_parser("allocate", help="CSV with columns student_id, preferences ('A/double; B/*')")
+    p.add_argument("path")
+    p.add_argument("--by", default=None)
+    sub.add_parser("occupancy")
+    sub.add_parser("rebuild")
+    args = parser.parse_args()
+    s = SessionLocal()
+    try:
+        if args.cmd == "add-rooms":
+            n = add_rooms(s, args.block, room_numbers(args.rooms), args.type, args.capacity)
+            s.commit()
+            print(f"added {n} beds to block {args.block}")
+        elif args.cmd == "allocate":
+            import pandas as pd
+            df = pd.read_csv(args.path, dtype=str, keep_default_na=False)
+            reqs = [{"student_id": r["student_id"].strip(), "preferences": parse_preferences(r.get("preferences", ""))}
+                    for r in df.to_dict("records")]
+            res = allocate(s, reqs, allocated_by=args.by)
+            s.commit()
+            for r in res:
+                where = f" {r['block']}-{r['room_no']}-{r['bed_no']}" if r["status"] == "ok" else ""
+                print(f"{r['student_id']}: {r['status']}{where}")
+        elif args.cmd == "occupancy":
+            for r in occupancy(s):
+                print(f"{r['block']:>6} {r['room_type']:>12} rooms={r['rooms']} beds={r['beds']} occupied={r['occupied']} free={r['free']}")
+        else:
+            print(rebuild())
+    finally:
+        s.close()
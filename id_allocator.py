@@ -0,0 +1,74 @@
+# id_allocator.py
+# Collision-free, monotonic ids. Each counter (prefix + year) lives in id_counters;
+# a process reserves a block of ids with one UPDATE and hands them out from memory,
+# so most ids cost no database round trip and blocks never overlap across processes.
+import datetime, threading
+from sqlalchemy import select, update, func, cast, Integer
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import engine as default_engine, IdCounter, Student, now
+from config import ID_BLOCK_SIZE
+
+# old student ids were COLG<yy>S + random 10000-99999; sequences start above that range
+STUDENT_SEQ_FLOOR = 100000
+
+
+class IdAllocator:
+    def __init__(self, engine=None, block_size=ID_BLOCK_SIZE):
+        self.engine = engine or default_engine
+        self.block_size = block_size
+        self._blocks = {}  # counter name -> [next, end)
+        self._lock = threading.Lock()
+
+    def _reserve(self, name, size, floor):
+        """Atomically move the counter forward by `size`; returns the first id of the block.
+        Runs on its own connection, so call it outside an open SQLite write transaction."""
+        insert = pg_insert if self.engine.dialect.name == "postgresql" else sqlite_insert
+        with self.engine.begin() as conn:
+            for _ in range(2):
+                bumped = conn.execute(update(IdCounter).where(IdCounter.name == name)
+                                      .values(next_value=IdCounter.next_value + size, updated_at=now())).rowcount
+                if bumped:
+                    return conn.execute(select(IdCounter.next_value).where(IdCounter.name == name)).scalar_one() - size
+                start = floor(conn) if callable(floor) else floor
+                conn.execute(insert(IdCounter).values(name=name, next_value=start, updated_at=now())
+                             .on_conflict_do_nothing())
+        raise RuntimeError(f"could not reserve ids for {name}")
+
+    def take(self, name, n=1, floor=1):
+        """Return `n` increasing, never-reused integers for counter `name`."""
+        with self._lock:
+            block = self._blocks.get(name)
+            out = []
+            while len(out) < n:
+                if block is None or block[0] >= block[1]:
+                    size = max(self.block_size, n - len(out))
+                    start = self._reserve(name, size, floor)
+                    block = self._blocks[name] = [start, start + size]
+                k = min(n - len(out), block[1] - block[0])
+                out.extend(range(block[0], block[0] + k))
+                block[0] += k
+            return out
+
+
+allocator = IdAllocator()
+
+
+def _student_floor(head):
+    def floor(conn):
+        last = conn.execute(select(func.max(cast(func.substr(Student.student_id, len(head) + 1), Integer)))
+                            .where(Student.student_id.like(f"{head}%"))).scalar() or 0
+        return max(int(last) + 1, STUDENT_SEQ_FLOOR)
+    return floor
+
+
+def student_ids(n, prefix="COLG"):
+    year = datetime.datetime.utcnow().year % 100
+    head = f"{prefix}{year:02d}S"
+    return [f"{head}{v}" for v in allocator.take(head, n, floor=_student_floor(head))]
+
+
+def generic_ids(prefix, n):
+    year = datetime.datetime.utcnow().year % 100
+    name = f"{prefix}-{year:02d}"
+    return [f"{name}-{v:08d}" for v in allocator.take(name, n)]
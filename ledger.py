@@ -0,0 +1,132 @@
+# ledger.py
+# Per-student running balance kept in student_accounts and updated in the same
+# transaction as each Fee insert.
+# Rebuilds and opening balances read archived years too (archive.history).
+#   python ledger.py rebuild   recompute every account from the fees table
+#   python ledger.py verify    compare accounts against the fees table
+import argparse
+from sqlalchemy import func, update, select, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import SessionLocal, Fee, StudentAccount, now
+from dues import apply_payment as apply_to_dues
+from archive import history
+
+
+def _insert_ignore(session, **values):
+    dialect = session.bind.dialect.name
+    if dialect == "postgresql":
+        stmt = pg_insert(StudentAccount).values(**values).on_conflict_do_nothing()
+    elif dialect == "sqlite":
+        stmt = sqlite_insert(StudentAccount).values(**values).on_conflict_do_nothing()
+    else:
+        raise RuntimeError(f"ledger does not support the {dialect} dialect")
+    session.execute(stmt)
+
+
+def _bump(session, student_fk, amount, count):
+    res = session.execute(
+        update(StudentAccount)
+        .where(StudentAccount.student_id_fk == student_fk)
+        .values(balance=StudentAccount.balance - amount, payments=StudentAccount.payments + count, updated_at=now())
+    )
+    return res.rowcount
+
+
+def apply_payment(session, student_fk, amount, count=1):
+    """
+    Debit `amount` from the student's account inside the caller's transaction and
+    return the new balance. The UPDATE takes the row (Postgres) or database (SQLite)
+    write lock, so concurrent payments for one student serialize instead of reading
+    the same previous balance.
+    """
+    amount = float(amount or 0.0)
+    if not _bump(session, student_fk, amount, count):
+        # first payment since the ledger was introduced: open the account from history
+        fees = history(session, Fee)
+        paid, n = session.execute(select(func.coalesce(func.sum(fees.c.amount), 0.0), func.count(fees.c.id))
+                                  .where(fees.c.student_id_fk == student_fk)).one()
+        _insert_ignore(session, student_id_fk=student_fk, balance=-float(paid), payments=n, updated_at=now())
+        _bump(session, student_fk, amount, count)
+    apply_to_dues(session, student_fk, amount, count)
+    return session.execute(
+        select(StudentAccount.balance).where(StudentAccount.student_id_fk == student_fk)
+    ).scalar_one()
+
+
+def record_payment(session, student, amount, **fee_fields):
+    """Insert a Fee row with balance_after taken from the ledger; the caller commits."""
+    balance_after = apply_payment(session, student.id, amount)
+    fee = Fee(student_id_fk=student.id, name=student.name, amount=amount, balance_after=balance_after, **fee_fields)
+    session.add(fee)
+    return fee
+
+
+def get_balance(session, student_fk):
+    bal = session.query(StudentAccount.balance).filter(StudentAccount.student_id_fk == student_fk).scalar()
+    if bal is None:
+        fees = history(session, Fee)
+        bal = -float(session.execute(select(func.coalesce(func.sum(fees.c.amount), 0.0))
+                                     .where(fees.c.student_id_fk == student_fk)).scalar())
+    return bal
+
+
+def _fee_totals(session):
+    fees = history(session, Fee)
+    return (select(fees.c.student_id_fk, (-func.coalesce(func.sum(fees.c.amount), 0.0)).label("balance"),
+                   func.count(fees.c.id).label("payments"))
+            .where(fees.c.student_id_fk.isnot(None))
+            .group_by(fees.c.student_id_fk))
+
+
+def rebuild(session=None):
+    """Recompute every account from the fees table in one INSERT ... SELECT; returns accounts written."""
+    s = session or SessionLocal()
+    try:
+        if s.bind.dialect.name == "postgresql":
+            # keep payments out while the accounts are swapped
+            s.connection().exec_driver_sql("LOCK TABLE fees IN SHARE ROW EXCLUSIVE MODE")
+        s.query(StudentAccount).delete(synchronize_session=False)
+        totals = _fee_totals(s).subquery()
+        s.execute(insert(StudentAccount).from_select(
+            ["student_id_fk", "balance", "payments", "updated_at"],
+            select(totals.c.student_id_fk, totals.c.balance, totals.c.payments, func.current_timestamp())))
+        n = s.query(func.count(StudentAccount.student_id_fk)).scalar()
+        s.commit()
+        return n
+    finally:
+        if session is None:
+            s.close()
+
+
+def verify(session=None, tolerance=0.005):
+    """Return a list of (student_id_fk, ledger_balance, fees_balance) that disagree."""
+    s = session or SessionLocal()
+    try:
+        expected = {sid: bal for sid, bal, _ in s.execute(_fee_totals(s))}
+        actual = dict(s.query(StudentAccount.student_id_fk, StudentAccount.balance))
+        bad = []
+        for sid in expected.keys() | actual.keys():
+            exp, act = expected.get(sid, 0.0), actual.get(sid)
+            if act is None and exp == 0.0:
+                continue
+            if act is None or abs(act - exp) > tolerance:
+                bad.append((sid, act, exp))
+        return sorted(bad)
+    finally:
+        if session is None:
+            s.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Student balance ledger maintenance")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    args = parser.parse_args()
+    if args.command == "rebuild":
+        print(f"Rebuilt {rebuild()} student accounts from the fees table.")
+    else:
+        mismatches = verify()
+        for sid, act, exp in mismatches:
+            print(f"student {sid}: ledger={act} fees={exp}")
+        print(f"{len(mismatches)} mismatching accounts.")
+        raise SystemExit(1 if mismatches else 0)
@@ -0,0 +1,97 @@
+# listing.py
+# Keyset-paginated queries behind the Recent Payments, Hostel Occupancy and Recent Grades
+# panels. Each page is a single SELECT projecting only the displayed columns, with the
+# student joined in, so the number of queries per panel does not depend on table size.
+# Cursors are opaque strings "<iso timestamp or ->|<id>" pointing at the last row shown.
+import datetime
+from sqlalchemy import select, and_, or_
+from models import Fee, Exam, HostelAllocation, Student
+
+
+def encode_cursor(ts, row_id):
+    return f"{ts.isoformat() if ts else '-'}|{row_id}"
+
+
+def decode_cursor(cursor):
+    ts, row_id = cursor.split("|")
+    return (None if ts == "-" else datetime.datetime.fromisoformat(ts)), int(row_id)
+
+
+def _after(ts_col, id_col, cursor):
+    # rows strictly after the cursor in (ts DESC, id DESC) order
+    ts, row_id = decode_cursor(cursor)
+    if ts is None:
+        return and_(ts_col.is_(None), id_col < row_id)
+    return or_(ts_col < ts, and_(ts_col == ts, id_col < row_id), ts_col.is_(None))
+
+
+def _day_range(stmt, col, date_from, date_to):
+    if date_from:
+        stmt = stmt.where(col >= datetime.datetime.combine(date_from, datetime.time.min))
+    if date_to:
+        stmt = stmt.where(col < datetime.datetime.combine(date_to, datetime.time.min) + datetime.timedelta(days=1))
+    return stmt
+
+
+def _page(session, stmt, limit, ts_key, columns):
+    rows = session.execute(stmt.limit(limit + 1)).all()
+    nxt = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]._mapping
+        nxt = encode_cursor(last[ts_key] if ts_key else None, last["id"])
+    return [{c: r._mapping[c] for c in columns} for r in rows], nxt
+
+
+PAYMENT_COLUMNS = ["receipt_id", "student", "student_id", "amount", "mode", "ts", "invoice"]
+
+def recent_payments(session, limit=20, cursor=None, student_id=None, mode=None, date_from=None, date_to=None):
+    """Returns (rows, next_cursor); rows are dicts with PAYMENT_COLUMNS, newest first."""
+    stmt = (select(Fee.id, Fee.receipt_id, Fee.name.label("student"), Student.student_id, Fee.amount,
+                   Fee.payment_mode.label("mode"), Fee.timestamp.label("ts"), Fee.invoice_path.label("invoice"))
+            .outerjoin(Student, Student.id == Fee.student_id_fk)
+            .order_by(Fee.timestamp.desc().nulls_last(), Fee.id.desc()))
+    if student_id:
+        stmt = stmt.where(Student.student_id == student_id)
+    if mode:
+        stmt = stmt.where(Fee.payment_mode == mode)
+    stmt = _day_range(stmt, Fee.timestamp, date_from, date_to)
+    if cursor:
+        stmt = stmt.where(_after(Fee.timestamp, Fee.id, cursor))
+    return _page(session, stmt, limit, "ts", PAYMENT_COLUMNS)
+
+
+HOSTEL_COLUMNS = ["alloc_id", "student", "block", "room", "bed", "status"]
+
+def hostel_occupancy(session, limit=50, cursor=None, block=None, status=None):
+    """Returns (rows, next_cursor); newest allocations first."""
+    stmt = (select(HostelAllocation.id, HostelAllocation.allocation_id.label("alloc_id"), Student.name.label("student"),
+                   HostelAllocation.block, HostelAllocation.room_no.label("room"), HostelAllocation.bed_no.label("bed"),
+                   HostelAllocation.status)
+            .outerjoin(Student, Student.id == HostelAllocation.student_id_fk)
+            .order_by(HostelAllocation.id.desc()))
+    if block:
+        stmt = stmt.where(HostelAllocation.block == block)
+    if status:
+        stmt = stmt.where(HostelAllocation.status == status)
+    if cursor:
+        stmt = stmt.where(HostelAllocation.id < decode_cursor(cursor)[1])
+    return _page(session, stmt, limit, None, HOSTEL_COLUMNS)
+
+
+GRADE_COLUMNS = ["exam_id", "student", "subject", "marks", "status"]
+
+def recent_grades(session, limit=30, cursor=None, subject=None, status=None, date_from=None, date_to=None):
+    """Returns (rows, next_cursor); `subject` matches subject code or name exactly."""
+    stmt = (select(Exam.id, Exam.exam_id, Student.name.label("student"), Exam.subject_name.label("subject"),
+                   Exam.marks, Exam.status, Exam.graded_at)
+            .outerjoin(Student, Student.id == Exam.student_id_fk)
+            .order_by(Exam.graded_at.desc().nulls_last(), Exam.id.desc()))
+    if subject:
+        stmt = stmt.where(or_(Exam.subject_code == subject, Exam.subject_name == subject))
+    if status:
+        stmt = stmt.where(Exam.status == status)
+    stmt = _day_range(stmt, Exam.graded_at, date_from, date_to)
+    if cursor:
+        stmt = stmt.where(_after(Exam.graded_at, Exam.id, cursor))
+    return _page(session, stmt, limit, "graded_at", GRADE_COLUMNS)
@@ -0,0 +1,92 @@
+# loadtest_webhook.py
+# Runs webhook_forwarder against a throwaway database and plays a payment gateway
+# sending a burst of callbacks (with some retried duplicates) to measure payments/sec.
+#   python loadtest_webhook.py --payments 5000 --concurrency 16
+# modes: single  - one POST /webhook per payment, one transaction each
+#        queued  - one POST /webhook per payment, grouped by the background batcher
+#        batch   - POST /webhook/batch with --batch-size payments per request, via the batcher
+import argparse, logging, os, random, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--payments", type=int, default=5000)
+parser.add_argument("--students", type=int, default=2000)
+parser.add_argument("--concurrency", type=int, default=16)
+parser.add_argument("--batch-size", type=int, default=100)
+parser.add_argument("--duplicates", type=float, default=0.05, help="fraction of callbacks that are retries")
+parser.add_argument("--modes", nargs="+", default=["single", "queued", "batch"])
+args = parser.parse_args()
+
+tmpdir = tempfile.mkdtemp(prefix="erp_webhook_load_")
+os.environ["COLLEGE_ERP_DB_PATH"] = os.path.join(tmpdir, "load.db")
+
+import requests
+from sqlalchemy import insert, func
+from werkzeug.serving import make_server
+from models import init_db, SessionLocal, Student, Fee
+import ledger
+import payment_ingest
+import webhook_forwarder
+
+
+def start_server():
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    srv = make_server("127.0.0.1", 0, webhook_forwarder.app, threaded=True)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f"http://127.0.0.1:{srv.server_port}"
+
+
+def gateway_events(mode, n):
+    rng = random.Random(7)
+    events = []
+    for i in range(n):
+        if events and rng.random() < args.duplicates:
+            events.append(dict(rng.choice(events)))  # gateway retry of an earlier callback
+        else:
+            events.append({"secret": webhook_forwarder.SHARED_SECRET, "transaction_id": f"{mode}-{i}",
+                           "student_id": f"LOAD{rng.randint(1, args.students):06d}",
+                           "amount": float(rng.randint(100, 5000)), "purpose": "Tuition"})
+    return events
+
+
+def run(mode, base):
+    events = gateway_events(mode, args.payments)
+    http = threading.local()
+
+    def post(path, body):
+        if not hasattr(http, "s"):
+            http.s = requests.Session()
+        r = http.s.post(base + path, json=body, timeout=60)
+        return r.status_code
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        if mode == "batch":
+            chunks = [events[i:i + args.batch_size] for i in range(0, len(events), args.batch_size)]
+            codes = list(pool.map(lambda c: post("/webhook/batch", {"secret": webhook_forwarder.SHARED_SECRET, "payments": c}), chunks))
+        else:
+            codes = list(pool.map(lambda e: post("/webhook", e), events))
+    return time.perf_counter() - t0, sum(1 for c in codes if c >= 500)
+
+
+def main():
+    init_db()
+    s = SessionLocal()
+    s.execute(insert(Student), [{"student_id": f"LOAD{i:06d}", "name": f"Student {i}"} for i in range(1, args.students + 1)])
+    s.commit()
+    srv, base = start_server()
+    print(f"{'mode':>8} {'payments':>9} {'seconds':>8} {'payments/s':>11} {'fee rows':>9} {'5xx':>5}")
+    for mode in args.modes:
+        webhook_forwarder.batcher = None if mode == "single" else payment_ingest.PaymentBatcher()
+        before = s.query(func.count(Fee.id)).scalar()
+        dt, failed = run(mode, base)
+        rows = s.query(func.count(Fee.id)).scalar() - before
+        print(f"{mode:>8} {args.payments:>9} {dt:>8.2f} {args.payments / dt:>11.0f} {rows:>9} {failed:>5}")
+    srv.shutdown()
+    bad = ledger.verify()
+    print("ledger verify:", "ok" if not bad else f"{len(bad)} mismatches")
+    s.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+# metrics.py
+# Latency and query instrumentation for this process. SQLAlchemy cursor events time every
+# statement on every engine. Spans time units of work: a Streamlit page run, a webhook or
+# API request, a receipt render, a backup export. Each statement is counted against the
+# spans active in the current thread/task, and a span in which one statement ran
+# N_PLUS_ONE_THRESHOLD times or more is recorded as an N+1 suspect.
+# render() is the Prometheus text format served at /metrics by webhook_forwarder.py and
+# api.py; summary() feeds the Admin page. Off with COLLEGE_ERP_METRICS=0.
+import bisect, contextlib, contextvars, functools, re, threading, time, zlib
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from config import METRICS_ENABLED, N_PLUS_ONE_THRESHOLD, METRICS_MAX_STATEMENTS
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation (max for the +Inf bucket)."""
+        rank, seen = q * self.count, 0
+        for bound, n in zip(BUCKETS, self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(bound, self.max)
+        return self.max
+
+
+class Span:
+    __slots__ = ("name", "start", "queries", "db_seconds", "statements", "token")
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements = {}  # statement key -> executions in this span
+        self.token = None
+
+
+_active = contextvars.ContextVar("erp_metrics_spans", default=())
+_lock = threading.Lock()
+_spans = {}  # span name -> Histogram
+_span_queries = {}  # span name -> [statements, db seconds]
+_ops = {}  # SELECT/INSERT/... -> Histogram
+_statements = {}  # statement key -> [calls, seconds, max seconds, sql]
+_n_plus_one = {}  # (span name, statement key) -> [spans flagged, most executions in one span]
+_started = time.time()
+
+
+@functools.lru_cache(maxsize=4096)
+def _key(statement):
+    """(key, op, sql): IN lists of any length share one key; key is 'op:table:hash'."""
+    sql = re.sub(r"\((?:\s*(?:\?|%\(\w+\)s|%s)\s*,)+\s*(?:\?|%\(\w+\)s|%s)\s*\)", "(?...)", " ".join(statement.split()))
+    op = sql.split(" ", 1)[0].upper()
+    table = re.search(r"\b(?:FROM|INTO|UPDATE)\s+\"?(\w+)", sql, re.I)
+    return f"{op.lower()}:{table.group(1) if table else '-'}:{zlib.crc32(sql.encode()) & 0xffffff:06x}", op, sql
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_t0 = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    t0 = getattr(context, "_metrics_t0", None)
+    if t0 is None:
+        return
+    elapsed = time.perf_counter() - t0
+    key, op, sql = _key(statement)
+    with _lock:
+        stat = _statements.get(key)
+        if stat is None:
+            if len(_statements) >= METRICS_MAX_STATEMENTS:
+                key, sql = "other", "(statements beyond METRICS_MAX_STATEMENTS)"
+            stat = _statements.setdefault(key, [0, 0.0, 0.0, sql])
+        stat[0] += 1
+        stat[1] += elapsed
+        if elapsed > stat[2]:
+            stat[2] = elapsed
+        hist = _ops.get(op)
+        if hist is None:
+            hist = _ops[op] = Histogram()
+        hist.observe(elapsed)
+    for span in _active.get():
+        span.queries += 1
+        span.db_seconds += elapsed
+        span.statements[key] = span.statements.get(key, 0) + 1
+
+
+def install():
+    """Time statements on every engine in this process (idempotent)."""
+    if not event.contains(Engine, "before_cursor_execute", _before_execute):
+        event.listen(Engine, "before_cursor_execute", _before_execute)
+        event.listen(Engine, "after_cursor_execute", _after_execute)
+
+
+def observe(name, seconds, queries=0, db_seconds=0.0):
+    """Record a span measured elsewhere, e.g. a receipt rendered in a pool process."""
+    with _lock:
+        hist = _spans.get(name)
+        if hist is None:
+            hist = _spans[name] = Histogram()
+        hist.observe(seconds)
+        q = _span_queries.setdefault(name, [0, 0.0])
+        q[0] += queries
+        q[1] += db_seconds
+
+
+def begin(name, root=False):
+    """Start a span; root=True drops spans a previous unit of work left open (st.stop, reruns)."""
+    if not METRICS_ENABLED:
+        return None
+    span = Span(name)
+    span.token = _active.set((span,) if root else _active.get() + (span,))
+    return span
+
+
+def end(span):
+    if span is None:
+        return
+    elapsed = time.perf_counter() - span.start
+    try:
+        _active.reset(span.token)
+    except ValueError:  # opened in another context
+        pass
+    observe(span.name, elapsed, span.queries, span.db_seconds)
+    repeated = [(k, n) for k, n in span.statements.items() if n >= N_PLUS_ONE_THRESHOLD]
+    if repeated:
+        with _lock:
+            for k, n in repeated:
+                rec = _n_plus_one.setdefault((span.name, k), [0, 0])
+                rec[0] += 1
+                rec[1] = max(rec[1], n)
+
+
+@contextlib.contextmanager
+def span(name, root=False):
+    s = begin(name, root)
+    try:
+        yield s
+    finally:
+        end(s)
+
+
+def timed(name):
+    """Decorator form of span()."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def reset():
+    with _lock:
+        for d in (_spans, _span_queries, _ops, _statements, _n_plus_one):
+            d.clear()
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _histogram_lines(name, label, items):
+    out = []
+    for value, h in items:
+        cum = 0
+        for bound, n in zip(BUCKETS, h.counts):
+            cum += n
+            out.append(f'{name}_bucket{{{label}="{_label(value)}",le="{bound}"}} {cum}')
+        out.append(f'{name}_bucket{{{label}="{_label(value)}",le="+Inf"}} {h.count}')
+        out.append(f'{name}_sum{{{label}="{_label(value)}"}} {h.sum:.6f}')
+        out.append(f'{name}_count{{{label}="{_label(value)}"}} {h.count}')
+    return out
+
+
+def render():
+    """Prometheus text exposition of everything recorded in this process."""
+    with _lock:
+        spans = sorted(_spans.items())
+        span_queries = sorted(_span_queries.items())
+        ops = sorted(_ops.items())
+        statements = sorted(_statements.items())
+        n1 = sorted(_n_plus_one.items())
+    lines = ["# HELP erp_span_seconds Duration of instrumented units of work (page runs, requests, renders).",
+             "# TYPE erp_span_seconds histogram"]
+    lines += _histogram_lines("erp_span_seconds", "span", spans)
+    lines += ["# HELP erp_span_queries_total SQL statements executed inside spans.",
+              "# TYPE erp_span_queries_total counter"]
+    lines += [f'erp_span_queries_total{{span="{_label(n)}"}} {q}' for n, (q, _) in span_queries]
+    lines += ["# HELP erp_span_db_seconds_total Time spent in SQL inside spans.",
+              "# TYPE erp_span_db_seconds_total counter"]
+    lines += [f'erp_span_db_seconds_total{{span="{_label(n)}"}} {s:.6f}' for n, (_, s) in span_queries]
+    lines += ["# HELP erp_db_query_seconds SQL statement latency by operation.",
+              "# TYPE erp_db_query_seconds histogram"]
+    lines += _histogram_lines("erp_db_query_seconds", "op", ops)
+    lines += ["# HELP erp_db_statement_calls_total Executions per distinct statement (see the Admin page for SQL).",
+              "# TYPE erp_db_statement_calls_total counter"]
+    lines += [f'erp_db_statement_calls_total{{stmt="{k}"}} {v[0]}' for k, v in statements]
+    lines += ["# HELP erp_db_statement_seconds_total Time per distinct statement.",
+              "# TYPE erp_db_statement_seconds_total counter"]
+    lines += [f'erp_db_statement_seconds_total{{stmt="{k}"}} {v[1]:.6f}' for k, v in statements]
+    lines += [f"# HELP erp_n_plus_one_total Spans in which one statement ran {N_PLUS_ONE_THRESHOLD}+ times.",
+              "# TYPE erp_n_plus_one_total counter"]
+    lines += [f'erp_n_plus_one_total{{span="{_label(sp)}",stmt="{k}"}} {v[0]}' for (sp, k), v in n1]
+    lines += ["# HELP erp_process_start_time_seconds Start of this process's metrics.",
+              "# TYPE erp_process_start_time_seconds gauge", f"erp_process_start_time_seconds {_started:.0f}"]
+    return "\n".join(lines) + "\n"
+
+
+def summary(top=20):
+    """{'spans', 'statements' (slowest by total time), 'n_plus_one'} as lists of dicts for display."""
+    with _lock:
+        spans = [{"span": n, "runs": h.count, "p50_ms": h.quantile(0.5) * 1000, "p95_ms": h.quantile(0.95) * 1000,
+                  "max_ms": h.max * 1000, "mean_ms": h.sum / h.count * 1000,
+                  "queries_per_run": _span_queries.get(n, [0])[0] / h.count} for n, h in sorted(_spans.items())]
+        statements = [{"stmt": k, "calls": v[0], "total_ms": v[1] * 1000, "mean_ms": v[1] / v[0] * 1000,
+                       "max_ms": v[2] * 1000, "sql": v[3][:300]}
+                      for k, v in sorted(_statements.items(), key=lambda kv: -kv[1][1])[:top]]
+        n1 = [{"span": sp, "stmt": k, "runs_flagged": v[0], "max_repeats": v[1], "sql": _statements.get(k, [0, 0, 0, ""])[3][:300]}
+              for (sp, k), v in sorted(_n_plus_one.items(), key=lambda kv: -kv[1][1])]
+    return {"spans": spans, "statements": statements, "n_plus_one": n1}
+
+
+if METRICS_ENABLED:
+    install()
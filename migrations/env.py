@@ -0,0 +1,42 @@
+# migrations/env.py
+# Runs migrations against config.DB_URL with models.Base.metadata as the autogenerate
+# target. init_db() passes its own connection in config.attributes["connection"].
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy import create_engine, pool
+from models import Base
+import config as erp_config
+
+target_metadata = Base.metadata
+if context.config.config_file_name and "connection" not in context.config.attributes:
+    fileConfig(context.config.config_file_name)  # alembic CLI only; leave the app's logging alone
+
+
+def _configure(**kw):
+    # batch mode lets ALTER-style operations work on SQLite by copying the table
+    context.configure(target_metadata=target_metadata, render_as_batch=True, **kw)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_offline():
+    _configure(url=erp_config.DB_URL, literal_binds=True)
+
+
+def run_migrations_online():
+    conn = context.config.attributes.get("connection")
+    if conn is not None:
+        _configure(connection=conn)
+        return
+    engine = create_engine(erp_config.DB_URL, poolclass=pool.NullPool)
+    try:
+        with engine.connect() as conn:
+            _configure(connection=conn)
+    finally:
+        engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,114 @@
+"""baseline: the tables models.init_db() created before any of the later revisions
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+A database created before migrations were introduced already has these tables;
+init_db() stamps it at 0001 and upgrades it from there.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "students",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("student_id", sa.String, nullable=False),
+        sa.Column("name", sa.String, nullable=False),
+        sa.Column("dob", sa.String),
+        sa.Column("gender", sa.String),
+        sa.Column("email", sa.String),
+        sa.Column("mobile", sa.String),
+        sa.Column("program", sa.String),
+        sa.Column("year", sa.String),
+        sa.Column("department", sa.String),
+        sa.Column("address", sa.Text),
+        sa.Column("guardian_name", sa.String),
+        sa.Column("guardian_contact", sa.String),
+        sa.Column("photo_path", sa.String),
+        sa.Column("created_at", sa.DateTime),
+    )
+    op.create_index("ix_students_id", "students", ["id"])
+    op.create_index("ix_students_student_id", "students", ["student_id"], unique=True)
+    op.create_index("ix_students_email", "students", ["email"])
+    op.create_table(
+        "admissions",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("admission_id", sa.String),
+        sa.Column("student_id_fk", sa.Integer, sa.ForeignKey("students.id")),
+        sa.Column("submitted_at", sa.DateTime),
+        sa.Column("source", sa.String),
+        sa.Column("documents", sa.Text),
+        sa.Column("status", sa.String),
+        sa.Column("remarks", sa.Text),
+    )
+    op.create_index("ix_admissions_admission_id", "admissions", ["admission_id"], unique=True)
+    op.create_table(
+        "fees",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("receipt_id", sa.String),
+        sa.Column("timestamp", sa.DateTime),
+        sa.Column("student_id_fk", sa.Integer, sa.ForeignKey("students.id")),
+        sa.Column("name", sa.String),
+        sa.Column("amount", sa.Float),
+        sa.Column("payment_mode", sa.String),
+        sa.Column("transaction_id", sa.String),
+        sa.Column("invoice_path", sa.String),
+        sa.Column("balance_after", sa.Float),
+        sa.Column("purpose", sa.String),
+        sa.Column("notes", sa.Text),
+        sa.Column("recorded_by", sa.String),
+    )
+    op.create_index("ix_fees_receipt_id", "fees", ["receipt_id"], unique=True)
+    op.create_table(
+        "hostel",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("allocation_id", sa.String),
+        sa.Column("student_id_fk", sa.Integer, sa.ForeignKey("students.id")),
+        sa.Column("block", sa.String),
+        sa.Column("room_no", sa.String),
+        sa.Column("bed_no", sa.String),
+        sa.Column("move_in", sa.String),
+        sa.Column("move_out", sa.String),
+        sa.Column("status", sa.String),
+        sa.Column("requested_at", sa.DateTime),
+        sa.Column("allocated_by", sa.String),
+        sa.Column("notes", sa.Text),
+    )
+    op.create_index("ix_hostel_allocation_id", "hostel", ["allocation_id"], unique=True)
+    op.create_table(
+        "exams",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("exam_id", sa.String),
+        sa.Column("student_id_fk", sa.Integer, sa.ForeignKey("students.id")),
+        sa.Column("subject_code", sa.String),
+        sa.Column("subject_name", sa.String),
+        sa.Column("marks", sa.Float),
+        sa.Column("status", sa.String),
+        sa.Column("graded_at", sa.DateTime),
+        sa.Column("graded_by", sa.String),
+        sa.Column("notes", sa.Text),
+    )
+    op.create_index("ix_exams_exam_id", "exams", ["exam_id"], unique=True)
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("username", sa.String),
+        sa.Column("hashed_password", sa.String),
+        sa.Column("role", sa.String),
+        sa.Column("display_name", sa.String),
+        sa.Column("created_at", sa.DateTime),
+    )
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+
+def downgrade():
+    for table in ("users", "exams", "hostel", "fees", "admissions", "students"):
+        op.drop_table(table)
@@ -0,0 +1,47 @@
+"""indexes for the hot read paths (listing panels, lookups, ledger, hostel)
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+Each index matches a query checked by query_plans.py:
+  fees   (student_id_fk, timestamp DESC)  ledger opening balance, statements
+  fees   (timestamp DESC, id DESC)        listing.recent_payments
+  exams  (student_id_fk, graded_at DESC)  api /exams?student_id=, mark sheets
+  exams  (graded_at DESC, id DESC)        listing.recent_grades
+  exams  (subject_code, graded_at DESC), (subject_name)   grade filter by subject
+  hostel (student_id_fk, status)          hostel.allocate "already housed" check
+  hostel (block, status), (status)        listing.hostel_occupancy filters
+  students lower(email)                   search.find_student
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# "timestamp" is quoted: it is a type name on PostgreSQL
+INDEXES = [
+    ("ix_fees_student_ts", "fees", ["student_id_fk", sa.text('"timestamp" DESC')]),
+    ("ix_fees_ts", "fees", [sa.text('"timestamp" DESC'), sa.text("id DESC")]),
+    ("ix_exams_student_graded", "exams", ["student_id_fk", sa.text("graded_at DESC")]),
+    ("ix_exams_graded", "exams", [sa.text("graded_at DESC"), sa.text("id DESC")]),
+    ("ix_exams_subject_graded", "exams", ["subject_code", sa.text("graded_at DESC")]),
+    ("ix_exams_subject_name", "exams", ["subject_name"]),
+    ("ix_hostel_student_status", "hostel", ["student_id_fk", "status"]),
+    ("ix_hostel_block_status", "hostel", ["block", "status"]),
+    ("ix_hostel_status", "hostel", ["status"]),
+    ("ix_students_email_lower", "students", [sa.text("lower(email)")]),
+]
+
+
+def upgrade():
+    for name, table, cols in INDEXES:
+        op.create_index(name, table, cols, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,49 @@
+"""fee structure and the student dues snapshot (dues.py)
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "fee_structures",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("program", sa.String, nullable=False),
+        sa.Column("year", sa.Integer, nullable=False),
+        sa.Column("term", sa.String, nullable=False),
+        sa.Column("head", sa.String, nullable=False),
+        sa.Column("amount", sa.Float, nullable=False),
+        sa.Column("due_date", sa.Date),
+        sa.UniqueConstraint("program", "year", "term", "head", name="ux_fee_structure"),
+        if_not_exists=True,
+    )
+    op.create_table(
+        "student_dues",
+        sa.Column("student_id_fk", sa.Integer, sa.ForeignKey("students.id"), primary_key=True),
+        sa.Column("assessed", sa.Float, nullable=False),
+        sa.Column("paid", sa.Float, nullable=False),
+        sa.Column("outstanding", sa.Float, nullable=False),
+        sa.Column("payments", sa.Integer, nullable=False),
+        sa.Column("last_payment_at", sa.DateTime),
+        sa.Column("as_of", sa.Date),
+        sa.Column("updated_at", sa.DateTime),
+        if_not_exists=True,
+    )
+    op.create_index("ix_student_dues_outstanding", "student_dues",
+                    [sa.text("outstanding DESC"), sa.text("student_id_fk DESC")], if_not_exists=True)
+    # fill it with:  python dues.py refresh
+
+
+def downgrade():
+    op.drop_index("ix_student_dues_outstanding", table_name="student_dues", if_exists=True)
+    op.drop_table("student_dues")
+    op.drop_table("fee_structures")
@@ -0,0 +1,34 @@
+"""archived academic years of fees and exams (archive.py)
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "archived_years",
+        sa.Column("label", sa.String, primary_key=True),
+        sa.Column("file", sa.String, nullable=False),
+        sa.Column("starts", sa.DateTime, nullable=False),
+        sa.Column("ends", sa.DateTime, nullable=False),
+        sa.Column("fees", sa.Integer, nullable=False),
+        sa.Column("fees_amount", sa.Float, nullable=False),
+        sa.Column("exams", sa.Integer, nullable=False),
+        sa.Column("exams_marks", sa.Float, nullable=False),
+        sa.Column("archived_at", sa.DateTime),
+        if_not_exists=True,
+    )
+
+
+def downgrade():
+    # the rows of archived years live only in their archive files; restore them before downgrading
+    op.drop_table("archived_years")
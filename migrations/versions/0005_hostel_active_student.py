@@ -0,0 +1,30 @@
+"""a student has at most one active hostel allocation (hostel.allocate)
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+ACTIVE = sa.text("status = 'Allocated'")
+
+
+def upgrade():
+    twice = op.get_bind().execute(sa.text(
+        "SELECT student_id_fk FROM hostel WHERE status = 'Allocated' GROUP BY student_id_fk HAVING count(*) > 1 LIMIT 20"
+    )).scalars().all()
+    if twice:
+        # vacate all but one of each of these students' beds (hostel.vacate) and upgrade again
+        raise RuntimeError(f"students with more than one active allocation: {twice}")
+    op.create_index("ux_hostel_active_student", "hostel", ["student_id_fk"], unique=True,
+                    sqlite_where=ACTIVE, postgresql_where=ACTIVE, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index("ux_hostel_active_student", table_name="hostel", if_exists=True)
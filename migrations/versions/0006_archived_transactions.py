@@ -0,0 +1,30 @@
+"""transaction ids of archived fees, checked by payment_ingest (archive.py)
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # years archived before this revision are filled in by `python archive.py reindex`
+    op.create_table(
+        "archived_transactions",
+        sa.Column("transaction_id", sa.String, primary_key=True),
+        sa.Column("receipt_id", sa.String),
+        sa.Column("label", sa.String, nullable=False),
+        if_not_exists=True,
+    )
+    op.create_index("ix_archived_transactions_label", "archived_transactions", ["label"], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index("ix_archived_transactions_label", table_name="archived_transactions", if_exists=True)
+    op.drop_table("archived_transactions")
@@ -0,0 +1,49 @@
+"""monthly fee rollup (dashboard.py) and per-student balances (ledger.py)
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+
+0007-0012 add the tables, columns and indexes that init_db() used to create for
+itself before 0002. They skip whatever a database built that way already has.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "fee_month_totals",
+        sa.Column("month", sa.String, primary_key=True),
+        sa.Column("amount", sa.Float),
+        sa.Column("payments", sa.Integer),
+        if_not_exists=True,
+    )
+    # the rollup folds every fee above its watermark on the next dashboard refresh
+    op.create_table(
+        "rollup_watermarks",
+        sa.Column("name", sa.String, primary_key=True),
+        sa.Column("last_id", sa.Integer),
+        sa.Column("updated_at", sa.DateTime),
+        if_not_exists=True,
+    )
+    op.create_table(
+        "student_accounts",
+        sa.Column("student_id_fk", sa.Integer, sa.ForeignKey("students.id"), primary_key=True),
+        sa.Column("balance", sa.Float, nullable=False),
+        sa.Column("payments", sa.Integer, nullable=False),
+        sa.Column("updated_at", sa.DateTime),
+        if_not_exists=True,
+    )
+    # fill it with:  python ledger.py rebuild
+
+
+def downgrade():
+    op.drop_table("student_accounts")
+    op.drop_table("rollup_watermarks")
+    op.drop_table("fee_month_totals")
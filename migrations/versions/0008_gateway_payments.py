@@ -0,0 +1,45 @@
+"""unique gateway transaction ids (payment_ingest.py) and the receipt queue (receipt_worker.py)
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    twice = op.get_bind().execute(sa.text(
+        "SELECT transaction_id FROM fees WHERE transaction_id IS NOT NULL "
+        "GROUP BY transaction_id HAVING count(*) > 1 LIMIT 20"
+    )).scalars().all()
+    if twice:
+        # the same gateway payment recorded more than once: remove the extra fees and upgrade again
+        raise RuntimeError(f"transaction ids recorded more than once: {twice}")
+    op.create_index("ix_fees_transaction_id", "fees", ["transaction_id"], unique=True, if_not_exists=True)
+    op.create_table(
+        "receipt_jobs",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("fee_id_fk", sa.Integer, sa.ForeignKey("fees.id")),
+        sa.Column("status", sa.String),
+        sa.Column("attempts", sa.Integer),
+        sa.Column("claimed_by", sa.String),
+        sa.Column("claimed_at", sa.DateTime),
+        sa.Column("error", sa.Text),
+        sa.Column("created_at", sa.DateTime),
+        if_not_exists=True,
+    )
+    op.create_index("ix_receipt_jobs_fee_id_fk", "receipt_jobs", ["fee_id_fk"], unique=True, if_not_exists=True)
+    op.create_index("ix_receipt_jobs_status", "receipt_jobs", ["status"], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index("ix_receipt_jobs_status", table_name="receipt_jobs", if_exists=True)
+    op.drop_index("ix_receipt_jobs_fee_id_fk", table_name="receipt_jobs", if_exists=True)
+    op.drop_table("receipt_jobs")
+    op.drop_index("ix_fees_transaction_id", table_name="fees", if_exists=True)
@@ -0,0 +1,57 @@
+"""student search index (search.py, SQLite only) and id sequences (id_allocator.py)
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+# FTS5 over name/student_id/email, kept in sync by triggers
+FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5(
+        name, student_id, email,
+        content='students', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+    """CREATE TRIGGER IF NOT EXISTS students_fts_ai AFTER INSERT ON students BEGIN
+        INSERT INTO students_fts(rowid, name, student_id, email) VALUES (new.id, new.name, new.student_id, new.email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS students_fts_ad AFTER DELETE ON students BEGIN
+        INSERT INTO students_fts(students_fts, rowid, name, student_id, email) VALUES ('delete', old.id, old.name, old.student_id, old.email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS students_fts_au AFTER UPDATE OF name, student_id, email ON students BEGIN
+        INSERT INTO students_fts(students_fts, rowid, name, student_id, email) VALUES ('delete', old.id, old.name, old.student_id, old.email);
+        INSERT INTO students_fts(rowid, name, student_id, email) VALUES (new.id, new.name, new.student_id, new.email);
+    END""",
+]
+
+
+def upgrade():
+    # counters start above the existing ids the first time a prefix is used
+    op.create_table(
+        "id_counters",
+        sa.Column("name", sa.String, primary_key=True),
+        sa.Column("next_value", sa.Integer, nullable=False),
+        sa.Column("updated_at", sa.DateTime),
+        if_not_exists=True,
+    )
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        exists = bind.execute(sa.text("SELECT 1 FROM sqlite_master WHERE name = 'students_fts'")).first()
+        for ddl in FTS_DDL:
+            op.execute(ddl)
+        if not exists:
+            op.execute("INSERT INTO students_fts(students_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "sqlite":
+        for name in ("students_fts_au", "students_fts_ad", "students_fts_ai"):
+            op.execute(f"DROP TRIGGER IF EXISTS {name}")
+        op.execute("DROP TABLE IF EXISTS students_fts")
+    op.drop_table("id_counters")
@@ -0,0 +1,26 @@
+"""per-table write versions that invalidate cached reads (querycache.py)
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "table_versions",
+        sa.Column("name", sa.String, primary_key=True),
+        sa.Column("version", sa.Integer, nullable=False),
+        if_not_exists=True,
+    )
+
+
+def downgrade():
+    op.drop_table("table_versions")
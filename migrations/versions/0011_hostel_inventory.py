@@ -0,0 +1,59 @@
+"""hostel room and bed inventory; a bed has at most one active allocation (hostel.py)
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+ACTIVE = sa.text("status = 'Allocated'")
+
+
+def upgrade():
+    op.create_table(
+        "hostel_rooms",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("block", sa.String, nullable=False),
+        sa.Column("room_no", sa.String, nullable=False),
+        sa.Column("room_type", sa.String, nullable=False),
+        sa.Column("capacity", sa.Integer, nullable=False),
+        sa.Column("occupied", sa.Integer, nullable=False),
+        sa.UniqueConstraint("block", "room_no", name="ux_hostel_room"),
+        if_not_exists=True,
+    )
+    op.create_table(
+        "hostel_beds",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("room_id_fk", sa.Integer, sa.ForeignKey("hostel_rooms.id"), nullable=False),
+        sa.Column("bed_no", sa.String, nullable=False),
+        sa.UniqueConstraint("room_id_fk", "bed_no", name="ux_hostel_bed"),
+        if_not_exists=True,
+    )
+    op.create_index("ix_hostel_beds_room_id_fk", "hostel_beds", ["room_id_fk"], if_not_exists=True)
+    # allocations made before the inventory keep bed_id_fk NULL (dashboard counts them as "unassigned")
+    bind = op.get_bind()
+    if "bed_id_fk" not in {c["name"] for c in sa.inspect(bind).get_columns("hostel")}:
+        if bind.dialect.name == "sqlite":
+            # SQLite adds a NULL column with REFERENCES in place; alembic would copy the whole table
+            op.execute("ALTER TABLE hostel ADD COLUMN bed_id_fk INTEGER REFERENCES hostel_beds (id)")
+        else:
+            op.add_column("hostel", sa.Column("bed_id_fk", sa.Integer, nullable=True))
+            op.create_foreign_key("hostel_bed_id_fk_fkey", "hostel", "hostel_beds", ["bed_id_fk"], ["id"])
+    op.create_index("ux_hostel_active_bed", "hostel", ["bed_id_fk"], unique=True,
+                    sqlite_where=ACTIVE, postgresql_where=ACTIVE, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index("ux_hostel_active_bed", table_name="hostel", if_exists=True)
+    # SQLite cannot drop a column with REFERENCES in place, so the table is copied
+    with op.batch_alter_table("hostel") as batch:
+        batch.drop_column("bed_id_fk")
+    op.drop_index("ix_hostel_beds_room_id_fk", table_name="hostel_beds", if_exists=True)
+    op.drop_table("hostel_beds")
+    op.drop_table("hostel_rooms")
@@ -0,0 +1,62 @@
+"""subject catalogue, semester results and subject statistics (results.py)
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0012"
+down_revision = "0011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "subjects",
+        sa.Column("code", sa.String, primary_key=True),
+        sa.Column("name", sa.String),
+        sa.Column("credits", sa.Float, nullable=False),
+        sa.Column("semester", sa.Integer, nullable=False),
+        if_not_exists=True,
+    )
+    op.create_table(
+        "student_results",
+        sa.Column("student_id_fk", sa.Integer, sa.ForeignKey("students.id"), primary_key=True),
+        sa.Column("semester", sa.Integer, primary_key=True),
+        sa.Column("credits", sa.Float),
+        sa.Column("sgpa", sa.Float),
+        sa.Column("cgpa", sa.Float),
+        sa.Column("failed", sa.Integer),
+        sa.Column("rank", sa.Integer),
+        sa.Column("computed_at", sa.DateTime),
+        if_not_exists=True,
+    )
+    op.create_table(
+        "subject_stats",
+        sa.Column("program", sa.String, primary_key=True),
+        sa.Column("year", sa.String, primary_key=True),
+        sa.Column("subject_code", sa.String, primary_key=True),
+        sa.Column("students", sa.Integer),
+        sa.Column("mean", sa.Float),
+        sa.Column("median", sa.Float),
+        sa.Column("std", sa.Float),
+        sa.Column("pass_pct", sa.Float),
+        sa.Column("computed_at", sa.DateTime),
+        if_not_exists=True,
+    )
+    # rows graded before this keep updated_at NULL; the first results run is a full one anyway
+    if "updated_at" not in {c["name"] for c in sa.inspect(op.get_bind()).get_columns("exams")}:
+        op.add_column("exams", sa.Column("updated_at", sa.DateTime))
+    op.create_index("ix_exams_updated_at", "exams", ["updated_at"], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index("ix_exams_updated_at", table_name="exams", if_exists=True)
+    # in place: a batch copy of exams would rebuild its DESC indexes ascending
+    op.execute("ALTER TABLE exams DROP COLUMN updated_at")
+    op.drop_table("subject_stats")
+    op.drop_table("student_results")
+    op.drop_table("subjects")
@@ -1,12 +1,72 @@
 # models.py
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Float, Text, Boolean, ForeignKey
+from sqlalchemy import create_engine, event, update, inspect, text, func, Column, Integer, String, Date, DateTime, Float, Text, Boolean, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 import datetime
+import functools
+import threading
 import os
-from config import DB_PATH
+import config
 
 Base = declarative_base()
-engine = create_engine(f"sqlite:///{DB_PATH}", connect_args={"check_same_thread": False}, echo=False)
+
+def _sqlite_pragmas(dbapi_conn, conn_record):
+    cur = dbapi_conn.cursor()
+    cur.execute(f"PRAGMA journal_mode={config.SQLITE_JOURNAL_MODE}")
+    cur.execute(f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}")
+    cur.execute(f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT_MS}")
+    cur.execute(f"PRAGMA cache_size=-{config.SQLITE_CACHE_SIZE_KB}")
+    cur.execute(f"PRAGMA mmap_size={config.SQLITE_MMAP_SIZE}")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.close()
+
+_WRITE_VERBS = ("INSERT", "UPDATE", "DELETE", "REPLAC")
+
+def _serialize_writers(eng):
+    # SQLite allows one writer at a time and its busy handler backs off with sleeps of up to
+    # 100 ms, so threads of one process queue on a lock from their first write until commit
+    lock = threading.RLock()
+
+    @event.listens_for(eng, "before_cursor_execute")
+    def _acquire(conn, cursor, statement, parameters, context, executemany):
+        if not conn.info.get("write_locked") and statement.lstrip()[:6].upper() in _WRITE_VERBS:
+            lock.acquire()
+            conn.info["write_locked"] = True
+
+    def _release(conn):
+        if conn.info.pop("write_locked", False):
+            lock.release()
+
+    event.listen(eng, "commit", _release)
+    event.listen(eng, "rollback", _release)
+
+def make_engine(url=None, tuned=True):
+    """
+    Engine for `url` (default config.DB_URL). SQLite connections get WAL, busy_timeout and
+    cache pragmas plus a thread-shared pool; other databases get a pre-pinged pool.
+    tuned=False builds the old bare engine, kept for benchmarks.
+    """
+    url = url or config.DB_URL
+    if not url.startswith("sqlite"):
+        return create_engine(url, pool_size=config.DB_POOL_SIZE, max_overflow=config.DB_MAX_OVERFLOW,
+                             pool_timeout=config.DB_POOL_TIMEOUT, pool_pre_ping=True, echo=False)
+    if not tuned:
+        return create_engine(url, connect_args={"check_same_thread": False}, echo=False)
+    eng = create_engine(url, connect_args={"check_same_thread": False, "timeout": config.SQLITE_BUSY_TIMEOUT_MS / 1000},
+                        poolclass=QueuePool, pool_size=config.DB_POOL_SIZE, max_overflow=config.DB_MAX_OVERFLOW,
+                        pool_timeout=config.DB_POOL_TIMEOUT, echo=False)
+    event.listen(eng, "connect", _sqlite_pragmas)
+    _serialize_writers(eng)
+    return eng
+
+@functools.lru_cache(maxsize=None)
+def get_engine(url=None):
+    # one engine (and connection pool) per URL per process
+    return make_engine(url)
+
+engine = get_engine()
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
 def now():
@@ -35,6 +95,13 @@ class Student(Base):
     hostels = relationship("HostelAllocation", back_populates="student")
     exams = relationship("Exam", back_populates="student")
 
+    # "student id or email" lookups compare lower(email), so they match whatever case was typed
+    __table_args__ = (Index("ix_students_email_lower", func.lower(email)),)
+
+# Student fields filled in by an admission (bulk_import files, POST /students)
+ADMISSION_COLUMNS = ["name", "email", "dob", "gender", "mobile", "program", "year", "department",
+                     "address", "guardian_name", "guardian_contact"]
+
 class Admission(Base):
     __tablename__ = "admissions"
     id = Column(Integer, primary_key=True)
@@ -57,7 +124,7 @@ class Fee(Base):
     name = Column(String)
     amount = Column(Float)
     payment_mode = Column(String)
-    transaction_id = Column(String)
+    transaction_id = Column(String, unique=True, index=True)  # gateway idempotency key
     invoice_path = Column(String)
     balance_after = Column(Float, default=0.0)
     purpose = Column(String)
@@ -66,6 +133,11 @@ class Fee(Base):
 
     student = relationship("Student", back_populates="fees")
 
+    __table_args__ = (
+        Index("ix_fees_student_ts", student_id_fk, timestamp.desc()),  # statements, ledger opening balance
+        Index("ix_fees_ts", timestamp.desc(), id.desc()),  # recent payments, newest first
+    )
+
 class HostelAllocation(Base):
     __tablename__ = "hostel"
     id = Column(Integer, primary_key=True)
@@ -74,6 +146,7 @@ class HostelAllocation(Base):
     block = Column(String)
     room_no = Column(String)
     bed_no = Column(String)
+    bed_id_fk = Column(Integer, ForeignKey("hostel_beds.id"), nullable=True)  # set for inventory-backed allocations
     move_in = Column(String)
     move_out = Column(String, nullable=True)
     status = Column(String, default="Requested")
@@ -83,6 +156,37 @@ class HostelAllocation(Base):
 
     student = relationship("Student", back_populates="hostels")
 
+    __table_args__ = (
+        # a bed has at most one active allocation, whichever process allocates it
+        Index("ux_hostel_active_bed", "bed_id_fk", unique=True,
+              sqlite_where=text("status = 'Allocated'"), postgresql_where=text("status = 'Allocated'")),
+        # and a student at most one active bed
+        Index("ux_hostel_active_student", "student_id_fk", unique=True,
+              sqlite_where=text("status = 'Allocated'"), postgresql_where=text("status = 'Allocated'")),
+        Index("ix_hostel_student_status", student_id_fk, status),  # "already housed" check
+        Index("ix_hostel_block_status", block, status),  # allocation list filters
+        Index("ix_hostel_status", status),
+    )
+
+class HostelRoom(Base):
+    __tablename__ = "hostel_rooms"
+    id = Column(Integer, primary_key=True)
+    block = Column(String, nullable=False)
+    room_no = Column(String, nullable=False)
+    room_type = Column(String, nullable=False, default="standard")  # e.g. single, double, triple-ac
+    capacity = Column(Integer, nullable=False)
+    occupied = Column(Integer, nullable=False, default=0)  # active allocations, kept by hostel.py
+
+    __table_args__ = (UniqueConstraint("block", "room_no", name="ux_hostel_room"),)
+
+class HostelBed(Base):
+    __tablename__ = "hostel_beds"
+    id = Column(Integer, primary_key=True)
+    room_id_fk = Column(Integer, ForeignKey("hostel_rooms.id"), nullable=False, index=True)
+    bed_no = Column(String, nullable=False)
+
+    __table_args__ = (UniqueConstraint("room_id_fk", "bed_no", name="ux_hostel_bed"),)
+
 class Exam(Base):
     __tablename__ = "exams"
     id = Column(Integer, primary_key=True)
@@ -95,9 +199,47 @@ class Exam(Base):
     graded_at = Column(DateTime, default=now)
     graded_by = Column(String)
     notes = Column(Text)
+    updated_at = Column(DateTime, default=now, onupdate=now, index=True)  # drives incremental results
 
     student = relationship("Student", back_populates="exams")
 
+    __table_args__ = (
+        Index("ix_exams_student_graded", student_id_fk, graded_at.desc()),  # mark sheets, api ?student_id=
+        Index("ix_exams_graded", graded_at.desc(), id.desc()),  # recent grades, newest first
+        Index("ix_exams_subject_graded", subject_code, graded_at.desc()),
+        Index("ix_exams_subject_name", subject_name),
+    )
+
+class Subject(Base):
+    __tablename__ = "subjects"
+    code = Column(String, primary_key=True)  # matches Exam.subject_code
+    name = Column(String)
+    credits = Column(Float, nullable=False, default=1.0)
+    semester = Column(Integer, nullable=False, default=1)
+
+class StudentResult(Base):
+    __tablename__ = "student_results"
+    student_id_fk = Column(Integer, ForeignKey("students.id"), primary_key=True)
+    semester = Column(Integer, primary_key=True)
+    credits = Column(Float)
+    sgpa = Column(Float)
+    cgpa = Column(Float)  # over this and earlier semesters
+    failed = Column(Integer)  # subjects below the pass mark
+    rank = Column(Integer)  # by SGPA within program + year + semester
+    computed_at = Column(DateTime, default=now)
+
+class SubjectStat(Base):
+    __tablename__ = "subject_stats"
+    program = Column(String, primary_key=True)
+    year = Column(String, primary_key=True)
+    subject_code = Column(String, primary_key=True)
+    students = Column(Integer)
+    mean = Column(Float)
+    median = Column(Float)
+    std = Column(Float)
+    pass_pct = Column(Float)
+    computed_at = Column(DateTime, default=now)
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True)
@@ -107,5 +249,157 @@ class User(Base):
     display_name = Column(String)
     created_at = Column(DateTime, default=now)
 
+class StudentAccount(Base):
+    __tablename__ = "student_accounts"
+    student_id_fk = Column(Integer, ForeignKey("students.id"), primary_key=True)
+    balance = Column(Float, nullable=False, default=0.0)  # same sign convention as Fee.balance_after
+    payments = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=now)
+
+class FeeStructure(Base):
+    __tablename__ = "fee_structures"
+    id = Column(Integer, primary_key=True)
+    program = Column(String, nullable=False)  # matches Student.program
+    year = Column(Integer, nullable=False)  # year of study; charged to students in this year or later
+    term = Column(String, nullable=False)  # e.g. 2025-26 T1
+    head = Column(String, nullable=False, default="Tuition")
+    amount = Column(Float, nullable=False)
+    due_date = Column(Date)  # not owed before this date; NULL means due at once
+
+    __table_args__ = (UniqueConstraint("program", "year", "term", "head", name="ux_fee_structure"),)
+
+class StudentDue(Base):
+    # snapshot kept by dues.py: rebuilt by refresh(), payments applied by the ledger
+    __tablename__ = "student_dues"
+    student_id_fk = Column(Integer, ForeignKey("students.id"), primary_key=True)
+    assessed = Column(Float, nullable=False, default=0.0)
+    paid = Column(Float, nullable=False, default=0.0)
+    outstanding = Column(Float, nullable=False, default=0.0)  # assessed - paid
+    payments = Column(Integer, nullable=False, default=0)
+    last_payment_at = Column(DateTime)
+    as_of = Column(Date)  # fee structure rows due by this date are assessed
+    updated_at = Column(DateTime, default=now)
+
+    __table_args__ = (Index("ix_student_dues_outstanding", outstanding.desc(), student_id_fk.desc()),)
+
+class ReceiptJob(Base):
+    __tablename__ = "receipt_jobs"
+    id = Column(Integer, primary_key=True)
+    fee_id_fk = Column(Integer, ForeignKey("fees.id"), unique=True, index=True)
+    status = Column(String, default="pending", index=True)  # pending, running, done, failed
+    attempts = Column(Integer, default=0)
+    claimed_by = Column(String)
+    claimed_at = Column(DateTime)
+    error = Column(Text)
+    created_at = Column(DateTime, default=now)
+
+    fee = relationship("Fee")
+
+class IdCounter(Base):
+    __tablename__ = "id_counters"
+    name = Column(String, primary_key=True)  # prefix + year, e.g. COLG26S or REC-26
+    next_value = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=now)
+
+class FeeMonthTotal(Base):
+    __tablename__ = "fee_month_totals"
+    month = Column(String, primary_key=True)  # YYYY-MM
+    amount = Column(Float, default=0.0)
+    payments = Column(Integer, default=0)
+
+class RollupWatermark(Base):
+    __tablename__ = "rollup_watermarks"
+    name = Column(String, primary_key=True)  # source table name
+    last_id = Column(Integer, default=0)  # rows with id <= last_id are folded into the rollup
+    updated_at = Column(DateTime, default=now)
+
+class ArchivedYear(Base):
+    # a closed academic year whose fees and exams rows were moved to their own file by archive.py
+    __tablename__ = "archived_years"
+    label = Column(String, primary_key=True)  # e.g. 2023-24
+    file = Column(String, nullable=False)  # in config.ARCHIVE_FOLDER
+    starts = Column(DateTime, nullable=False)
+    ends = Column(DateTime, nullable=False)  # exclusive
+    fees = Column(Integer, nullable=False, default=0)  # rows in the file, checked by archive.verify
+    fees_amount = Column(Float, nullable=False, default=0.0)
+    exams = Column(Integer, nullable=False, default=0)
+    exams_marks = Column(Float, nullable=False, default=0.0)
+    archived_at = Column(DateTime, default=now)
+
+class ArchivedTransaction(Base):
+    # gateway transaction ids of archived fees, so a late retry is still answered as a duplicate
+    __tablename__ = "archived_transactions"
+    transaction_id = Column(String, primary_key=True)
+    receipt_id = Column(String)
+    label = Column(String, nullable=False, index=True)  # archived_years.label
+
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+    name = Column(String, primary_key=True)  # table name
+    version = Column(Integer, nullable=False, default=0)  # bumped by every commit that writes the table
+
+# tables whose writes invalidate cached reads (see querycache.py)
+VERSIONED_TABLES = ("students", "admissions", "fees", "hostel", "hostel_rooms", "exams", "users",
+                    "student_accounts", "student_results", "subject_stats", "fee_structures", "student_dues")
+
+def bump_versions(session, tables):
+    """Increment the version of `tables` inside the session's current transaction."""
+    tables = sorted(set(tables) & set(VERSIONED_TABLES))
+    if not tables:
+        return
+    stmt = update(TableVersion).where(TableVersion.name.in_(tables)).values(version=TableVersion.version + 1)
+    if session.execute(stmt).rowcount < len(tables):
+        insert = pg_insert if session.bind.dialect.name == "postgresql" else sqlite_insert
+        session.execute(insert(TableVersion).values([{"name": n, "version": 0} for n in tables]).on_conflict_do_nothing())
+        session.execute(stmt)
+
+def _track_writes(session_factory):
+    # remember which tables a session wrote, through the unit of work or through
+    # insert()/update()/delete() statements, and bump their versions in the same commit
+    @event.listens_for(session_factory, "after_flush")
+    def _flushed(session, flush_context):
+        touched = session.info.setdefault("touched_tables", set())
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            touched.add(obj.__table__.name)
+
+    @event.listens_for(session_factory, "do_orm_execute")
+    def _executed(state):
+        if (state.is_insert or state.is_update or state.is_delete) and state.statement.table.name != "table_versions":
+            state.session.info.setdefault("touched_tables", set()).add(state.statement.table.name)
+
+    @event.listens_for(session_factory, "before_commit")
+    def _bump(session):
+        session.flush()
+        touched = session.info.pop("touched_tables", None)
+        if touched:
+            bump_versions(session, touched)
+            session.info["committed_tables"] = touched
+
+    @event.listens_for(session_factory, "after_commit")
+    def _committed(session):
+        tables = session.info.pop("committed_tables", None)
+        if tables:
+            for listener in _commit_listeners:
+                listener(tables)
+
+    @event.listens_for(session_factory, "after_rollback")
+    def _rolled_back(session):
+        session.info.pop("touched_tables", None)
+        session.info.pop("committed_tables", None)
+
+# callables invoked with the set of written tables after each tracked commit in this process
+_commit_listeners = []
+_track_writes(SessionLocal)
+
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    """Create or upgrade the database to the newest migration (migrations/versions)."""
+    from alembic import command
+    from alembic.config import Config
+    cfg = Config(os.path.join(config.BASE_DIR, "alembic.ini"))
+    with engine.begin() as conn:
+        cfg.attributes["connection"] = conn
+        have = inspect(conn)
+        if have.has_table("students") and not have.has_table("alembic_version"):
+            # built by init_db before migrations existed: it has at least the baseline tables
+            command.stamp(cfg, "0001")
+        command.upgrade(cfg, "head")
@@ -0,0 +1,167 @@
+# payment_ingest.py
+# Set-based ingestion of gateway payment callbacks, used by /webhook and /webhook/batch.
+import threading, queue, time
+from concurrent.futures import Future
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from models import SessionLocal, Student, Fee, ArchivedTransaction, now
+from ledger import apply_payment
+from receipt_worker import enqueue_receipts_for
+from id_allocator import generic_ids
+from metrics import timed
+
+
+def ingest_payments(session, payments, ids=None):
+    """
+    Record a list of gateway payloads ({'student_id','amount','transaction_id','purpose'})
+    in the caller's transaction with one IN query for students and one each for transaction
+    ids already seen in fees and in archived years. Returns one result dict per payload, in order:
+      {'status': 'ok'|'duplicate'|'not_found'|'invalid', 'receipt_id', 'transaction_id', 'error'}
+    ids: {'REC': [...], 'TXN': [...]} with one id per payload, reserved by the caller
+    (api.py takes them off its event loop); by default they are reserved here.
+    """
+    results = [None] * len(payments)
+    pending = []  # (index, payload, amount, txn)
+    seen_txn = {}
+    for i, p in enumerate(payments):
+        if not isinstance(p, dict):
+            results[i] = {"status": "invalid", "error": "payment must be an object"}
+            continue
+        try:
+            amount = float(p.get("amount", 0))
+        except (TypeError, ValueError):
+            results[i] = {"status": "invalid", "error": "bad amount"}
+            continue
+        sid, txn = p.get("student_id"), p.get("transaction_id")
+        # ids arrive as JSON: numbers are stored as text, lists and objects are rejected
+        if not sid or not isinstance(sid, (str, int)) or isinstance(sid, bool):
+            results[i] = {"status": "invalid", "error": "student_id required"}
+            continue
+        if txn is not None and (not isinstance(txn, (str, int)) or isinstance(txn, bool)):
+            results[i] = {"status": "invalid", "error": "bad transaction_id"}
+            continue
+        p = dict(p, student_id=str(sid))
+        txn = str(txn) if txn is not None else None
+        if txn and txn in seen_txn:
+            # retried inside the same batch: answered once the first copy is resolved
+            results[i] = {"status": "duplicate", "transaction_id": txn, "of": seen_txn[txn]}
+            continue
+        if txn:
+            seen_txn[txn] = i
+        pending.append((i, p, amount, txn))
+
+    known = {}
+    given = [txn for _, _, _, txn in pending if txn]
+    if given:
+        known = dict(session.query(Fee.transaction_id, Fee.receipt_id).filter(Fee.transaction_id.in_(given)))
+        # a late retry of a payment whose year was archived since
+        known.update(session.query(ArchivedTransaction.transaction_id, ArchivedTransaction.receipt_id)
+                     .filter(ArchivedTransaction.transaction_id.in_(given)))
+    sids = {p["student_id"] for _, p, _, _ in pending}
+    students = {}
+    if sids:
+        students = {r.student_id: r for r in
+                    session.query(Student.id, Student.student_id, Student.name).filter(Student.student_id.in_(sids))}
+
+    accepted = []
+    for i, p, amount, txn in pending:
+        if txn in known:
+            results[i] = {"status": "duplicate", "transaction_id": txn, "receipt_id": known[txn]}
+        elif p["student_id"] not in students:
+            results[i] = {"status": "not_found", "error": "student not found"}
+        else:
+            accepted.append((i, p, amount, txn))
+
+    # ids are reserved before the first write of this transaction (see IdAllocator._reserve)
+    if ids is None:
+        receipt_ids = generic_ids("REC", len(accepted))
+        txn_ids = iter(generic_ids("TXN", sum(1 for a in accepted if not a[3])))
+    else:
+        receipt_ids, txn_ids = ids["REC"], iter(ids["TXN"])
+    by_student = {}
+    for (i, p, amount, txn), rid in zip(accepted, receipt_ids):
+        by_student.setdefault(students[p["student_id"]].id, []).append((i, p, amount, txn or next(txn_ids), rid))
+
+    rows = []
+    ts = now()
+    for sfk, items in by_student.items():
+        # one ledger update per student; per-payment balances are replayed from the total
+        total = sum(a for _, _, a, _, _ in items)
+        balance = apply_payment(session, sfk, total, count=len(items)) + total
+        for i, p, amount, txn, rid in items:
+            balance -= amount
+            rows.append({"receipt_id": rid, "timestamp": ts, "student_id_fk": sfk, "name": students[p["student_id"]].name,
+                         "amount": amount, "payment_mode": "Gateway", "transaction_id": txn, "balance_after": balance,
+                         "purpose": p.get("purpose", "Tuition"), "recorded_by": "gateway"})
+            results[i] = {"status": "ok", "receipt_id": rid, "transaction_id": txn}
+    if rows:
+        session.execute(insert(Fee), rows)
+        enqueue_receipts_for(session, [r["receipt_id"] for r in rows])
+
+    for i, r in enumerate(results):
+        if "of" in r:
+            first = results[r.pop("of")]
+            r["receipt_id"] = first.get("receipt_id")
+            if first["status"] not in ("ok", "duplicate"):
+                results[i] = dict(first)
+    return results
+
+
+@timed("ingest_commit")
+def ingest_and_commit(payments, attempts=5):
+    """Run ingest_payments in its own transaction. If a concurrent writer committed one
+    of the transaction ids first the unique index rejects the insert; the retry sees
+    that row and reports it as a duplicate."""
+    for attempt in range(attempts):
+        s = SessionLocal()
+        try:
+            results = ingest_payments(s, payments)
+            s.commit()
+            return results
+        except IntegrityError:
+            s.rollback()
+            if attempt == attempts - 1:
+                raise
+        finally:
+            s.close()
+
+
+class PaymentBatcher:
+    """
+    Collects payments submitted from request threads and writes them with
+    ingest_and_commit every `max_wait_ms` or `max_events`, whichever comes first.
+    submit() returns a Future resolving to that payment's result dict.
+    """
+
+    def __init__(self, max_events=200, max_wait_ms=20):
+        self.max_events = max_events
+        self.max_wait = max_wait_ms / 1000.0
+        self._q = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="payment-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, payment):
+        fut = Future()
+        self._q.put((payment, fut))
+        return fut
+
+    def _run(self):
+        while True:
+            batch = [self._q.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_events:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                results = ingest_and_commit([p for p, _ in batch])
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for (_, fut), res in zip(batch, results):
+                fut.set_result(res)
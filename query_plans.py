@@ -0,0 +1,162 @@
+# query_plans.py
+# Query-plan check for the hot read paths. Each entry in HOT_QUERIES calls the real
+# function the UI/API uses inside a transaction that is rolled back. Every statement it
+# emits is captured, and its plan is read with EXPLAIN QUERY PLAN (SQLite) or EXPLAIN
+# (PostgreSQL, with seq scans disabled so only plans without an index show one).
+# The check exits 1 if any statement reads a whole table.
+#   python query_plans.py [-v] [--only payments grades]
+# Run it against a database at head (python init_db.py or alembic upgrade head).
+import argparse, datetime, re, sys
+from sqlalchemy import event, select
+from models import SessionLocal, engine, Student, Fee, Exam, HostelAllocation
+from listing import recent_payments, recent_grades, hostel_occupancy, encode_cursor
+from search import find_student, search_students
+from ledger import get_balance
+from dashboard import dashboard_metrics
+from results import load_exams, missing_subjects
+from dues import defaulters
+from archive import history, attach
+
+# tables sized by configuration (rooms, subjects, months...) rather than by activity
+SMALL_TABLES = {"hostel_rooms", "hostel_beds", "subjects", "users", "fee_month_totals",
+                "rollup_watermarks", "table_versions", "id_counters", "archived_years"}
+_DAY = datetime.date(2024, 6, 1)
+_CURSOR = encode_cursor(datetime.datetime(2024, 6, 1, 12), 1000)
+
+
+def _student_history(s, model):
+    # a statement: one student's rows in the hot table and every archived year
+    rows = history(s, model)
+    return s.execute(select(rows).where(rows.c.student_id_fk == 1)).all()
+
+
+# name -> fn(session); sample values are arbitrary, plans do not depend on them
+HOT_QUERIES = {
+    "payments: first page": lambda s: recent_payments(s),
+    "payments: next page": lambda s: recent_payments(s, cursor=_CURSOR),
+    "payments: by student": lambda s: recent_payments(s, student_id="COLG24S00001"),
+    "payments: by mode and dates": lambda s: recent_payments(s, mode="UPI", date_from=_DAY, date_to=_DAY),
+    "grades: first page": lambda s: recent_grades(s),
+    "grades: next page": lambda s: recent_grades(s, cursor=_CURSOR),
+    "grades: by subject": lambda s: recent_grades(s, subject="MATH101"),
+    "grades: by status and dates": lambda s: recent_grades(s, status="Fail", date_from=_DAY, date_to=_DAY),
+    "hostel: first page": lambda s: hostel_occupancy(s),
+    "hostel: by block": lambda s: hostel_occupancy(s, block="A", cursor="-|1000"),
+    "hostel: by status": lambda s: hostel_occupancy(s, status="Allocated"),
+    # same statement as hostel.allocate's "already housed" check
+    "hostel: already housed": lambda s: s.execute(select(HostelAllocation.student_id_fk).where(
+        HostelAllocation.student_id_fk.in_([1, 2, 3]), HostelAllocation.status == "Allocated")).all(),
+    "student lookup (id or email)": lambda s: find_student(s, "Someone@Example.com"),
+    "student search": lambda s: search_students(s, "ann"),
+    "balance": lambda s: get_balance(s, 1),
+    "dashboard": lambda s: dashboard_metrics(s, refresh=False),
+    "dues: defaulters": lambda s: defaulters(s),
+    "dues: defaulters next page": lambda s: defaulters(s, cursor="1500.0|1000"),
+    "dues: defaulters by cohort": lambda s: defaulters(s, program="BSc", year="2"),
+    # same statements as api.list_fees / api.list_exams with ?student_id=
+    "api: fees of a student": lambda s: s.execute(select(Fee.id).where(Fee.id > 0, Fee.student_id_fk == select(
+        Student.id).where(Student.student_id == "COLG24S00001").scalar_subquery()).order_by(Fee.id).limit(51)).all(),
+    "api: exams of a student": lambda s: s.execute(select(Exam.id).where(Exam.id > 0, Exam.student_id_fk == select(
+        Student.id).where(Student.student_id == "COLG24S00001").scalar_subquery()).order_by(Exam.id).limit(51)).all(),
+    "results: changed students": lambda s: load_exams(s, select(Exam.student_id_fk).where(
+        Exam.updated_at >= datetime.datetime(2024, 6, 1))),
+    "subjects: not in catalogue": lambda s: missing_subjects(s),
+    "history: fees of a student": lambda s: _student_history(s, Fee),
+    "history: exams of a student": lambda s: _student_history(s, Exam),
+}
+
+_READS = re.compile(r"^\s*(SELECT|WITH|UPDATE|DELETE)\b", re.I)
+# "SCAN t" and "SCAN t USING INDEX i" visit every row; COVERING INDEX scans (counts) read only the index
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)(?: USING INDEX (\w+))?$")
+_PG_SCAN = re.compile(r"Seq Scan on (\w+)")
+
+
+def capture(fn):
+    """Statements (sql, params) emitted by fn(session); the session is rolled back."""
+    seen = []
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if _READS.match(statement):
+            seen.append((statement, parameters[0] if executemany and parameters else parameters))
+
+    event.listen(engine, "before_cursor_execute", before)
+    s = SessionLocal()
+    try:
+        fn(s)
+    finally:
+        event.remove(engine, "before_cursor_execute", before)
+        s.rollback()
+        s.close()
+    return seen
+
+
+def _index_columns(conn, index):
+    for schema in conn.exec_driver_sql("SELECT name FROM pragma_database_list").scalars().all():
+        cols = {r[2] for r in conn.exec_driver_sql(f"PRAGMA {schema}.index_info({index})").all()}
+        if cols:
+            return cols | {"id"}  # index entries carry the rowid
+    return set()
+
+
+def _filtered(sql, table):
+    """Columns of `table` that the statement's WHERE clauses compare."""
+    where = re.split(r"\bWHERE\b", sql, maxsplit=1, flags=re.I)
+    return set(re.findall(rf'\b{table}\."?(\w+)"?', where[1])) if len(where) > 1 else set()
+
+
+def _paged(conn, sql, lines, scan):
+    # an ordered index walk under LIMIT, with no sort step and nothing filtered outside the
+    # index, stops after one page (e.g. "newest first"); a filter on another column may read every row.
+    # A bare "SCAN t" only counts when the ORDER BY leads with t.id, i.e. it walks the rowid b-tree.
+    table, index = scan.groups()
+    if not re.search(r"\bLIMIT\b", sql, re.I) or any("TEMP B-TREE" in l for l in lines):
+        return False
+    if index:
+        return _filtered(sql, table) <= _index_columns(conn, index)
+    return bool(re.search(rf"\bORDER BY {table}\.id\b", sql, re.I)) and _filtered(sql, table) <= {"id"}
+
+
+def plan(conn, sql, params):
+    """(plan lines, [tables read in full])."""
+    if conn.dialect.name == "sqlite":
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, params).all()
+        lines = [r[3] for r in rows]
+        full = [m.group(1) for m in map(_SQLITE_SCAN.match, lines) if m and not _paged(conn, sql, lines, m)]
+    else:
+        conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        lines = [r[0] for r in conn.exec_driver_sql("EXPLAIN " + sql, params).all()]
+        full = [m.group(1) for l in lines for m in [_PG_SCAN.search(l)] if m]
+    return lines, [t for t in full if t not in SMALL_TABLES and not t.startswith("sqlite_")]
+
+
+def check(names, verbose=False):
+    failures = 0
+    with engine.connect() as conn:
+        attach(conn)  # the history queries read archived years
+        conn.commit()
+        for name in names:
+            statements = capture(HOT_QUERIES[name])
+            bad = []
+            for sql, params in statements:
+                with conn.begin():
+                    lines, full = plan(conn, sql, params)
+                if full or verbose:
+                    print(f"  {' '.join(sql.split())[:160]}")
+                    for l in lines:
+                        print(f"    {l}")
+                bad += full
+            failures += bool(bad)
+            status = f"FULL SCAN of {', '.join(sorted(set(bad)))}" if bad else "ok"
+            print(f"{name:<32} {len(statements):>2} statements  {status}")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that hot queries use indexes")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every plan")
+    parser.add_argument("--only", nargs="+", metavar="PREFIX", help="queries whose name starts with one of these")
+    args = parser.parse_args()
+    names = [n for n in HOT_QUERIES if not args.only or n.startswith(tuple(args.only))]
+    failed = check(names, args.verbose)
+    print(f"{len(names) - failed}/{len(names)} hot queries use indexes")
+    sys.exit(1 if failed else 0)
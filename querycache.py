@@ -0,0 +1,112 @@
+# querycache.py
+# Memoizes read queries across Streamlit reruns. Entries are keyed by function and
+# arguments and remember the versions of the tables they read. Every tracked commit
+# bumps the written tables in table_versions (models._track_writes), from this process
+# or another one such as webhook_forwarder.py, so a lookup that sees a newer version
+# recomputes instead of serving the stale entry.
+import functools, threading, time
+from collections import OrderedDict
+from sqlalchemy import select
+from models import engine, TableVersion, _commit_listeners
+from config import QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_TTL_S, QUERY_CACHE_VERSION_POLL_S
+
+
+class QueryCache:
+    def __init__(self, max_entries=QUERY_CACHE_MAX_ENTRIES, ttl=QUERY_CACHE_TTL_S, poll=QUERY_CACHE_VERSION_POLL_S):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.poll = poll  # other processes' writes show up within this many seconds
+        self._entries = OrderedDict()  # key -> (expires_at, table versions, value)
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._versions_at = float("-inf")
+        self._generation = 0  # bumped by local commits so an in-flight version read is not trusted
+        self._stats = {}
+        self.evictions = 0
+        _commit_listeners.append(self._local_commit)
+
+    def _local_commit(self, tables):
+        with self._lock:
+            self._generation += 1
+            self._versions_at = float("-inf")
+
+    def versions(self, tables):
+        t = time.monotonic()
+        with self._lock:
+            fresh = t - self._versions_at < self.poll
+            generation = self._generation
+        if not fresh:
+            with engine.connect() as conn:
+                rows = dict(conn.execute(select(TableVersion.name, TableVersion.version)).all())
+            with self._lock:
+                self._versions = rows
+                if generation == self._generation:
+                    self._versions_at = t
+        return tuple(self._versions.get(name, 0) for name in tables)
+
+    def _count(self, fn, outcome):
+        counts = self._stats.setdefault(fn.__qualname__, {"hits": 0, "misses": 0, "invalidated": 0, "expired": 0})
+        counts[outcome] += 1
+
+    def call(self, fn, tables, session, args, kwargs):
+        key = (fn.__module__, fn.__qualname__, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return fn(session, *args, **kwargs)
+        # read versions before the query: a write landing in between then only costs a recompute
+        versions = self.versions(tables)
+        t = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] == versions and entry[0] > t:
+                self._entries.move_to_end(key)
+                self._count(fn, "hits")
+                return entry[2]
+            self._count(fn, "misses" if entry is None else "invalidated" if entry[1] != versions else "expired")
+        value = fn(session, *args, **kwargs)
+        with self._lock:
+            self._entries[key] = (t + self.ttl, versions, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
+            self.evictions = 0
+
+    def stats(self):
+        """[{'query','hits','misses','invalidated','expired','hit_rate'}] plus totals under query='(all)'."""
+        with self._lock:
+            rows = [dict(query=name, **c) for name, c in sorted(self._stats.items())]
+        total = {"query": "(all)"}
+        for k in ("hits", "misses", "invalidated", "expired"):
+            total[k] = sum(r[k] for r in rows)
+        for r in rows + [total]:
+            lookups = r["hits"] + r["misses"] + r["invalidated"] + r["expired"]
+            r["hit_rate"] = round(r["hits"] / lookups, 3) if lookups else 0.0
+        return rows + [total]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+cache = QueryCache()
+
+
+def cached(*tables):
+    """
+    Wrap a read function f(session, *args, **kwargs) so its result is reused until one of
+    `tables` is written or the TTL passes. Cached values are shared; callers must not mutate them.
+    """
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(session, *args, **kwargs):
+            return cache.call(fn, tables, session, args, kwargs)
+        inner.uncached = fn
+        return inner
+    return wrap
@@ -0,0 +1,158 @@
+# receipt_worker.py
+# Background receipt generation. Payments enqueue a row in receipt_jobs in the same
+# transaction as the Fee insert; this worker claims jobs in batches, renders the PDFs
+# in a process pool and writes invoice_path back with one bulk update per batch.
+#   python receipt_worker.py run [--forever] [--processes N]
+#   python receipt_worker.py regenerate [--processes N]   queue and render every missing receipt
+import argparse, datetime, os, time, uuid
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import select, update, insert, and_, or_, literal
+from models import SessionLocal, Fee, Student, ReceiptJob, now
+from config import RECEIPTS_FOLDER
+import metrics
+
+# a job stuck in "running" longer than this belonged to a worker that died
+LEASE = datetime.timedelta(minutes=10)
+MAX_ATTEMPTS = 3
+
+
+def enqueue_receipt(session, fee):
+    """Queue a receipt for a Fee added to `session`; committed together with the fee."""
+    job = ReceiptJob(status="pending")
+    job.fee = fee
+    session.add(job)
+    return job
+
+
+def enqueue_receipts_for(session, receipt_ids):
+    """Queue receipts for fees inserted in bulk (no ORM objects), by receipt_id."""
+    if not receipt_ids:
+        return
+    session.execute(insert(ReceiptJob).from_select(
+        ["fee_id_fk", "status", "attempts", "created_at"],
+        select(Fee.id, literal("pending"), literal(0), literal(now())).where(Fee.receipt_id.in_(receipt_ids))))
+
+
+def enqueue_missing(session):
+    """Queue every fee without an invoice_path; finished or failed jobs are reset. Returns jobs queued."""
+    reset = session.execute(
+        update(ReceiptJob)
+        .where(ReceiptJob.status.in_(["done", "failed"]),
+               ReceiptJob.fee_id_fk.in_(select(Fee.id).where(Fee.invoice_path.is_(None))))
+        .values(status="pending", attempts=0, error=None)
+    ).rowcount
+    missing = (select(Fee.id, literal("pending"), literal(0), literal(now()))
+               .outerjoin(ReceiptJob, ReceiptJob.fee_id_fk == Fee.id)
+               .where(Fee.invoice_path.is_(None), ReceiptJob.id.is_(None)))
+    added = session.execute(insert(ReceiptJob).from_select(
+        ["fee_id_fk", "status", "attempts", "created_at"], missing)).rowcount
+    session.commit()
+    return reset + added
+
+
+def claim_jobs(session, limit):
+    token = uuid.uuid4().hex
+    ts = now()
+    claimable = or_(ReceiptJob.status == "pending",
+                    and_(ReceiptJob.status == "running", ReceiptJob.claimed_at < ts - LEASE))
+    ids = select(ReceiptJob.id).where(claimable).order_by(ReceiptJob.id).limit(limit).scalar_subquery()
+    session.execute(
+        update(ReceiptJob).where(ReceiptJob.id.in_(ids), claimable)
+        .values(status="running", claimed_by=token, claimed_at=ts, attempts=ReceiptJob.attempts + 1)
+        .execution_options(synchronize_session=False))
+    session.commit()
+    rows = session.execute(
+        select(ReceiptJob.id, ReceiptJob.attempts, Fee.id, Fee.receipt_id, Fee.timestamp, Fee.name, Fee.amount,
+               Fee.purpose, Fee.payment_mode, Fee.transaction_id, Fee.notes, Student.student_id)
+        .join(Fee, Fee.id == ReceiptJob.fee_id_fk)
+        .outerjoin(Student, Student.id == Fee.student_id_fk)
+        .where(ReceiptJob.claimed_by == token)).all()
+    return [{
+        "job_id": r[0], "attempts": r[1], "fee_id": r[2], "receipt_id": r[3],
+        "date": r[4].strftime("%Y-%m-%d %H:%M:%S") if r[4] else "",
+        "student_name": r[5], "amount": r[6], "purpose": r[7], "payment_mode": r[8],
+        "transaction_id": r[9], "notes": r[10] or "", "student_id": r[11] or "",
+    } for r in rows]
+
+
+def init_worker():
+    # pool initializer: the receipt header is laid out once per process, not per receipt
+    from utils import init_receipt_template
+    init_receipt_template()
+
+
+def render_job(job, out_folder=RECEIPTS_FOLDER):
+    # runs in a pool process
+    from utils import render_receipt_pdf
+    path = os.path.join(out_folder, f"{job['receipt_id']}.pdf")
+    t0 = time.perf_counter()
+    try:
+        render_receipt_pdf(job, path)
+        return job["job_id"], job["fee_id"], path, None, time.perf_counter() - t0
+    except Exception as e:
+        return job["job_id"], job["fee_id"], None, f"{type(e).__name__}: {e}", time.perf_counter() - t0
+
+
+def _finish(session, results, attempts):
+    for r in results:
+        metrics.observe("receipt_render", r[4])  # timed in the pool process
+    done = [r for r in results if r[3] is None]
+    failed = [r for r in results if r[3] is not None]
+    if done:
+        session.bulk_update_mappings(Fee, [{"id": fee_id, "invoice_path": path} for _, fee_id, path, _, _ in done])
+        session.bulk_update_mappings(ReceiptJob, [{"id": job_id, "status": "done", "error": None} for job_id, _, _, _, _ in done])
+    if failed:
+        session.bulk_update_mappings(ReceiptJob, [
+            {"id": job_id, "error": err, "status": "failed" if attempts[job_id] >= MAX_ATTEMPTS else "pending"}
+            for job_id, _, _, err, _ in failed])
+    session.commit()
+    return len(done), len(failed)
+
+
+def run(processes=None, batch_size=200, forever=False, poll=1.0):
+    """Drain the queue (or keep polling with forever=True). Returns {'rendered','failed','seconds','processes'}."""
+    processes = processes or os.cpu_count() or 1
+    os.makedirs(RECEIPTS_FOLDER, exist_ok=True)
+    rendered = failed = 0
+    busy = 0.0
+    s = SessionLocal()
+    try:
+        with ProcessPoolExecutor(processes, initializer=init_worker) as pool:
+            while True:
+                jobs = claim_jobs(s, batch_size)
+                if not jobs:
+                    if not forever:
+                        break
+                    time.sleep(poll)
+                    continue
+                t0 = time.perf_counter()
+                chunk = max(1, len(jobs) // (processes * 4))
+                with metrics.span("receipt_batch"):
+                    results = list(pool.map(render_job, jobs, chunksize=chunk))
+                    ok, bad = _finish(s, results, {j["job_id"]: j["attempts"] for j in jobs})
+                busy += time.perf_counter() - t0
+                rendered += ok
+                failed += bad
+    finally:
+        s.close()
+    return {"rendered": rendered, "failed": failed, "seconds": busy, "processes": processes}
+
+
+def _report(stats):
+    rate = stats["rendered"] / stats["seconds"] if stats["seconds"] else 0.0
+    print(f"rendered {stats['rendered']} receipts ({stats['failed']} failed) in {stats['seconds']:.2f}s "
+          f"with {stats['processes']} processes: {rate:.0f} receipts/sec, {rate / stats['processes']:.0f} per core")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Receipt PDF worker")
+    parser.add_argument("command", choices=["run", "regenerate"])
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--forever", action="store_true", help="keep polling for new jobs")
+    args = parser.parse_args()
+    if args.command == "regenerate":
+        s = SessionLocal()
+        print(f"queued {enqueue_missing(s)} receipts")
+        s.close()
+    _report(run(args.processes, args.batch_size, forever=args.forever and args.command == "run"))
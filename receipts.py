@@ -1,7 +1,9 @@
 # receipts.py
 from utils import create_receipt_pdf
 from datetime import datetime
+from metrics import timed
 
+@timed("receipt_render")
 def build_and_save_receipt(db_session, fee_obj):
     data = {
         "receipt_id": fee_obj.receipt_id,
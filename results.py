@@ -0,0 +1,281 @@
+# results.py
+# Semester results on columnar data: every exam row in scope is pulled with one query into
+# NumPy/pandas arrays. Grade points, SGPA/CGPA, cohort ranks and per-subject statistics
+# are then computed with vectorized group operations. Output goes to student_results and
+# subject_stats.
+# Incremental runs (the default) only reload students whose exam rows changed
+# (Exam.updated_at) since the previous run, re-rank their cohorts and refresh the
+# statistics of the subjects they touched.
+# Credits and semesters come from the subjects catalogue (Admin page); codes missing from it
+# count as 1 credit in semester 1 and are reported by every run.
+#   python results.py [--full] [--program BSc --year 2]
+import argparse, datetime, time
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, update, delete, func, tuple_, bindparam
+from models import SessionLocal, Student, Exam, Subject, StudentResult, SubjectStat, RollupWatermark
+from config import PASS_MARK
+from archive import history
+
+# 10-point scale: marks below PASS_MARK -> 0, then 5, 6, 7, 8, 9, 10 from 50/60/70/80/90
+GRADE_CUTS = np.array([PASS_MARK, 50, 60, 70, 80, 90], dtype=float)
+GRADE_POINTS = np.array([0, 5, 6, 7, 8, 9, 10], dtype=float)
+# exam rows updated within this window of a run are picked up again by the next one,
+# so a transaction committing late is never skipped (see dashboard.FOLD_LAG)
+WATERMARK_LAG = datetime.timedelta(seconds=60)
+COHORT = ["program", "year"]
+
+
+def grade_points(marks):
+    return GRADE_POINTS[np.searchsorted(GRADE_CUTS, np.asarray(marks, dtype=float), side="right")]
+
+
+def _program_year():
+    return func.coalesce(Student.program, ""), func.coalesce(Student.year, "")
+
+
+def _frame(conn, stmt, columns):
+    # plain tuples straight from the DBAPI cursor; building Row objects costs more than the query
+    return pd.DataFrame.from_records(conn.execute(stmt).cursor.fetchall(), columns=columns)
+
+
+def load_exams(session, students=None, subjects=None):
+    """
+    Exam rows with marks as a DataFrame (id, student, subject_code, marks, program, year,
+    credits, semester). `students` is a SELECT of student ids to limit the load to.
+    Cohort and subject columns are mapped in from the small students/subjects tables.
+    Archived years are included, so CGPA covers every semester.
+    """
+    exams = history(session, Exam)
+    stmt = select(exams.c.id, exams.c.student_id_fk, exams.c.subject_code, exams.c.marks).where(exams.c.marks.isnot(None))
+    people = select(Student.id, *_program_year())
+    if students is not None:
+        stmt = stmt.where(exams.c.student_id_fk.in_(students))
+        people = people.where(Student.id.in_(students))
+    if subjects is not None:
+        stmt = stmt.where(exams.c.subject_code.in_(subjects))
+    conn = session.connection()
+    df = _frame(conn, stmt, ["id", "student", "subject_code", "marks"])
+    # a re-evaluated subject keeps only its latest row
+    df = df.sort_values("id", kind="stable").drop_duplicates(["student", "subject_code"], keep="last")
+    people = _frame(conn, people, ["student", "program", "year"]).set_index("student")
+    catalogue = _frame(conn, select(Subject.code, Subject.credits, Subject.semester),
+                       ["subject_code", "credits", "semester"]).set_index("subject_code")
+    df = df.join(people, on="student", how="inner").join(catalogue, on="subject_code")
+    df["credits"] = df["credits"].fillna(1.0)
+    df["semester"] = df["semester"].fillna(1).astype(int)
+    return df
+
+
+def _records(frame):
+    # column-wise tolist() yields plain Python values and is much faster than to_dict("records")
+    cols = list(frame.columns)
+    return [dict(zip(cols, row)) for row in zip(*(frame[c].tolist() for c in cols))]
+
+
+def semester_results(exams):
+    """One row per (student, semester): credits, sgpa, cgpa, failed, program, year."""
+    marks = exams["marks"].to_numpy(dtype=float)
+    credits = exams["credits"].to_numpy(dtype=float)
+    frame = pd.DataFrame({"student": exams["student"].to_numpy(), "semester": exams["semester"].to_numpy(),
+                          "credits": credits, "wgp": grade_points(marks) * credits, "failed": marks < PASS_MARK})
+    sem = frame.groupby(["student", "semester"], sort=True).sum().reset_index()
+    cum = sem.groupby("student")[["wgp", "credits"]].cumsum()
+    sem["sgpa"] = (sem["wgp"] / sem["credits"]).round(2)
+    sem["cgpa"] = (cum["wgp"] / cum["credits"]).round(2)
+    sem["failed"] = sem["failed"].astype(int)
+    cohort = exams.drop_duplicates("student").set_index("student")[COHORT]
+    return sem.join(cohort, on="student").drop(columns="wgp")
+
+
+def rank(sem):
+    """Rank by SGPA within program + year + semester; equal SGPAs share the better rank."""
+    return sem.groupby(COHORT + ["semester"])["sgpa"].rank(method="min", ascending=False).astype(int)
+
+
+def subject_stats(exams):
+    marks = exams["marks"].astype(float)
+    g = marks.groupby([exams["program"], exams["year"], exams["subject_code"]])
+    stats = g.agg(["count", "mean", "median", "std"]).rename(columns={"count": "students"})
+    stats["pass_pct"] = (marks >= PASS_MARK).groupby([exams["program"], exams["year"], exams["subject_code"]]).mean() * 100
+    stats["std"] = stats["std"].fillna(0.0)
+    return stats.round(2).reset_index()
+
+
+def _write_results(s, sem, scope):
+    q = delete(StudentResult)
+    if scope is not None:
+        q = q.where(StudentResult.student_id_fk.in_(scope))
+    s.execute(q)
+    if not sem.empty:
+        # incremental runs leave rank out; _rerank fills it in for the whole cohort
+        cols = [c for c in ("student", "semester", "credits", "sgpa", "cgpa", "failed", "rank") if c in sem.columns]
+        out = sem[cols].rename(columns={"student": "student_id_fk"})
+        s.execute(StudentResult.__table__.insert().values(computed_at=func.now()), _records(out))
+
+
+def _rerank(s, cohorts):
+    """Recompute ranks of whole cohorts from stored results; writes only ranks that moved."""
+    stored = _frame(s.connection(),
+                    select(StudentResult.student_id_fk, StudentResult.semester, StudentResult.sgpa, StudentResult.rank,
+                           *_program_year())
+                    .join(Student, Student.id == StudentResult.student_id_fk)
+                    .where(tuple_(*_program_year()).in_(cohorts)),
+                    ["student", "semester", "sgpa", "old", "program", "year"])
+    if stored.empty:
+        return 0
+    stored["rank"] = rank(stored)
+    moved = stored.loc[stored["old"].isna() | (stored["old"] != stored["rank"]), ["student", "semester", "rank"]]
+    if not moved.empty:
+        t = StudentResult.__table__
+        s.execute(update(t).where(t.c.student_id_fk == bindparam("b_student"), t.c.semester == bindparam("b_semester"))
+                  .values(rank=bindparam("b_rank")), _records(moved.add_prefix("b_")))
+    return len(moved)
+
+
+def _write_stats(s, stats, keys):
+    for chunk in range(0, len(keys), 500):
+        s.execute(delete(SubjectStat).where(
+            tuple_(SubjectStat.program, SubjectStat.year, SubjectStat.subject_code).in_(keys[chunk:chunk + 500])))
+    if not stats.empty:
+        s.execute(SubjectStat.__table__.insert().values(computed_at=func.now()), _records(stats))
+
+
+def _watermark(s):
+    # RollupWatermark.updated_at holds the start of the window the next run must cover
+    return s.execute(select(RollupWatermark.updated_at).where(RollupWatermark.name == "results")).scalar()
+
+
+def compute_results(full=False, program=None, year=None):
+    """
+    Recompute results. With program/year only that cohort is recomputed (always fully);
+    otherwise only students with exam changes since the last run, unless full=True.
+    Returns {'mode','exam_rows','students','results','ranks_changed','subjects','unknown_subjects','seconds'}.
+    """
+    t0 = time.perf_counter()
+    started = datetime.datetime.utcnow()
+    cohort_run = program is not None or year is not None
+    s = SessionLocal()
+    try:
+        since = None if full or cohort_run else _watermark(s)
+        mode = "cohort" if cohort_run else "incremental" if since is not None else "full"
+        scope = None
+        if cohort_run:
+            program_col, year_col = _program_year()
+            scope = select(Student.id)
+            if program is not None:
+                scope = scope.where(program_col == program)
+            if year is not None:
+                scope = scope.where(year_col == year)
+        elif since is not None:
+            # no DISTINCT: IN() dedupes, and DISTINCT makes SQLite walk the student index instead
+            scope = select(Exam.student_id_fk).where(Exam.updated_at >= since)
+        exams = load_exams(s, scope)
+        unknown = sorted(set(exams["subject_code"].dropna()) - set(s.execute(select(Subject.code)).scalars()))
+        sem = semester_results(exams)
+        ranks_changed = 0
+        if mode == "incremental":
+            _write_results(s, sem, scope)
+            cohorts = list(exams[COHORT].drop_duplicates().itertuples(index=False, name=None))
+            ranks_changed = _rerank(s, cohorts) if cohorts else 0
+            # statistics of the subjects whose marks changed, over every student of those cohorts
+            program_col, year_col = _program_year()
+            combos = pd.DataFrame(s.execute(select(program_col, year_col, Exam.subject_code).distinct()
+                                            .join(Student, Student.id == Exam.student_id_fk)
+                                            .where(Exam.updated_at >= since)).all(), columns=COHORT + ["subject_code"])
+            keys = list(combos.itertuples(index=False, name=None))
+            if keys:
+                touched = list(combos[COHORT].drop_duplicates().itertuples(index=False, name=None))
+                marks = load_exams(s, select(Student.id).where(tuple_(program_col, year_col).in_(touched)),
+                                   combos["subject_code"].unique().tolist())
+                _write_stats(s, subject_stats(marks.merge(combos, on=COHORT + ["subject_code"])), keys)
+        else:
+            sem["rank"] = rank(sem) if not sem.empty else []
+            ranks_changed = len(sem)
+            _write_results(s, sem, scope)
+            stats = subject_stats(exams)
+            if mode == "full":
+                s.execute(delete(SubjectStat))
+                _write_stats(s, stats, [])
+            else:
+                _write_stats(s, stats, list(stats[COHORT + ["subject_code"]].itertuples(index=False, name=None)))
+        if not cohort_run:
+            mark = started - WATERMARK_LAG
+            if s.execute(select(RollupWatermark.name).where(RollupWatermark.name == "results")).first():
+                s.query(RollupWatermark).filter(RollupWatermark.name == "results").update({"updated_at": mark})
+            else:
+                s.add(RollupWatermark(name="results", last_id=0, updated_at=mark))
+        s.commit()
+        return {"mode": mode, "exam_rows": len(exams), "students": int(sem["student"].nunique()), "results": len(sem),
+                "ranks_changed": ranks_changed, "subjects": int(exams["subject_code"].nunique()),
+                "unknown_subjects": unknown, "seconds": time.perf_counter() - t0}
+    finally:
+        s.close()
+
+
+def cohorts(session):
+    """[(program, year)] that have students."""
+    p, y = _program_year()
+    return session.execute(select(p, y).distinct().order_by(p, y)).all()
+
+
+def cohort_results(session, program, year, semester, limit=200):
+    rows = session.execute(
+        select(StudentResult.rank, Student.student_id, Student.name, StudentResult.sgpa, StudentResult.cgpa,
+               StudentResult.credits, StudentResult.failed)
+        .join(Student, Student.id == StudentResult.student_id_fk)
+        .where(_program_year()[0] == program, _program_year()[1] == year, StudentResult.semester == semester)
+        .order_by(StudentResult.rank, Student.student_id).limit(limit)).all()
+    return [dict(r._mapping) for r in rows]
+
+
+def cohort_semesters(session, program, year):
+    return session.execute(
+        select(StudentResult.semester).distinct().join(Student, Student.id == StudentResult.student_id_fk)
+        .where(_program_year()[0] == program, _program_year()[1] == year).order_by(StudentResult.semester)).scalars().all()
+
+
+def cohort_subject_stats(session, program, year):
+    rows = session.execute(
+        select(SubjectStat.subject_code, SubjectStat.students, SubjectStat.mean, SubjectStat.median,
+               SubjectStat.std, SubjectStat.pass_pct)
+        .where(SubjectStat.program == program, SubjectStat.year == year).order_by(SubjectStat.subject_code)).all()
+    return [dict(r._mapping) for r in rows]
+
+
+def subject_catalogue(session):
+    rows = session.execute(select(Subject.code, Subject.name, Subject.credits, Subject.semester).order_by(Subject.code)).all()
+    return [dict(r._mapping) for r in rows]
+
+
+def missing_subjects(session):
+    """Subject codes graded in current exams that the catalogue lacks."""
+    return session.execute(select(Exam.subject_code).distinct()
+                           .where(Exam.subject_code.isnot(None), Exam.subject_code.notin_(select(Subject.code)))
+                           .order_by(Exam.subject_code)).scalars().all()
+
+
+def save_subject(session, code, name=None, credits=1.0, semester=1):
+    """Add or update a catalogue entry. The next compute_results run is a full one, so past marks use it too."""
+    code = (code or "").strip()
+    if not code:
+        raise ValueError("Subject code is required")
+    if credits <= 0 or semester < 1:
+        raise ValueError("Credits must be positive and semester at least 1")
+    session.merge(Subject(code=code, name=name or None, credits=float(credits), semester=int(semester)))
+    session.execute(delete(RollupWatermark).where(RollupWatermark.name == "results"))
+    session.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute semester results")
+    parser.add_argument("--full", action="store_true", help="recompute everyone, not just changed students")
+    parser.add_argument("--program")
+    parser.add_argument("--year")
+    args = parser.parse_args()
+    r = compute_results(args.full, args.program, args.year)
+    print(f"{r['mode']}: {r['exam_rows']} exam rows, {r['students']} students, {r['results']} semester results, "
+          f"{r['ranks_changed']} ranks written, {r['subjects']} subjects in {r['seconds']:.2f}s")
+    if r["unknown_subjects"]:
+        print(f"warning: {len(r['unknown_subjects'])} subject codes are not in the catalogue and count as "
+              f"1 credit in semester 1: {', '.join(r['unknown_subjects'][:20])}")
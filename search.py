@@ -0,0 +1,95 @@
+# search.py
+# Student search for the Admissions page. On SQLite it uses an FTS5 index over
+# name/student_id/email kept in sync with the students table by triggers; other
+# databases fall back to a bounded ILIKE query.
+import re
+from sqlalchemy import text, or_, func
+from models import Student
+
+PAGE_SIZE = 25
+MAX_RESULTS = 200  # hard cap on offset + page size
+COLUMNS = ["student_id", "name", "email", "mobile", "program", "year"]
+
+_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5(
+        name, student_id, email,
+        content='students', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+    """CREATE TRIGGER IF NOT EXISTS students_fts_ai AFTER INSERT ON students BEGIN
+        INSERT INTO students_fts(rowid, name, student_id, email) VALUES (new.id, new.name, new.student_id, new.email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS students_fts_ad AFTER DELETE ON students BEGIN
+        INSERT INTO students_fts(students_fts, rowid, name, student_id, email) VALUES ('delete', old.id, old.name, old.student_id, old.email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS students_fts_au AFTER UPDATE OF name, student_id, email ON students BEGIN
+        INSERT INTO students_fts(students_fts, rowid, name, student_id, email) VALUES ('delete', old.id, old.name, old.student_id, old.email);
+        INSERT INTO students_fts(rowid, name, student_id, email) VALUES (new.id, new.name, new.student_id, new.email);
+    END""",
+]
+# bm25 weights for name, student_id, email
+_RANK = "bm25(students_fts, 10.0, 5.0, 1.0)"
+_installed = set()
+
+
+def install_search_index(engine):
+    """Create the FTS table and triggers if missing and index existing students. Returns True on SQLite."""
+    if engine.dialect.name != "sqlite":
+        return False
+    with engine.begin() as conn:
+        exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'students_fts'")).first()
+        for ddl in _DDL:
+            conn.exec_driver_sql(ddl)
+        if not exists:
+            conn.exec_driver_sql("INSERT INTO students_fts(students_fts) VALUES ('rebuild')")
+    _installed.add(engine.url)
+    return True
+
+
+def rebuild_search_index(engine):
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO students_fts(students_fts) VALUES ('rebuild')")
+
+
+def fts_query(q):
+    """Turn free text into an FTS5 expression: every word must match as a prefix."""
+    words = [w for w in re.split(r"[^\w]+", q.lower()) if w]
+    return " AND ".join(f'"{w}"*' for w in words)
+
+
+def find_student(session, q):
+    """Exact lookup by student id, or by email in any letter case (ix_students_email_lower)."""
+    q = (q or "").strip()
+    return session.query(Student).filter(
+        or_(Student.student_id == q, func.lower(Student.email) == q.lower())).first()
+
+
+def search_students(session, q, page=0, page_size=PAGE_SIZE):
+    """
+    Returns (rows, has_more) where rows are dicts with COLUMNS, best matches first.
+    Results beyond MAX_RESULTS are never returned.
+    """
+    offset = page * page_size
+    limit = min(page_size, MAX_RESULTS - offset)
+    if limit <= 0:
+        return [], False
+    engine = session.get_bind()
+    q = (q or "").strip()
+    if not q:
+        rows = (session.query(*[getattr(Student, c) for c in COLUMNS])
+                .order_by(Student.id.desc()).offset(offset).limit(limit + 1).all())
+    elif engine.dialect.name == "sqlite" and (engine.url in _installed or install_search_index(engine)):
+        expr = fts_query(q)
+        if not expr:
+            return [], False
+        cols = ", ".join(f"s.{c}" for c in COLUMNS)
+        rows = session.execute(text(
+            f"SELECT {cols} FROM students_fts JOIN students s ON s.id = students_fts.rowid "
+            f"WHERE students_fts MATCH :q ORDER BY {_RANK} LIMIT :lim OFFSET :off"),
+            {"q": expr, "lim": limit + 1, "off": offset}).all()
+    else:
+        like = f"%{q}%"
+        rows = (session.query(*[getattr(Student, c) for c in COLUMNS])
+                .filter(or_(Student.name.ilike(like), Student.student_id.ilike(like), Student.email.ilike(like)))
+                .order_by(Student.name).offset(offset).limit(limit + 1).all())
+    has_more = len(rows) > limit and offset + limit < MAX_RESULTS
+    return [dict(zip(COLUMNS, r)) for r in rows[:limit]], has_more
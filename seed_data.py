@@ -0,0 +1,177 @@
+# seed_data.py
+# Reproducible synthetic data for benchmarks and demos: students, admissions, fees, hostel
+# rooms and allocations, subjects, exam marks and a fee structure, at 10k to 1M students.
+# Rows are generated in chunks and written with multi-row INSERTs, one transaction per
+# table. Derived tables (ledger accounts, fee rollup, dues snapshot, results) are then
+# rebuilt once instead of being maintained row by row. The same --seed gives the same data.
+#   COLLEGE_ERP_DB_PATH=/tmp/bench.db python seed_data.py --students 100000 [--seed 1]
+import argparse, datetime, random, time
+from sqlalchemy import select, insert, update, func
+from models import (init_db, SessionLocal, Student, Admission, Fee, HostelAllocation, HostelRoom, HostelBed, Exam,
+                    Subject, FeeStructure)
+import hostel, ledger, dashboard, dues, results
+
+CHUNK_ROWS = 20000
+PROGRAMS = {"BSc": 42000.0, "BCom": 36000.0, "BA": 30000.0, "BTech": 95000.0}
+DEPARTMENTS = {"BSc": "Science", "BCom": "Commerce", "BA": "Arts", "BTech": "Engineering"}
+FIRST = ["Aarav", "Vivaan", "Aditya", "Diya", "Ananya", "Ishaan", "Kavya", "Rohan", "Saanvi", "Arjun", "Meera",
+         "Karthik", "Priya", "Rahul", "Sneha", "Vikram", "Lakshmi", "Naveen", "Pooja", "Siddharth", "Fatima", "Joseph"]
+LAST = ["Sharma", "Iyer", "Reddy", "Nair", "Patel", "Gupta", "Menon", "Rao", "Kumar", "Singh", "Pillai", "Das",
+        "Joshi", "Mehta", "Bose", "Chatterjee", "Verma", "Krishnan", "Shetty", "Naidu", "Khan", "Thomas"]
+MODES = ["UPI", "UPI", "UPI", "Card", "NetBanking", "Cash", "Cheque"]
+ADMISSION_STATUS = ["Approved"] * 8 + ["Pending", "Rejected"]
+BLOCKS = "ABCDEFGH"
+
+
+def _chunks(rows, size=CHUNK_ROWS):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _write(session, model, rows):
+    n = 0
+    for batch in _chunks(rows):
+        session.execute(insert(model), batch)
+        n += len(batch)
+    session.commit()
+    return n
+
+
+def _students(rng, n, today):
+    for i in range(1, n + 1):
+        first, last = rng.choice(FIRST), rng.choice(LAST)
+        program = rng.choice(list(PROGRAMS))
+        year = rng.choice([1, 1, 2, 2, 3, 3, 4]) if program == "BTech" else rng.choice([1, 2, 3])
+        joined = today.year - year + 1
+        yield {"id": i, "student_id": f"COLG{joined % 100:02d}S{100000 + i}", "name": f"{first} {last}",
+               "email": f"{first.lower()}.{last.lower()}{i}@college.edu", "mobile": f"9{rng.randrange(10 ** 9):09d}",
+               "gender": rng.choice(["F", "M"]), "dob": f"{joined - 18}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+               "program": program, "year": str(year), "department": DEPARTMENTS[program],
+               "guardian_name": f"{rng.choice(FIRST)} {last}",
+               "created_at": datetime.datetime(joined, 6, 1) + datetime.timedelta(minutes=rng.randrange(60 * 24 * 60))}
+
+
+def _admissions(rng, students):
+    for st in students:
+        yield {"admission_id": f"ADM-S-{st['id']:08d}", "student_id_fk": st["id"], "submitted_at": st["created_at"],
+               "source": rng.choice(["Online", "Online", "Walk-in", "Bulk"]), "status": rng.choice(ADMISSION_STATUS)}
+
+
+def _fees(rng, students, per_student, now):
+    # installments in time order per student, so balance_after is the running ledger balance
+    k = 0
+    for st in students:
+        paid = 0.0
+        ts = st["created_at"]
+        fee = PROGRAMS[st["program"]]
+        for _ in range(rng.randint(0, per_student * 2)):
+            ts = min(ts + datetime.timedelta(days=rng.randint(20, 200), minutes=rng.randrange(1440)), now)
+            amount = float(rng.choice([fee / 4, fee / 2, fee, rng.randint(5, 200) * 100]))
+            paid += amount
+            k += 1
+            yield {"receipt_id": f"REC-S-{k:09d}", "timestamp": ts, "student_id_fk": st["id"], "name": st["name"],
+                   "amount": amount, "payment_mode": rng.choice(MODES), "transaction_id": f"SYN-TXN-{k:09d}",
+                   "balance_after": -paid, "purpose": "Tuition", "recorded_by": "seed"}
+
+
+def _subjects(per_year):
+    return [{"code": f"{p.upper()}{y}{k:02d}", "name": f"{p} year {y} subject {k}", "credits": [4.0, 3.0, 2.0][k % 3],
+             "semester": 2 * y - 1 + k % 2} for p in PROGRAMS for y in range(1, 5) for k in range(per_year)]
+
+
+def _exams(rng, students, per_year, now):
+    # every subject of the years a student has completed or is in
+    k = 0
+    for st in students:
+        ability = rng.gauss(62, 12)
+        for y in range(1, int(st["year"]) + 1):
+            graded = datetime.datetime(now.year - int(st["year"]) + y, 4, 20)
+            for s in range(per_year):
+                m = round(min(100.0, max(0.0, rng.gauss(ability, 10))))
+                k += 1
+                ts = min(graded + datetime.timedelta(minutes=rng.randrange(60 * 24 * 20)), now)
+                yield {"exam_id": f"EX-S-{k:09d}", "student_id_fk": st["id"],
+                       "subject_code": f"{st['program'].upper()}{y}{s:02d}", "subject_name": f"Subject {s}",
+                       "marks": float(m), "status": "Pass" if m >= 40 else "Fail", "graded_at": ts, "updated_at": ts,
+                       "graded_by": "seed"}
+
+
+def _hostel(session, rng, n_students, share):
+    """Rooms for `share` of the students in blocks A..H, filled by bulk INSERT with consistent occupied counts."""
+    beds_needed = int(n_students * share)
+    rooms = beds_needed // 2 + 1
+    per_block = rooms // len(BLOCKS) + 1
+    for b in BLOCKS:
+        hostel.add_rooms(session, b, [str(101 + r) for r in range(per_block)], "double", 2)
+    session.commit()
+    beds = session.execute(select(HostelBed.id, HostelRoom.block, HostelRoom.room_no, HostelBed.bed_no)
+                           .join(HostelRoom, HostelRoom.id == HostelBed.room_id_fk).order_by(HostelBed.id)).all()
+    housed = rng.sample(range(1, n_students + 1), min(beds_needed, len(beds), n_students))
+    n = _write(session, HostelAllocation, (
+        {"allocation_id": f"HST-S-{i:08d}", "student_id_fk": sid, "bed_id_fk": bed.id, "block": bed.block,
+         "room_no": bed.room_no, "bed_no": bed.bed_no, "status": hostel.ACTIVE, "move_in": "2024-07-01",
+         "allocated_by": "seed"} for i, (sid, bed) in enumerate(zip(housed, beds), 1)))
+    taken = (select(func.count(HostelAllocation.id)).join(HostelBed, HostelBed.id == HostelAllocation.bed_id_fk)
+             .where(HostelBed.room_id_fk == HostelRoom.id, HostelAllocation.status == hostel.ACTIVE).scalar_subquery())
+    session.execute(update(HostelRoom).values(occupied=taken))
+    session.commit()
+    hostel.index.loaded = False
+    return n
+
+
+def generate(students, seed=1, fees_per_student=3, subjects_per_year=6, hostel_share=0.3, log=print):
+    """Fill an empty database. Returns {'rows': {step: rows written}, 'seconds': {step: s}}."""
+    init_db()
+    s = SessionLocal()
+    rows, seconds = {}, {}
+
+    def step(name, fn):
+        t0 = time.perf_counter()
+        out = fn()
+        seconds[name] = time.perf_counter() - t0
+        rows[name] = out
+        log(f"{name:<16} {out:>10} {seconds[name]:>8.1f}s")
+
+    try:
+        if s.execute(select(Student.id).limit(1)).first():
+            raise SystemExit("database already has students; seed an empty one")
+        now = datetime.datetime.utcnow().replace(microsecond=0) - datetime.timedelta(hours=1)
+        today = now.date()
+        # each table's generator draws from its own stream, so one table's size does not shift the others
+        people = list(_students(random.Random(f"{seed}:students"), students, today))
+        step("students", lambda: _write(s, Student, people))
+        step("admissions", lambda: _write(s, Admission, _admissions(random.Random(f"{seed}:admissions"), people)))
+        step("fees", lambda: _write(s, Fee, _fees(random.Random(f"{seed}:fees"), people, fees_per_student, now)))
+        step("hostel", lambda: _hostel(s, random.Random(f"{seed}:hostel"), students, hostel_share))
+        step("subjects", lambda: _write(s, Subject, _subjects(subjects_per_year)))
+        step("exams", lambda: _write(s, Exam, _exams(random.Random(f"{seed}:exams"), people, subjects_per_year, now)))
+        step("fee_structures", lambda: _write(s, FeeStructure, (
+            {"program": p, "year": y, "term": f"Year {y}", "head": "Tuition", "amount": fee,
+             "due_date": datetime.date(today.year - 1, 7, 15)} for p, fee in PROGRAMS.items() for y in range(1, 5))))
+        del people
+        step("ledger", ledger.rebuild)
+        step("fee rollup", dashboard.rebuild_fee_rollup)
+        step("dues", lambda: dues.refresh()["students"])
+        step("results", lambda: results.compute_results(full=True)["results"])
+        return {"rows": rows, "seconds": seconds}
+    finally:
+        s.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill an empty database with synthetic data")
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--fees-per-student", type=int, default=3, help="average installments per student")
+    parser.add_argument("--subjects-per-year", type=int, default=6)
+    parser.add_argument("--hostel-share", type=float, default=0.3, help="fraction of students given a bed")
+    args = parser.parse_args()
+    t0 = time.perf_counter()
+    out = generate(args.students, args.seed, args.fees_per_student, args.subjects_per_year, args.hostel_share)
+    print(f"seeded {args.students} students in {time.perf_counter() - t0:.1f}s")
@@ -0,0 +1,89 @@
+# startup_report.py
+# Cold-start cost of each entry point, measured with python -X importtime in a fresh
+# interpreter: the webhook server, the REST API and the Streamlit app's login page (one
+# run through streamlit.testing's AppTest, whose own imports are left out). Prints the
+# wall time, the time spent importing, which heavy packages got loaded and the slowest
+# third-party packages. --json writes the numbers; --compare shows the change against them.
+#   python startup_report.py [--top 10] [--json startup.json] [--compare startup-old.json]
+import argparse, json, os, re, subprocess, sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# name -> (setup that is not measured, code that is)
+TARGETS = {
+    "webhook": ("", "import webhook_forwarder"),
+    "api": ("", "import api"),
+    "app (login page)": ("from streamlit.testing.v1 import AppTest",
+                         f"AppTest.from_file({os.path.join(HERE, 'app.py')!r}, default_timeout=120).run()"),
+}
+HEAVY = ["pandas", "numpy", "pyarrow", "plotly", "fpdf", "PIL", "werkzeug", "flask", "starlette", "sqlalchemy",
+         "alembic"]
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+_SCRIPT = """import sys, time
+{setup}
+sys.stderr.write("-- start --\\n")
+t0 = time.perf_counter()
+{code}
+sys.stderr.write(f"-- done {{time.perf_counter() - t0:.6f}} --\\n")
+"""
+
+
+def measure(name):
+    """{'wall_ms', 'import_ms', 'modules', 'heavy': {pkg: ms}, 'slowest': [(package, ms)]} for one target."""
+    setup, code = TARGETS[name]
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", _SCRIPT.format(setup=setup, code=code)],
+                          cwd=HERE, capture_output=True, text=True)
+    lines = proc.stderr.splitlines()
+    if "-- start --" not in lines or not any(l.startswith("-- done") for l in lines):
+        raise RuntimeError(f"{name} failed:\n{proc.stderr[-2000:]}")
+    start = lines.index("-- start --")
+    done = next(l for l in lines if l.startswith("-- done"))
+    entries = [m for m in map(_LINE.match, lines[start:]) if m]
+    # (cumulative us, nesting depth, module) in the order importtime prints them: children first
+    rows = [(int(m.group(2)), len(m.group(3)) // 2, m.group(4)) for m in entries]
+    # a package costs the sum of its entries that are not nested inside another of its own
+    packages, stack = {}, []
+    for us, depth, mod in reversed(rows):
+        del stack[depth:]
+        pkg = mod.split(".")[0]
+        if pkg not in stack:
+            packages[pkg] = packages.get(pkg, 0) + us
+        stack.append(pkg)
+    local = {f[:-3] for f in os.listdir(HERE) if f.endswith(".py")}
+    slowest = sorted(((p, us) for p, us in packages.items() if p not in local), key=lambda r: -r[1])
+    return {"wall_ms": round(float(done.split()[2]) * 1000, 1),
+            "import_ms": round(sum(us for us, depth, _ in rows if depth == 0) / 1000, 1),
+            "modules": len(rows), "heavy": {p: round(packages[p] / 1000, 1) for p in HEAVY if p in packages},
+            "slowest": [(p, round(us / 1000, 1)) for p, us in slowest]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time report for the app, webhook and API entry points")
+    parser.add_argument("--only", nargs="+", choices=list(TARGETS), metavar="TARGET")
+    parser.add_argument("--top", type=int, default=8, help="slowest packages listed per target")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--compare", help="earlier --json output to compare against")
+    args = parser.parse_args()
+    old = {}
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+    report = {}
+    for name in args.only or TARGETS:
+        r = report[name] = measure(name)
+        r["slowest"] = r["slowest"][:args.top]
+        prev = old.get(name)
+        delta = f"  (was {prev['wall_ms']:.0f} ms, {prev['modules']} modules)" if prev else ""
+        print(f"{name}: {r['wall_ms']:.0f} ms wall, {r['import_ms']:.0f} ms importing {r['modules']} modules{delta}")
+        print("  heavy: " + (", ".join(f"{k} {v:.0f} ms" for k, v in r["heavy"].items()) or "none"))
+        if prev:
+            dropped = sorted(set(prev["heavy"]) - set(r["heavy"]))
+            if dropped:
+                print("  no longer loaded: " + ", ".join(dropped))
+        print("  slowest: " + ", ".join(f"{m} {ms:.0f} ms" for m, ms in r["slowest"]))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+# tests/conftest.py
+# Every test session gets a throwaway database and folders; set before config.py is imported.
+import os, sys, tempfile
+
+_tmp = tempfile.mkdtemp(prefix="erp_tests_")
+os.environ["COLLEGE_ERP_DB_PATH"] = os.path.join(_tmp, "test.db")
+for name in ("BACKUP_FOLDER", "RECEIPTS_FOLDER", "ARCHIVE_FOLDER", "DOCUMENTS_FOLDER"):
+    os.environ[name] = os.path.join(_tmp, name.split("_")[0].lower())
+os.environ["WEBHOOK_SECRET"] = "test_secret"
+os.environ["COLLEGE_ERP_SECRET"] = "test_session_secret"
+os.environ.pop("WEBHOOK_BATCH_MODE", None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from models import init_db
+
+
+@pytest.fixture(scope="session", autouse=True)
+def db():
+    init_db()
@@ -0,0 +1,111 @@
+import asyncio, json
+import pytest
+from models import SessionLocal
+import api, config, hostel
+
+_loop = asyncio.new_event_loop()  # one loop for every call: the async engine's connections belong to it
+
+
+def call(method, path, body=None):
+    """Drive api.app as an ASGI server would; returns (status, json)."""
+    messages, request = [], [{"type": "http.request", "body": json.dumps(body).encode() if body is not None else b""}]
+
+    async def receive():
+        return request.pop() if request else {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "raw_path": path.encode(), "query_string": b"",
+             "root_path": "", "scheme": "http", "http_version": "1.1", "server": ("test", 80), "client": ("test", 1),
+             "headers": [(b"x-api-key", config.API_KEY.encode()), (b"content-type", b"application/json")]}
+    _loop.run_until_complete(api.app(scope, receive, send))
+    start = next(m for m in messages if m["type"] == "http.response.start")
+    return start["status"], json.loads(b"".join(m.get("body", b"") for m in messages if m["type"] == "http.response.body"))
+
+
+@pytest.fixture(scope="module")
+def rooms():
+    s = SessionLocal()
+    hostel.add_rooms(s, "T", ["1", "2"], room_type="double", capacity=2)
+    s.commit()
+    s.close()
+
+
+def test_create_students():
+    status, body = call("POST", "/students", [{"name": "Api One", "email": "one@example.com"},
+                                              {"name": "Api Two", "email": "two@example.com"}])
+    assert status == 201
+    assert len(set(body["created"])) == 2
+    status, body = call("GET", f"/students/{body['created'][0]}")
+    assert status == 200 and body["name"] == "Api One"
+
+
+@pytest.mark.parametrize("prefs", ["A", ["A"], [["A"]], [["A", "double", "x"]], [[1, 2]], [{"block": "A"}], {"A": 1}])
+def test_allocation_preferences_are_validated(rooms, prefs):
+    status, body = call("POST", "/hostel", {"student_id": "COLG-NOBODY", "preferences": prefs})
+    assert status == 400
+    assert "preferences" in body["error"]
+
+
+def test_allocation(rooms):
+    _, created = call("POST", "/students", {"name": "Api Hostel", "email": "hostel@example.com"})
+    sid = created["created"][0]
+    status, body = call("POST", "/hostel", {"student_id": sid, "preferences": [["T", "double"]]})
+    assert status == 200
+    assert body["results"][0]["status"] == "ok" and body["results"][0]["block"] == "T"
+
+
+def test_create_exams():
+    _, created = call("POST", "/students", {"name": "Api Exam", "email": "exam@example.com"})
+    status, body = call("POST", "/exams", [{"student_id": created["created"][0], "subject_code": "T101", "marks": 71}])
+    assert status == 201 and len(body["created"]) == 1
+
+
+def test_create_fees():
+    _, created = call("POST", "/students", {"name": "Api Fees", "email": "fees@example.com"})
+    sid = created["created"][0]
+    status, body = call("POST", "/fees", [{"student_id": sid, "amount": 100, "transaction_id": "API-TXN-1"},
+                                          {"student_id": sid, "amount": 50}, {"student_id": "COLG-NOBODY", "amount": 5}])
+    assert status == 200
+    assert [r["status"] for r in body["results"]] == ["ok", "ok", "not_found"]
+    assert body["results"][1]["transaction_id"].startswith("TXN-")
+    status, body = call("POST", "/fees", {"student_id": sid, "amount": 100, "transaction_id": "API-TXN-1"})
+    assert status == 200 and body["results"][0]["status"] == "duplicate"
+
+
+def test_ids_are_reserved_off_the_event_loop(monkeypatch):
+    import threading
+    seen = []
+    real = api.generic_ids
+    monkeypatch.setattr(api, "generic_ids", lambda *a: seen.append(threading.current_thread()) or real(*a))
+    _, created = call("POST", "/students", {"name": "Api Thread", "email": "thread@example.com"})
+    status, _ = call("POST", "/exams", {"student_id": created["created"][0], "subject_code": "T102", "marks": 55})
+    assert status == 201
+    assert seen and threading.main_thread() not in seen
+
+
+@pytest.mark.parametrize("path,body", [
+    ("/exams", {"student_id": ["x"], "subject_code": "T101", "marks": 50}),
+    ("/exams", {"student_id": {"id": 1}, "subject_code": "T101", "marks": 50}),
+    ("/exams", {"student_id": "x", "subject_code": ["T101"], "marks": 50}),
+    ("/hostel", {"student_id": ["x"]}),
+    ("/hostel", {"student_id": {"id": 1}}),
+    ("/hostel", {"student_id": True}),
+])
+def test_non_scalar_student_ids_are_rejected(rooms, path, body):
+    status, res = call("POST", path, body)
+    assert status == 400
+    assert "must be a string or a number" in res["error"]
+
+
+def test_numeric_student_id():
+    from models import Student
+    s = SessionLocal()
+    s.add(Student(student_id="424242", name="Numeric Id"))
+    s.commit()
+    s.close()
+    status, body = call("POST", "/exams", {"student_id": 424242, "subject_code": "T103", "marks": 64})
+    assert status == 201, body
+    status, body = call("POST", "/hostel", {"student_id": 424242})
+    assert status == 200 and body["results"][0]["status"] in ("ok", "no_bed")
@@ -0,0 +1,19 @@
+import pytest
+import auth, config
+
+USER = {"id": 1, "username": "admin", "role": "Admin", "display_name": "Admin"}
+
+
+def test_token_round_trip():
+    assert auth.read_token(auth.issue_token(USER)) == USER
+    assert auth.read_token(auth.issue_token(USER, ttl=-1)) is None
+
+
+def test_placeholder_secret_refuses_tokens(monkeypatch):
+    token = auth.issue_token(USER)
+    monkeypatch.setattr(config, "SECRET_KEY", config.PLACEHOLDER_SECRET_KEY)
+    assert auth.read_token(token) is None
+    with pytest.raises(auth.InsecureSecret):
+        auth.issue_token(USER)
+    with pytest.raises(auth.InsecureSecret):
+        auth.login("admin", "admin")
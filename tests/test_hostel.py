@@ -0,0 +1,65 @@
+import pytest
+from sqlalchemy import insert, select, func
+from sqlalchemy.exc import IntegrityError
+from models import SessionLocal, Student, HostelAllocation, HostelRoom
+from utils import gen_student_id
+import hostel
+
+
+@pytest.fixture
+def session():
+    s = SessionLocal()
+    if not s.execute(select(HostelRoom.id).where(HostelRoom.block == "H")).first():
+        hostel.add_rooms(s, "H", ["1", "2", "3"], room_type="double", capacity=2)
+        s.commit()
+    hostel.index.loaded = False
+    yield s
+    s.close()
+
+
+def _student(s):
+    st = Student(student_id=gen_student_id(), name="Hostel Student")
+    s.add(st)
+    s.commit()
+    return st
+
+
+def _active(s, pk):
+    return s.execute(select(func.count()).where(HostelAllocation.student_id_fk == pk,
+                                                HostelAllocation.status == hostel.ACTIVE)).scalar()
+
+
+def test_second_active_allocation_is_rejected_by_the_index(session):
+    st = _student(session)
+    row = {"student_id_fk": st.id, "block": "X", "room_no": "1", "status": hostel.ACTIVE}
+    session.execute(insert(HostelAllocation), [dict(row, allocation_id="HST-T-1")])
+    with pytest.raises(IntegrityError):
+        session.execute(insert(HostelAllocation), [dict(row, allocation_id="HST-T-2")])
+    session.rollback()
+
+
+def test_student_housed_by_another_transaction(session):
+    st = _student(session)
+    assert hostel.allocate(session, [{"student_id": st.student_id}])[0]["status"] == "ok"
+    session.commit()
+    free = sum(hostel.index.free_counts().values())
+    # as if this transaction's "already housed" check ran before the other one committed
+    values = {"allocation_id": "HST-T-3", "student_id_fk": st.id, "move_in": "2026-01-01"}
+    assert hostel._take(session, [(hostel.ANY, hostel.ANY)], values, [True]) is hostel.HOUSED
+    session.commit()
+    assert _active(session, st.id) == 1
+    assert sum(hostel.index.free_counts().values()) == free  # the bed went back to the index
+
+
+def test_dashboard_counts_allocations_without_a_bed(session):
+    from dashboard import hostel_by_block
+    counts = lambda: {r["block"]: r["count"] for r in hostel_by_block(session)}
+    before = counts()
+    st = _student(session)
+    # made before the room inventory: a block and room but no bed row
+    session.execute(insert(HostelAllocation), [{"allocation_id": "HST-T-4", "student_id_fk": st.id, "block": "OLD",
+                                                "room_no": "7", "status": hostel.ACTIVE}])
+    session.commit()
+    after = counts()
+    assert after["unassigned"] == before.get("unassigned", 0) + 1
+    assert {b: c for b, c in after.items() if b != "unassigned"} == {b: c for b, c in before.items() if b != "unassigned"}
@@ -0,0 +1,31 @@
+import os
+import pytest
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, inspect
+import config
+from models import Base
+
+
+def _run(conn, fn, *args):
+    cfg = Config(os.path.join(config.BASE_DIR, "alembic.ini"))
+    cfg.attributes["connection"] = conn
+    fn(cfg, *args)
+
+
+@pytest.mark.filterwarnings("ignore:.*expression-based index")
+def test_upgrade_head_matches_the_models(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    with engine.begin() as conn:
+        _run(conn, command.upgrade, "head")
+    with engine.connect() as conn:
+        diff = compare_metadata(MigrationContext.configure(conn, opts={"compare_type": True}), Base.metadata)
+        # the FTS5 index (search.py) is not in the models
+        assert [d for d in diff if not (d[0] == "remove_table" and d[1].name.startswith("students_fts"))] == []
+        # expression indexes are not reflected, so not compared above
+        assert conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE name = 'ix_students_email_lower'").scalar()
+    with engine.begin() as conn:
+        _run(conn, command.downgrade, "base")
+    assert inspect(engine).get_table_names() == ["alembic_version"]
@@ -0,0 +1,78 @@
+import pytest
+from models import SessionLocal, Student, Fee
+from utils import gen_student_id
+import webhook_forwarder
+
+
+@pytest.fixture
+def student():
+    s = SessionLocal()
+    st = Student(student_id=gen_student_id(), name="Test Student", program="BSc", year="1")
+    s.add(st)
+    s.commit()
+    sid = st.student_id
+    s.close()
+    return sid
+
+
+@pytest.fixture
+def client():
+    return webhook_forwarder.app.test_client()
+
+
+def _fees(txn):
+    s = SessionLocal()
+    try:
+        return s.query(Fee).filter(Fee.transaction_id == txn).count()
+    finally:
+        s.close()
+
+
+def test_numeric_transaction_id_retry_is_duplicate(client, student):
+    payload = {"secret": "test_secret", "student_id": student, "amount": 500, "transaction_id": 12345}
+    first = client.post("/webhook", json=payload)
+    assert first.status_code == 200 and first.get_json()["status"] == "ok"
+    retry = client.post("/webhook", json=payload)
+    assert retry.status_code == 200
+    assert retry.get_json() == {"status": "duplicate", "receipt_id": first.get_json()["receipt_id"]}
+    assert _fees("12345") == 1
+
+
+@pytest.mark.parametrize("field,value", [("student_id", ["x"]), ("student_id", {"a": 1}),
+                                         ("transaction_id", ["t"]), ("transaction_id", {"t": 1})])
+def test_non_scalar_ids_are_invalid(client, student, field, value):
+    bad = {"student_id": student, "amount": 100, "transaction_id": "TXN-BAD", field: value}
+    good = {"student_id": student, "amount": 100, "transaction_id": f"TXN-GOOD-{field}-{type(value).__name__}"}
+    res = client.post("/webhook/batch", json={"secret": "test_secret", "payments": [bad, good]})
+    assert res.status_code == 200
+    results = res.get_json()["results"]
+    assert results[0]["status"] == "invalid"
+    assert results[1]["status"] == "ok"
+    single = client.post("/webhook", json=dict(bad, secret="test_secret"))
+    assert single.status_code == 400
+
+
+def test_retry_of_an_archived_transaction_is_duplicate(client, student):
+    import archive
+    from sqlalchemy import update
+    from models import ReceiptJob
+    payload = {"secret": "test_secret", "student_id": student, "amount": 250, "transaction_id": "TXN-ARCH-1"}
+    receipt = client.post("/webhook", json=payload).get_json()["receipt_id"]
+    client.post("/webhook", json=dict(payload, transaction_id="TXN-ARCH-2"))  # the newest row always stays hot
+    start, _ = archive.year_bounds("2019-20")
+    s = SessionLocal()
+    fee_id = s.query(Fee.id).filter(Fee.transaction_id == "TXN-ARCH-1").scalar()
+    s.execute(update(Fee).where(Fee.id == fee_id).values(timestamp=start))
+    s.execute(update(ReceiptJob).where(ReceiptJob.fee_id_fk == fee_id).values(status="done"))
+    s.commit()
+    s.close()
+    archive.close_year("2019-20", log=lambda *_: None)
+    try:
+        assert _fees("TXN-ARCH-1") == 0
+        retry = client.post("/webhook", json=payload)
+        assert retry.get_json() == {"status": "duplicate", "receipt_id": receipt}
+        assert _fees("TXN-ARCH-1") == 0
+        assert archive.verify() == []
+    finally:
+        archive.restore("2019-20")
+    assert _fees("TXN-ARCH-1") == 1
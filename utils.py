@@ -1,57 +1,69 @@
 # utils.py
-import random, time, hashlib, os
-from werkzeug.security import generate_password_hash, check_password_hash
+# fpdf is imported where it is used, so importing utils stays cheap
+import datetime, os, pickle
 from config import RECEIPTS_FOLDER, BACKUP_FOLDER
-import pandas as pd
-from models import SessionLocal, Student, Fee, Admission, HostelAllocation, Exam
-import datetime
-import fpdf2
+from id_allocator import student_ids, generic_ids
+from auth import hash_password, verify_password  # bcrypt/scrypt, see auth.py
 
 def gen_student_id(prefix="COLG"):
-    year = datetime.datetime.utcnow().year % 100
-    return f"{prefix}{year:02d}S{random.randint(10000,99999)}"
+    # sequence-backed, see id_allocator; e.g. COLG26S100042
+    return student_ids(1, prefix)[0]
 
 def gen_generic_id(prefix):
-    ts = int(time.time()*1000)
-    return f"{prefix}-{ts}-{random.randint(1000,9999)}"
+    # e.g. REC-26-00001234
+    return generic_ids(prefix, 1)[0]
 
-def hash_password(pw):
-    return generate_password_hash(pw)
+def export_csv_all(db_path=None):
+    # produce CSV files for each table and return filepaths; streamed from one snapshot
+    from backup import export_backup
+    entry = export_backup(fmt="csv", compression=None)
+    return {name: os.path.join(BACKUP_FOLDER, t["path"]) for name, t in entry["tables"].items()}
 
-def verify_password(hashed, pw):
-    return check_password_hash(hashed, pw)
+# simple PDF receipt generator using fpdf2 (imported as fpdf)
+# pre-laid-out receipt body: (label, key, gap before the line in mm)
+RECEIPT_LAYOUT = [
+    ("Receipt ID", "receipt_id", 0),
+    ("Date", "date", 0),
+    ("Student", "student", 4),
+    ("Amount Paid", "amount", 0),
+    ("Purpose", "purpose", 0),
+    ("Payment Mode", "payment_mode", 0),
+    ("Transaction ID", "transaction_id", 0),
+]
+INSTITUTION_NAME = "INSTITUTION NAME"
+_receipt_template = None  # pickled FPDF with the page and header already laid out, one per process
 
-def export_csv_all(db_path=None):
-    # produce CSV files for each table and return filepaths
-    s = SessionLocal()
-    paths = {}
-    ts = datetime.datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    # students
-    df = pd.read_sql(s.query(Student).statement, s.bind)
-    p = os.path.join(BACKUP_FOLDER, f"students_{ts}.csv")
-    df.to_csv(p, index=False)
-    paths['students'] = p
-    df = pd.read_sql(s.query(Admission).statement, s.bind)
-    p = os.path.join(BACKUP_FOLDER, f"admissions_{ts}.csv")
-    df.to_csv(p, index=False)
-    paths['admissions'] = p
-    df = pd.read_sql(s.query(Fee).statement, s.bind)
-    p = os.path.join(BACKUP_FOLDER, f"fees_{ts}.csv")
-    df.to_csv(p, index=False)
-    paths['fees'] = p
-    df = pd.read_sql(s.query(HostelAllocation).statement, s.bind)
-    p = os.path.join(BACKUP_FOLDER, f"hostel_{ts}.csv")
-    df.to_csv(p, index=False)
-    paths['hostel'] = p
-    df = pd.read_sql(s.query(Exam).statement, s.bind)
-    p = os.path.join(BACKUP_FOLDER, f"exams_{ts}.csv")
-    df.to_csv(p, index=False)
-    paths['exams'] = p
-    s.close()
-    return paths
+def init_receipt_template():
+    # ProcessPoolExecutor initializer: lay out the static part once per worker
+    global _receipt_template
+    from fpdf import FPDF
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+    pdf.set_font("helvetica", 'B', 16)
+    pdf.cell(0, 10, INSTITUTION_NAME, new_x="LMARGIN", new_y="NEXT", align='C')
+    pdf.ln(5)
+    pdf.set_font("helvetica", '', 12)
+    _receipt_template = pickle.dumps(pdf)
 
-# simple PDF receipt generator using fpdf2
-from fpdf import FPDF
+def render_receipt_pdf(receipt_data, path):
+    if _receipt_template is None:
+        init_receipt_template()
+    # unpickling a copy of the template is cheaper than building the page again
+    pdf = pickle.loads(_receipt_template)
+    pdf.set_creation_date(datetime.datetime.now(datetime.timezone.utc))
+    values = dict(receipt_data)
+    # the core PDF fonts are latin-1 only, so the rupee sign is spelled out
+    values["amount"] = f"Rs. {receipt_data.get('amount')}"
+    values["student"] = f"{receipt_data.get('student_name')} ({receipt_data.get('student_id')})"
+    for label, key, gap in RECEIPT_LAYOUT:
+        if gap:
+            pdf.ln(gap)
+        pdf.cell(0, 8, f"{label}: {values.get(key)}", new_x="LMARGIN", new_y="NEXT")
+    pdf.ln(6)
+    pdf.multi_cell(0, 8, f"Notes: {receipt_data.get('notes') or ''}")
+    pdf.output(path)
+    return path
 
 def create_receipt_pdf(receipt_data, out_folder=RECEIPTS_FOLDER):
     """
@@ -63,23 +75,4 @@ def create_receipt_pdf(receipt_data, out_folder=RECEIPTS_FOLDER):
     os.makedirs(out_folder, exist_ok=True)
     filename = f"{receipt_data['receipt_id']}.pdf"
     path = os.path.join(out_folder, filename)
-
-    pdf = FPDF()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.add_page()
-    pdf.set_font("Arial", 'B', 16)
-    pdf.cell(0, 10, "INSTITUTION NAME", ln=True, align='C')
-    pdf.ln(5)
-    pdf.set_font("Arial", '', 12)
-    pdf.cell(0, 8, f"Receipt ID: {receipt_data['receipt_id']}", ln=True)
-    pdf.cell(0, 8, f"Date: {receipt_data.get('date')}", ln=True)
-    pdf.ln(4)
-    pdf.cell(0, 8, f"Student: {receipt_data.get('student_name')} ({receipt_data.get('student_id')})", ln=True)
-    pdf.cell(0, 8, f"Amount Paid: ₹{receipt_data.get('amount')}", ln=True)
-    pdf.cell(0, 8, f"Purpose: {receipt_data.get('purpose')}", ln=True)
-    pdf.cell(0, 8, f"Payment Mode: {receipt_data.get('payment_mode')}", ln=True)
-    pdf.cell(0, 8, f"Transaction ID: {receipt_data.get('transaction_id')}", ln=True)
-    pdf.ln(6)
-    pdf.multi_cell(0, 8, f"Notes: {receipt_data.get('notes','')}")
-    pdf.output(path)
-    return path
+    return render_receipt_pdf(receipt_data, path)
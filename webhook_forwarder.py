@@ -1,39 +1,59 @@
 # webhook_forwarder.py
-from flask import Flask, request, jsonify
-from models import SessionLocal, Student, Fee
-from utils import gen_generic_id
+from flask import Flask, request, jsonify, g
+from payment_ingest import ingest_and_commit, PaymentBatcher
+from config import WEBHOOK_BATCH_MODE, WEBHOOK_BATCH_MAX_EVENTS, WEBHOOK_BATCH_MAX_WAIT_MS
 import os
+import metrics
 
 app = Flask(__name__)
 
 SHARED_SECRET = os.environ.get("WEBHOOK_SECRET", "webhook_secret_change")
+# in batch mode single callbacks are queued and committed together by a background thread
+batcher = PaymentBatcher(WEBHOOK_BATCH_MAX_EVENTS, WEBHOOK_BATCH_MAX_WAIT_MS) if WEBHOOK_BATCH_MODE else None
+
+STATUS_CODES = {"ok": 200, "duplicate": 200, "not_found": 404, "invalid": 400}
+
+@app.before_request
+def _start_span():
+    g.span = metrics.begin(f"webhook:{request.endpoint}", root=True)
+
+@app.teardown_request
+def _end_span(exc):
+    metrics.end(g.pop("span", None))
+
+@app.route('/metrics')
+def prometheus():
+    # latency histograms, query counts and N+1 suspects of this process; no row data
+    return metrics.render(), 200, {"Content-Type": metrics.CONTENT_TYPE}
 
 @app.route('/webhook', methods=['POST'])
 def webhook():
-    payload = request.get_json()
+    payload = request.get_json(silent=True)
     if not payload:
         return jsonify({"error":"no json"}), 400
     if payload.get("secret") != SHARED_SECRET:
         return jsonify({"error":"unauthorized"}), 401
-    student_id = payload.get("student_id")
-    amount = float(payload.get("amount", 0))
-    txn = payload.get("transaction_id") or gen_generic_id("TXN")
-    s = SessionLocal()
-    # find student by student_id field (human id)
-    st = s.query(Student).filter(Student.student_id==student_id).first()
-    if not st:
-        s.close()
-        return jsonify({"error":"student not found"}), 404
-    receipt_id = gen_generic_id("REC")
-    # compute balance naive
-    last = s.query(Fee).filter(Fee.student_id_fk==st.id).order_by(Fee.timestamp.desc()).first()
-    last_balance = last.balance_after if last else 0.0
-    balance_after = last_balance - amount
-    fee = Fee(receipt_id=receipt_id, student_id_fk=st.id, name=st.name, amount=amount, payment_mode="Gateway", transaction_id=txn, balance_after=balance_after, purpose=payload.get("purpose","Tuition"), recorded_by="gateway")
-    s.add(fee)
-    s.commit()
-    s.close()
-    return jsonify({"status":"ok","receipt_id":receipt_id})
+    if batcher is not None:
+        res = batcher.submit(payload).result(timeout=30)
+    else:
+        res = ingest_and_commit([payload])[0]
+    if res["status"] in ("ok", "duplicate"):
+        return jsonify({"status": res["status"], "receipt_id": res["receipt_id"]})
+    return jsonify({"error": res["error"]}), STATUS_CODES[res["status"]]
+
+@app.route('/webhook/batch', methods=['POST'])
+def webhook_batch():
+    payload = request.get_json(silent=True)
+    if not payload or not isinstance(payload.get("payments"), list):
+        return jsonify({"error":"expected {'secret', 'payments': [...]}"}), 400
+    if payload.get("secret") != SHARED_SECRET:
+        return jsonify({"error":"unauthorized"}), 401
+    if batcher is not None:
+        futures = [batcher.submit(p) for p in payload["payments"]]
+        results = [f.result(timeout=30) for f in futures]
+    else:
+        results = ingest_and_commit(payload["payments"])
+    return jsonify({"results": results})
 
 if __name__ == "__main__":
-    app.run(port=9000)
+    app.run(port=9000, threaded=True)